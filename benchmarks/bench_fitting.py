@@ -0,0 +1,152 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# @author Thierry GALLIANO
+# @contributors Pierre-Henri PUECH, Laurent LIMOZIN, Guillaume GAY
+"""
+Benchmark of the fitting kernels (closed-form fits, sphere fit with analytic Jacobian)
+against scipy curve_fit
+
+usage (from the repository root): PYTHONPATH=. python benchmarks/bench_fitting.py [-p path_curves] [-r repeat]
+"""
+import argparse
+import contextlib
+import io
+from os import sep
+from time import perf_counter
+import numpy as np
+from scipy.optimize import curve_fit
+from ot_analysis.controller.controller import Controller
+from ot_analysis.model.curve import Curve
+from ot_analysis.model.fitting import fit_approach_linear, fit_retraction, fit_approach_sphere, \
+    sphere_model
+
+METHODS = {'threshold_align': 30, 'pulling_length': 50, 'model': 'linear',
+           'eta': 0.5, 'bead_radius': 1, 'factor_noise': 5, 'jump_force': 5,
+           'jump_point': 200, 'jump_distance': 200, 'drug': 'NaN', 'condition':
+           'NaN', 'optical': None, 'width_window_smooth': 151}
+
+
+def load_curves(path_curves):
+    """
+    Creation of the curves objects of a folder (without printing the analysis messages)
+    """
+    with contextlib.redirect_stdout(io.StringIO()):
+        controller = Controller(None, path_curves)
+        controller.create_dict_curves(METHODS)
+    return controller.dict_curve
+
+
+def time_fits(curve, fit_method, repeat):
+    """
+    Time of the fits of the Press segment (linear and sphere models), of the Pull segment
+    and of a linear classification fit for one curve
+
+    :return:
+        durations: dict
+            mean duration (s) of each fit
+        parameters: dict
+            parameters of each fit
+    """
+    main_axis = curve.features['main_axis']['axe']
+    curve.fit_method = fit_method
+    segment_press = curve.dict_segments['Press']
+    segment_pull = curve.dict_segments['Pull']
+    time_press = segment_press.corrected_data['seriesTime']
+    force_press = Curve.smooth(segment_press.corrected_data[main_axis + 'Signal1'], 151, 2)
+    time_pull = segment_pull.corrected_data['time']
+    force_pull = Curve.smooth(segment_pull.corrected_data[main_axis + 'Signal1'], 151, 2)
+    index_release = curve.features['point_release']['index']
+    baseline = float(curve.features['baseline_corrected_press (pN)'])
+    guess_press = [time_press[curve.features['contact_point']['index']],
+                   (force_press[-10] - force_press[curve.features['contact_point']['index']]) /
+                   (time_press.iloc[-10] - time_press[curve.features['contact_point']['index']]), baseline]
+    guess_pull = [(force_pull[max(index_release - 20, 20)] - force_pull[max(index_release - 100, 0)]) /
+                  (time_pull[max(index_release - 20, 20)] - time_pull[max(index_release - 100, 0)]),
+                  time_pull[index_release], baseline]
+    fits = {
+        'press': lambda: fit_segment(curve, 'press', time_press, force_press, guess_press),
+        'pull': lambda: fit_segment(curve, 'pull', time_pull, force_pull, guess_pull),
+        'line': lambda: curve.fit_linear(time_pull[:2000], force_pull[:2000]),
+        'sphere': lambda: fit_segment(curve, 'sphere', time_press, force_press, guess_press),
+    }
+    durations = {}
+    parameters = {}
+    for name, fit in fits.items():
+        start = perf_counter()
+        for _ in range(repeat):
+            result = fit()
+        durations[name] = (perf_counter() - start) / repeat
+        parameters[name] = (result[0], sse_of(curve, name, result[0], time_press, force_press,
+                                              time_pull, force_pull))
+    return durations, parameters
+
+
+def fit_segment(curve, name, time_data, force_data, guess):
+    """
+    Fit of the piecewise-linear model of a segment with the method chosen on the curve
+    """
+    if name == 'sphere':
+        if curve.fit_method == 'closed_form':
+            return fit_approach_sphere(time_data, force_data, curve.features['contact_point']['index'],
+                                       guess[2])
+        return curve_fit(sphere_model, time_data, force_data, guess)
+    if curve.fit_method == 'closed_form':
+        if name == 'press':
+            return fit_approach_linear(time_data, force_data)
+        return fit_retraction(time_data, force_data)
+    if name == 'press':
+        return curve_fit(curve.fit_model_approach, time_data, force_data, guess)
+    return curve_fit(Curve.fit_model_retraction, time_data, force_data, guess)
+
+
+def sse_of(curve, name, popt, time_press, force_press, time_pull, force_pull):
+    """
+    Sum of the squared residuals of a fit
+    """
+    if name == 'press':
+        fitted = curve.fit_model_approach(time_press, *popt)
+        return float(np.sum((force_press - fitted)**2))
+    if name == 'sphere':
+        fitted = sphere_model(time_press, *popt)
+        return float(np.sum((force_press - fitted)**2))
+    if name == 'pull':
+        fitted = Curve.fit_model_retraction(time_pull, *popt)
+        return float(np.sum((force_pull - fitted)**2))
+    fitted = Curve.linear_fit(np.asarray(time_pull[:2000]), *popt)
+    return float(np.sum((force_pull[:2000] - fitted)**2))
+
+
+def main():
+    """
+    Launch of the benchmark and report of the speedup and of the differences of results
+    """
+    parser = argparse.ArgumentParser(description="Benchmark closed-form fits vs curve_fit")
+    parser.add_argument("-p", "--path", type=str, default='tests' + sep + 'curves_test' + sep + 'verif',
+                        help="folder containing the curves")
+    parser.add_argument("-r", "--repeat", type=int, default=5, help="number of repetitions of each fit")
+    args = parser.parse_args()
+    dict_curve = load_curves(args.path)
+    for curve in dict_curve.values():
+        curve.features['model'] = 'linear'
+    total = {'closed_form': {}, 'curve_fit': {}}
+    print(f"{'curve':32} {'fit':6} {'closed (ms)':>12} {'curve_fit (ms)':>15} {'speedup':>8} "
+          f"{'max rel. diff':>14} {'SSE ratio':>10}")
+    for name_curve, curve in dict_curve.items():
+        durations_closed, parameters_closed = time_fits(curve, 'closed_form', args.repeat)
+        durations_ref, parameters_ref = time_fits(curve, 'curve_fit', args.repeat)
+        for name_fit, duration in durations_closed.items():
+            total['closed_form'][name_fit] = total['closed_form'].get(name_fit, 0) + duration
+            total['curve_fit'][name_fit] = total['curve_fit'].get(name_fit, 0) + durations_ref[name_fit]
+            popt_closed, sse_closed = parameters_closed[name_fit]
+            popt_ref, sse_ref = parameters_ref[name_fit]
+            relative = np.max(np.abs(popt_closed - popt_ref) / np.maximum(np.abs(popt_ref), 1e-12))
+            print(f"{name_curve:32} {name_fit:6} {duration*1e3:12.3f} {durations_ref[name_fit]*1e3:15.3f} "
+                  f"{durations_ref[name_fit]/duration:8.1f} {relative:14.2e} {sse_closed/sse_ref:10.5f}")
+    print("\nTotal per fit")
+    for name_fit, duration in total['closed_form'].items():
+        print(f"{name_fit:6} closed-form {duration*1e3:9.3f} ms, curve_fit {total['curve_fit'][name_fit]*1e3:9.3f} ms,"
+              f" speedup x{total['curve_fit'][name_fit]/duration:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# @author Thierry GALLIANO
+# @contributors Pierre-Henri PUECH, Laurent LIMOZIN, Guillaume GAY
+"""
+Benchmark of the smoothing with precomputed Savitzky-Golay kernels against scipy savgol_filter
+
+usage (from the repository root): PYTHONPATH=. python benchmarks/bench_smoothing.py [-n nb_curves] [-l length]
+"""
+import argparse
+from time import perf_counter
+import numpy as np
+from scipy.signal import savgol_filter
+from ot_analysis.model.smoothing import smooth, smooth_batch
+
+
+def timing(function, repeat):
+    """
+    Mean duration (s) of a function call
+    """
+    start = perf_counter()
+    for _ in range(repeat):
+        function()
+    return (perf_counter() - start) / repeat
+
+
+def main():
+    """
+    Launch of the benchmark on random signals and report of the speedups and of the differences
+    """
+    parser = argparse.ArgumentParser(description="Benchmark smoothing vs savgol_filter")
+    parser.add_argument("-n", "--nb_curves", type=int, default=50, help="number of signals")
+    parser.add_argument("-l", "--length", type=int, default=20000, help="number of points per signal")
+    parser.add_argument("-r", "--repeat", type=int, default=5, help="number of repetitions")
+    args = parser.parse_args()
+    rng = np.random.default_rng(0)
+    signals = np.cumsum(rng.normal(0, 1, (args.nb_curves, args.length)), axis=1)
+    for window_length, order_polynome in ((51, 3), (151, 2)):
+        reference = np.array([savgol_filter(signal, window_length, order_polynome) for signal in signals])
+        time_reference = timing(lambda: [savgol_filter(signal, window_length, order_polynome)
+                                         for signal in signals], args.repeat)
+        time_single = timing(lambda: [smooth(signal, window_length, order_polynome)
+                                      for signal in signals], args.repeat)
+        time_batch = timing(lambda: smooth_batch(signals, window_length, order_polynome), args.repeat)
+        difference = np.max(np.abs(smooth_batch(signals, window_length, order_polynome) - reference))
+        print(f"window {window_length} order {order_polynome}: savgol_filter {time_reference*1e3:8.2f} ms, "
+              f"cached kernel {time_single*1e3:8.2f} ms (x{time_reference/time_single:.1f}), "
+              f"batch {time_batch*1e3:8.2f} ms (x{time_reference/time_batch:.1f}), max diff {difference:.1e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# @author Thierry GALLIANO
+# @contributors Pierre-Henri PUECH, Laurent LIMOZIN, Guillaume GAY
+"""
+Benchmark of the reading of curve archives member by member (order of the names, one seek per member)
+against the reading planned in the order of the archive (zip_reader), on a cold cache:
+the page cache is dropped when permitted (root, Linux), and the files are read through
+a throttled file simulating the latency of the seeks and the bandwidth of a slow storage
+
+usage (from the repository root): PYTHONPATH=. python benchmarks/bench_zip_read.py [files] [-l latency] [-b bandwidth]
+"""
+import argparse
+from glob import glob
+from os import sep
+from time import perf_counter, sleep
+from zipfile import ZipFile
+from ot_analysis.extractor.zip_reader import read_members
+
+
+class ThrottledFile:
+    """
+    Binary file whose reads wait for the latency of a seek when they are not sequential
+    and for the transfer of the bytes read
+    """
+
+    def __init__(self, name, latency, bandwidth):
+        """
+        :parameters:
+            name: str
+                name of the file
+            latency: float
+                duration (s) of a seek
+            bandwidth: float
+                bytes read per second
+        """
+        self.file = open(name, 'rb')
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.position = 0
+        self.nb_seeks = 0
+        self.nb_reads = 0
+
+    def seekable(self):
+        return True
+
+    def seek(self, offset, whence=0):
+        return self.file.seek(offset, whence)
+
+    def tell(self):
+        return self.file.tell()
+
+    def read(self, size=-1):
+        if self.file.tell() != self.position:
+            self.nb_seeks += 1
+            sleep(self.latency)
+        data = self.file.read(size)
+        self.nb_reads += 1
+        sleep(len(data) / self.bandwidth)
+        self.position = self.file.tell()
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+def drop_caches():
+    """
+    Removal of the page cache (root on Linux only)
+    """
+    try:
+        with open('/proc/sys/vm/drop_caches', 'w') as file_caches:
+            file_caches.write('3\n')
+        return True
+    except OSError:
+        return False
+
+
+def read_by_name(jpk_zip, names):
+    """
+    Reading member by member in the order of the names (previous reading of JPKFile)
+    """
+    return {name: jpk_zip.open(name).read() for name in names}
+
+
+def main():
+    """
+    Launch of the benchmark on the curve archives and report of the durations and of the seeks
+    """
+    parser = argparse.ArgumentParser(description="Benchmark planned zip reads vs member by member reads")
+    parser.add_argument("files", nargs='*', help="curve archives (jpk-nt-force of the test folder by default)")
+    parser.add_argument("-l", "--latency", type=float, default=0.005, help="duration of a seek (s)")
+    parser.add_argument("-b", "--bandwidth", type=float, default=50e6, help="bandwidth (bytes/s)")
+    args = parser.parse_args()
+    files = args.files or sorted(glob('tests' + sep + 'curves_test' + sep + 'verif' + sep + '*.jpk-nt-force'))
+    cold = drop_caches()
+    print(f"{len(files)} archives, page cache {'dropped' if cold else 'not dropped (not permitted)'}, "
+          f"seek {args.latency*1e3:.1f} ms, {args.bandwidth/1e6:.0f} MB/s")
+    for name_method, method in (('by name', read_by_name), ('planned', read_members)):
+        drop_caches()
+        duration = 0.0
+        nb_seeks = 0
+        nb_reads = 0
+        for file in files:
+            throttled = ThrottledFile(file, args.latency, args.bandwidth)
+            start = perf_counter()
+            with ZipFile(throttled) as jpk_zip:
+                names = [name for name in jpk_zip.namelist() if not name.endswith('/')]
+                method(jpk_zip, names)
+            duration += perf_counter() - start
+            nb_seeks += throttled.nb_seeks
+            nb_reads += throttled.nb_reads
+            throttled.close()
+        print(f"{name_method:8s}: {duration*1e3:8.1f} ms, {nb_seeks} seeks, {nb_reads} reads")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# @author Thierry GALLIANO
+# @contributors Pierre-Henri PUECH, Laurent LIMOZIN, Guillaume GAY
+"""
+Typed columnar output files written alongside the text output: Parquet or Feather (with pyarrow),
+NumPy .npz otherwise. The columns have explicit types (nullable integers, floats, nullable
+booleans, strings), the methods of the analysis are stored in the metadata of the file, and each
+batch of rows is appended as a row group, for the incremental and watch analyses
+"""
+import json
+import zipfile
+import numpy as np
+import pandas as pd
+from ..model.feature_table import column_dtype, typed_frame
+try:
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+# typed output formats and their extensions
+COLUMNAR_FORMATS = {'parquet': '.parquet', 'feather': '.feather', 'npz': '.npz'}
+
+# key of the methods in the metadata of the Parquet and Feather files
+METADATA_METHODS = b'ot_analysis.methods'
+
+# types of the columns in the Arrow formats
+ARROW_TYPES = {'Int64': 'int64', 'float64': 'float64', 'boolean': 'bool_', 'string': 'string'}
+
+
+class ColumnarWriter:
+    """
+    Writing of a typed output file, one row group for each batch of rows
+    """
+
+    def __init__(self, name_file, output_format='parquet', methods=None):
+        """
+        :parameters:
+            name_file: str
+                name of the file without extension
+            output_format: str
+                'parquet', 'feather' or 'npz' ('npz' when pyarrow is not installed)
+            methods: dict
+                parameters of the analysis, stored in the metadata of the file
+        """
+        if output_format not in COLUMNAR_FORMATS:
+            raise ValueError('output format ' + str(output_format) + ' not in ' + ', '.join(COLUMNAR_FORMATS))
+        if output_format != 'npz' and pyarrow is None:
+            print('pyarrow not installed, typed output in npz instead of ' + output_format)
+            output_format = 'npz'
+        self.output_format = output_format
+        self.name_file = str(name_file) + COLUMNAR_FORMATS[output_format]
+        self.methods = methods if methods is not None else {}
+        self.columns = None
+        self.nb_groups = 0
+        self.schema = None
+        self.writer = None
+
+    #########################################################################################
+
+    def write(self, output):
+        """
+        Appending of a batch of rows as a row group, with the columns of the first batch
+
+        :parameters:
+            output: DataFrame
+                rows of the output (typed output of the FeatureTable, INC rows included)
+        """
+        if len(output) == 0:
+            return
+        if self.columns is None:
+            self.columns = list(output.columns)
+        else:
+            extra = [name for name in output.columns if name not in self.columns]
+            if extra:
+                print('columns not in the typed output: ' + ', '.join(extra))
+            output = output.reindex(columns=self.columns)
+        output = typed_frame(output)
+        if self.output_format == 'npz':
+            self.write_npz(output)
+        else:
+            self.write_arrow(output)
+        self.nb_groups += 1
+
+    #########################################################################################
+
+    def write_arrow(self, output):
+        """
+        Appending of a record batch to the Parquet or Feather file
+        """
+        if self.writer is None:
+            self.schema = arrow_schema(self.columns, self.methods)
+            if self.output_format == 'parquet':
+                self.writer = pyarrow.parquet.ParquetWriter(self.name_file, self.schema)
+            else:
+                self.writer = pyarrow.ipc.new_file(self.name_file, self.schema)
+        self.writer.write_table(arrow_table(output, self.schema))
+
+    #########################################################################################
+
+    def write_npz(self, output):
+        """
+        Appending of a group of arrays to the npz file: values and mask of the missing values
+        of each column, names of the curves; names, types and methods with the first group
+        """
+        with zipfile.ZipFile(self.name_file, 'w' if self.nb_groups == 0 else 'a',
+                             compression=zipfile.ZIP_DEFLATED) as npz:
+            if self.nb_groups == 0:
+                write_array(npz, '__columns__', np.array(self.columns, dtype=str))
+                write_array(npz, '__dtypes__', np.array([column_dtype(name) for name in self.columns], dtype=str))
+                write_array(npz, '__methods__', np.array(json.dumps(self.methods, default=str)))
+            group = 'group_' + format(self.nb_groups, '04d') + '/'
+            write_array(npz, group + 'curve', np.array(output.index, dtype=str))
+            for index, name in enumerate(self.columns):
+                column = output[name]
+                mask = column.isna().to_numpy()
+                if column.dtype == 'string':
+                    values = np.array(column.fillna(''), dtype=str)
+                elif column.dtype == 'float64':
+                    values = column.to_numpy()
+                elif column.dtype == 'boolean':
+                    values = column.fillna(False).to_numpy(dtype=bool)
+                else:
+                    values = column.fillna(0).to_numpy(dtype=np.int64)
+                write_array(npz, group + format(index, '03d'), values)
+                write_array(npz, group + format(index, '03d') + '_mask', mask)
+
+    #########################################################################################
+
+    def close(self):
+        """
+        End of the file (footer of the Parquet and Feather files)
+        """
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+###############################################################################################
+
+
+def arrow_schema(columns, methods=None):
+    """
+    Arrow schema of the typed output: name of the curve, then the columns with their types,
+    the methods of the analysis in the metadata
+
+    :parameters:
+        columns: list(str)
+            columns of the typed output
+        methods: dict
+            parameters of the analysis
+    """
+    fields = [pyarrow.field('curve', pyarrow.string())]
+    fields += [pyarrow.field(name, getattr(pyarrow, ARROW_TYPES[column_dtype(name)])()) for name in columns]
+    methods = json.dumps(methods if methods is not None else {}, default=str)
+    return pyarrow.schema(fields, metadata={METADATA_METHODS: methods.encode('utf-8')})
+
+###############################################################################################
+
+
+def arrow_table(output, schema):
+    """
+    Arrow table of rows of the typed output with their types (typed_frame)
+
+    :parameters:
+        output: DataFrame
+            rows of the typed output, indexed by curve
+        schema: Schema
+            schema of the table (arrow_schema)
+    """
+    return pyarrow.Table.from_pandas(output.rename_axis('curve').reset_index(), schema=schema, preserve_index=False)
+
+###############################################################################################
+
+
+def write_array(npz, key, array):
+    """
+    Writing of an array in an npz archive opened in writing or appending
+    """
+    with npz.open(key + '.npy', 'w') as file_array:
+        np.lib.format.write_array(file_array, np.asarray(array), allow_pickle=False)
+
+###############################################################################################
+
+
+def read_columnar(name_file):
+    """
+    Reading of a typed output file
+
+    :parameters:
+        name_file: str
+            Parquet, Feather or npz file
+
+    :return:
+        output: DataFrame
+            rows of the file, indexed by curve, with the types of the columns
+        methods: dict
+            parameters of the analysis stored in the file
+    """
+    name_file = str(name_file)
+    if name_file.endswith('.npz'):
+        with np.load(name_file, allow_pickle=False) as npz:
+            columns = [str(name) for name in npz['__columns__']]
+            dtypes = [str(dtype) for dtype in npz['__dtypes__']]
+            methods = json.loads(str(npz['__methods__']))
+            groups = sorted({key.split('/')[0] for key in npz.files if key.startswith('group_')})
+            frames = []
+            for group in groups:
+                data = {}
+                for index, (name, dtype) in enumerate(zip(columns, dtypes)):
+                    key = group + '/' + format(index, '03d')
+                    column = pd.Series(npz[key]).astype(dtype)
+                    column[npz[key + '_mask']] = pd.NA if dtype != 'float64' else np.nan
+                    data[name] = column
+                frames.append(pd.DataFrame(data).set_axis(npz[group + '/curve'], axis=0))
+        output = pd.concat(frames) if frames else pd.DataFrame(columns=columns)
+    else:
+        if pyarrow is None:
+            raise ImportError('reading of ' + name_file + ' requires pyarrow')
+        if name_file.endswith('.parquet'):
+            table = pyarrow.parquet.read_table(name_file)
+        else:
+            with pyarrow.ipc.open_file(name_file) as reader:
+                table = reader.read_all()
+        methods = json.loads(table.schema.metadata[METADATA_METHODS].decode('utf-8'))
+        output = table.to_pandas(types_mapper={pyarrow.int64(): pd.Int64Dtype(), pyarrow.bool_(): pd.BooleanDtype(),
+                                               pyarrow.string(): pd.StringDtype()}.get)
+        output = output.set_index('curve')
+    output.index.name = None
+    return output, methods
+
+###############################################################################################
+
+
+def write_columnar(name_file, output, incomplete, output_format, methods=None):
+    """
+    Writing of a typed output file in one row group: curves, then incomplete files (INC rows)
+
+    :parameters:
+        name_file: str
+            name of the file without extension
+        output: DataFrame
+            typed output of the curves (FeatureTable.typed_output)
+        incomplete: iterable(str)
+            names of the incomplete files
+        output_format: str
+            'parquet', 'feather' or 'npz'
+        methods: dict
+            parameters of the analysis
+
+    :return:
+        name_file: str
+            name of the typed output file
+    """
+    output = output.copy()
+    for name_incomplete in incomplete:
+        output.loc[name_incomplete, 'automatic_type'] = 'INC'
+        output.loc[name_incomplete, 'type'] = 'INC'
+    writer = ColumnarWriter(name_file, output_format, methods)
+    try:
+        writer.write(output)
+    finally:
+        writer.close()
+    return writer.name_file
@@ -11,9 +11,9 @@ from os import sep
 from pathlib import Path
 import argparse
 from shutil import copy
+from io import TextIOWrapper
 from time import time
 from datetime import datetime
-import re
 from math import ceil, floor
 import pandas as pd
 import numpy as np
@@ -24,8 +24,19 @@ from matplotlib import gridspec
 import matplotlib.pyplot as plt
 from ..__init__ import DATA_DIR
 from ..model.curve import Curve
+from ..model.batch import BatchAnalysis
+from ..model.feature_table import FeatureTable, format_output
+from ..model.sweep import ParameterSweep
+from ..model.calibration import Calibration, supervised_labels
 from ..model.segment_curve import Segment
-from ..extractor.jpk_extractor import JPKFile
+from ..extractor.jpk_extractor import JPKFile, JPKForceMap, MAP_EXTENSIONS, ARCHIVE_SEPARATOR
+from ..extractor.bundle import BundleReader, member_name, open_member
+from .parallel import bounded_map
+from .discovery import DirectoryIndex, parse_name
+from .watch import FolderWatcher
+from .columnar import COLUMNAR_FORMATS, write_columnar
+from .shard import SHARD_MODES, shard_name, partition, files_digest, file_position, \
+    write_journal, write_partial, read_shards
 
 
 
@@ -34,7 +45,7 @@ class Controller:
     Instantiates "controller" objects for processing optical curves
     """
 
-    def __init__(self, view=None, path_files=None):
+    def __init__(self, view=None, path_files=None, index_files=None):
         """
         initialization of the basic attributes of the control
 
@@ -43,12 +54,15 @@ class Controller:
                 interface object
             path_files: str
                 path of the folder containing the curves to be analyzed
+            index_files: str
+                json file of the index of the folders kept between two analyses (no index if None)
         """
         # self.tracker = SummaryTracker()
         self.view = view
         self.files = []
         self.dict_curve = {}
         self.check_length_files = True
+        self.index_files = index_files
         self.output = pd.DataFrame(dtype='float64')
         if path_files is not None:
             self.manage_list_files(path_files)
@@ -98,36 +112,15 @@ class Controller:
 
     def create_list_files(self, path, dict_files):
         """
-        Creation of a file list based on a given directory
+        Creation of a file list based on a given directory, the folders being scanned
+        in parallel and the folders unchanged since the last discovery being read
+        in the index of the files (if given)
 
         :parameters:
             path: str
                 path to a study folder
         """
-        path_repository_study = Path(path)
-        # Allows you to retrieve all the file names of the directory and store them in a list
-        if path_repository_study.is_dir():
-            for element in path_repository_study.iterdir():
-                if element.is_file():
-                    file = element.__str__()
-                    name_file = file.split(sep)[-1]
-                    dir_file = file.split(sep)[-2]
-                    regex = re.match("^b[1-9]+c[1-9]+[a-z]{0,2}-", name_file)
-                    if regex:
-                        if dir_file in dict_files:
-                            dict_files[dir_file].append(file)
-                        else:
-                            dict_files[dir_file] = [file]
-                elif element.is_dir():
-                    self.create_list_files(element, dict_files)
-        else:
-            file = path_repository_study.__str__()
-            name_file = file.split(sep)[-1]
-            dir_file = file.split(sep)[-2]
-            regex = re.match("^b[1-9]+c[1-9]+[a-z]{0,2}-", name_file)
-            if regex:
-                dict_files[dir_file] = [file]
-        return dict_files
+        return DirectoryIndex(self.index_files).curve_files(path, dict_files)
 
     ##############################################################################################
 
@@ -154,98 +147,245 @@ class Controller:
             files = self.files
         else:
             files = list_files
-       
-        for index_file in range(0, len(files), 1):
-            new_curve = None
-            type_file = files[index_file].split('.')[-1]
-            name_file = files[index_file].split(sep)[-1]
-            regex = re.match("^b[1-9]+c[1-9]+[a-z]{0,2}-", name_file)
-            name_file = name_file.split('-')
-            name_file = str(name_file[0][0:4]) + '-' + '-'.join(name_file[1:])
-            nb = str(index_file+1) + "/" + str(len(files))
-            print(
-                '\n===============================================================================')
-            print(files[index_file].split(sep)[-1])
-            print(
-                '===============================================================================')
-            filename = name_file.split('.')[0:-1]
-            filename = '.'.join(filename)
-            if filename not in self.dict_curve:
-                check_incomplete = False
+        pending = {}
+
+        # names of the curves parsed once
+        metadata_files = [parse_name(member_name(file)) for file in files]
+
+        def read_curve(index_file):
+            # curves created in advance by worker threads (files read in their folder or bundle)
+            metadata = metadata_files[index_file]
+            if metadata is None or metadata['name'] in self.dict_curve:
+                return None
+            file = files[index_file]
+            type_file = metadata['extension']
+            name_file = metadata['name'] + '.' + type_file
+            if type_file == 'txt':
+                return Controller.open_file(
+                    file, name_file, methods['threshold_align'], methods['pulling_length'],
+                    methods.get('range_baseline', 1000), methods.get('range_std', 200))
+            elif type_file == 'jpk-nt-force':
+                return Controller.create_object_curve(
+                    file, name_file, methods['threshold_align'], methods['pulling_length'],
+                    methods.get('range_baseline', 1000), methods.get('range_std', 200))
+            return None
+
+        # each bundle is opened once, its curve files being read in its order
+        # (the force maps are read in their bundle, their curves on demand)
+        with BundleReader([file for file in files if not file.endswith(MAP_EXTENSIONS)]):
+            curves_read = bounded_map(read_curve, range(len(files)), methods.get('nb_workers', 4))
+            for index_file in range(0, len(files), 1):
+                new_curve = None
+                _, result, error_read = next(curves_read)
+                type_file = files[index_file].split('.')[-1]
+                name_file = member_name(files[index_file])
+                regex = metadata_files[index_file] is not None
+                name_file = name_file.split('-')
+                name_file = str(name_file[0][0:4]) + '-' + '-'.join(name_file[1:])
+                nb = str(index_file+1) + "/" + str(len(files))
+                print(
+                    '\n===============================================================================')
+                print(member_name(files[index_file]))
+                print(
+                    '===============================================================================')
+                filename = name_file.split('.')[0:-1]
+                filename = '.'.join(filename)
+                if filename not in self.dict_curve and filename not in pending:
+                    check_incomplete = False
+                    try:
+                        if type_file in ('txt', 'jpk-nt-force') and regex:
+                            if error_read is not None:
+                                raise error_read
+                            new_curve, check_incomplete = result
+                            if not check_incomplete:
+                                self.dict_type_files[type_file[0:3]] += 1
+                        elif type_file in MAP_EXTENSIONS and regex:
+                            self.create_map_curves(files[index_file], filename, methods, pending)
+                        else:
+                            print('non-conforming file.')
+                            self.dict_type_files['NC'] += 1
+                    except Exception as error:
+                        message = "The file curve is not conform for transformation in curve object"
+                        self.problematic_curve(
+                            files[index_file], type_file, message, error)
+                        self.dict_type_files['PB'] += 1
+                    if check_incomplete:
+                        self.list_file_imcomplete.add(
+                            member_name(files[index_file]))
+                        self.dict_type_files['INC'] += 1
+                    if new_curve is not None:
+                        if new_curve.check_incomplete:
+                            if type_file == 'jpk-nt-force':
+                                type_file = type_file.split('-')[0]
+                            Controller.file_incomplete_rejected(
+                                type_file, files[index_file])
+                            self.dict_type_files['INC'] += 1
+                            self.dict_type_files[type_file[0:3]] -= 1
+                            self.list_file_imcomplete.add(
+                                member_name(files[index_file]))
+                        elif methods.get('batch_analysis', False):
+                            # analysis after the stacked steps of all the curves
+                            pending[filename] = (new_curve, files[index_file], type_file)
+                        else:
+                            self.analysis_new_curve(new_curve, methods, files[index_file], type_file)
+                else:
+                    print('files already processed')
+                    self.dict_type_files['DP'] += 1
+                if self.view is not None:
+                    self.view.info_processing(nb, len(files))
+        if pending:
+            try:
+                nb_stacked = BatchAnalysis([new_curve for new_curve, _, _ in pending.values()]).run(methods)
+                print('batch analysis: ' + ', '.join(name_segment + ' ' + str(nb) + '/' + str(len(pending))
+                                                    for name_segment, nb in nb_stacked.items()))
+            except Exception as error:
+                # the curves are analyzed one by one
+                print(type(error).__name__, ':', error)
+                for new_curve, _, _ in pending.values():
+                    new_curve.clear_cache()
+            for new_curve, file, type_file in pending.values():
+                self.analysis_new_curve(new_curve, methods, file, type_file)
+        self.summary_fits()
+
+    #############################################################################################
+
+    def create_map_curves(self, file, name_map, methods, pending):
+        """
+        Creation and analysis of the curves of an archive of several curves (force map).
+        The shared header is read once, the curves are extracted and analyzed by worker threads
+        a few at a time ('nb_workers' of the methods), then added to the curves of the analysis
+        in their order, so that the data of the whole archive are never in memory at once.
+        With the batch analysis, the curves are only extracted by the workers
+
+        :parameters:
+            file: str
+                path of the archive
+            name_map: str
+                name of the archive without extension, the curves being named name_map-<index>
+            methods: dict
+                Set of parameters to enter in the interface to launch the analysis
+            pending: dict
+                curves waiting for the batch analysis
+        """
+        force_map = JPKForceMap(file)
+        print(str(len(force_map)) + ' curves in the archive')
+        indexes = [index for index in force_map.indexes
+                   if name_map + '-' + str(index) not in self.dict_curve]
+
+        def extract(index):
+            new_curve, check_incomplete = Controller.create_object_curve(
+                file + ARCHIVE_SEPARATOR + force_map.prefix(index), name_map + '-' + str(index) + '.jpk-nt-force',
+                methods['threshold_align'], methods['pulling_length'], methods.get('range_baseline', 1000),
+                methods.get('range_std', 200), force_map.curve(index))
+            analysis = None
+            if not check_incomplete and not methods.get('batch_analysis', False):
+                # analysis of the curve in the worker thread, its error kept for analysis_new_curve
                 try:
-                    if type_file == 'txt' and regex:
-                        new_curve, check_incomplete = Controller.open_file(
-                            files[index_file], name_file, methods['threshold_align'],
-                            methods['pulling_length'])
-                        if not check_incomplete:
-                            self.dict_type_files['txt'] += 1
-                    elif type_file == 'jpk-nt-force' and regex:
-                        new_curve, check_incomplete = Controller.create_object_curve(
-                            files[index_file], name_file, methods['threshold_align'],
-                            methods['pulling_length'])
-                        if not check_incomplete:
-                            self.dict_type_files['jpk'] += 1
-                    else:
-                        print('non-conforming file.')
-                        self.dict_type_files['NC'] += 1
+                    analysis = (new_curve.analyzed_curve(methods, False), None)
                 except Exception as error:
-                    message = "The file curve is not conform for transformation in curve object"
-                    self.problematic_curve(
-                        files[index_file], type_file, message, error)
-                    self.dict_type_files['PB'] += 1
-                if check_incomplete:
-                    self.list_file_imcomplete.add(
-                        files[index_file].split(sep)[-1])
-                    self.dict_type_files['INC'] += 1
-                if new_curve is not None:
-                    if new_curve.check_incomplete:
-                        if type_file == 'jpk-nt-force':
-                            type_file = type_file.split('-')[0]
-                        Controller.file_incomplete_rejected(
-                            type_file, files[index_file])
-                        self.dict_type_files['INC'] += 1
-                        self.dict_type_files[type_file[0:3]] -= 1
-                        self.list_file_imcomplete.add(
-                            files[index_file].split(sep)[-1])
-                    else:
-                        try:
-                            error = new_curve.analyzed_curve(
-                                methods, False)
-                            if self.view is not None:
-                                if self.view.check_logger and error is not None:
-                                    self.logger.info(
-                                        '###########################################')
-                                    self.logger.info(
-                                        new_curve.file)
-                                    self.logger.info(
-                                        '###########################################')
-                                    self.logger.error(
-                                        type(error).__name__)
-                                    self.logger.error(error)
-                                    self.logger.error(traceback.format_exc())
-                                    self.logger.info(
-                                        '###########################################\n\n')
-                            self.dict_curve[new_curve.file] = new_curve
-                            new_curve.features['type'] = new_curve.features['automatic_type']
-                            new_curve.features['relative_path'] = files[index_file]
-                            new_curve.features['report_problem'] = False
-                        except Exception as error:
-                            message = "The curve object created but problem \
-                                        in analysis due to erroneous data"
-                            self.problematic_curve(
-                                files[index_file], type_file, message, error)
-                            self.dict_type_files['PB'] += 1
+                    analysis = (None, error)
+            return new_curve, check_incomplete, analysis
+
+        for index, result, error in bounded_map(extract, indexes, methods.get('nb_workers', 4)):
+            file_curve = file + ARCHIVE_SEPARATOR + force_map.prefix(index)
+            if error is not None:
+                message = "The curve of the archive is not conform for transformation in curve object"
+                self.problematic_curve(file_curve, 'jpk', message, error)
+                self.dict_type_files['PB'] += 1
+                continue
+            new_curve, check_incomplete, analysis = result
+            if check_incomplete:
+                self.list_file_imcomplete.add(name_map + '-' + str(index))
+                self.dict_type_files['INC'] += 1
+            elif methods.get('batch_analysis', False):
+                self.dict_type_files['jpk'] += 1
+                pending[new_curve.file] = (new_curve, file_curve, 'jpk')
             else:
-                print('files already processed')
-                self.dict_type_files['DP'] += 1
+                self.dict_type_files['jpk'] += 1
+                self.analysis_new_curve(new_curve, methods, file_curve, 'jpk', analysis)
+
+    #############################################################################################
+
+    def analysis_new_curve(self, new_curve, methods, file, type_file, analysis=None):
+        """
+        Analysis of a curve created from a file and addition to the curves of the analysis,
+        the file being copied with the problematic curves if the analysis fails
+
+        :parameters:
+            new_curve: Curve
+                curve created from the file
+            methods: dict
+                Set of parameters to enter in the interface to launch the analysis
+            file: str
+                path of the file of the curve
+            type_file: str
+                file extension
+            analysis: tuple
+                (error returned, exception raised) by the analysis of the curve already made
+                in a worker thread, the curve being analyzed here if None
+        """
+        try:
+            if analysis is None:
+                error = new_curve.analyzed_curve(methods, False)
+            else:
+                error, error_analysis = analysis
+                if error_analysis is not None:
+                    raise error_analysis
             if self.view is not None:
-                self.view.info_processing(nb, len(files))
-        
+                if self.view.check_logger and error is not None:
+                    self.logger.info('###########################################')
+                    self.logger.info(new_curve.file)
+                    self.logger.info('###########################################')
+                    self.logger.error(type(error).__name__)
+                    self.logger.error(error)
+                    self.logger.error(traceback.format_exc())
+                    self.logger.info('###########################################\n\n')
+            self.dict_curve[new_curve.file] = new_curve
+            new_curve.features['type'] = new_curve.features['automatic_type']
+            new_curve.features['relative_path'] = file
+            new_curve.features['report_problem'] = False
+        except Exception as error:
+            message = "The curve object created but problem \
+                        in analysis due to erroneous data"
+            self.problematic_curve(file, type_file, message, error)
+            self.dict_type_files['PB'] += 1
+
+    #############################################################################################
+
+    def summary_fits(self):
+        """
+        Totals of the number of evaluations and of the time of the fits
+        of the segments over all the analyzed curves, with the number of fits
+        replaced by their fallback estimate (budget spent or failure)
+
+        :return:
+            summary: dict
+                for each fit ('fit_press', 'fit_pull'), number of curves, total of evaluations,
+                total time (s) and number of fallbacks by status
+        """
+        summary = {}
+        for curve in self.dict_curve.values():
+            for name_fit in ('fit_press', 'fit_pull'):
+                if name_fit in curve.features:
+                    total = summary.setdefault(name_fit, {'nb': 0, 'nfev': 0, 'time (s)': 0.0,
+                                                          'budget': 0, 'failed': 0})
+                    total['nb'] += 1
+                    total['nfev'] += curve.features[name_fit]['nfev']
+                    total['time (s)'] += curve.features[name_fit]['time (s)']
+                    status = curve.features[name_fit].get('status', 'ok')
+                    if status in total:
+                        total[status] += 1
+        for name_fit, total in summary.items():
+            print(name_fit + ': ' + str(total['nb']) + ' curves, ' + str(total['nfev']) +
+                  ' evaluations, ' + format(total['time (s)'], '.3f') + ' s, ' +
+                  str(total['budget']) + ' over budget, ' + str(total['failed']) + ' failed')
+        return summary
 
     #############################################################################################
 
     @ staticmethod
-    def open_file(file, name_file, threshold_align, pulling_length=50):
+    def open_file(file, name_file, threshold_align, pulling_length=50,
+                  range_baseline=1000, range_std=200):
         """
         if file .txt
         Processing of the curve file to create an object
@@ -256,6 +396,10 @@ class Controller:
                 name of the curve file
             threshold_align: int
                 percentage of maximum force for misalignment
+            range_baseline: int
+                number of points for the baselines
+            range_std: int
+                number of points for the standard deviations
         :return:
             new_curve: object
                 Curved object with 1 title, 4 dictionaries and 2 dataframes
@@ -271,7 +415,7 @@ class Controller:
         file_curve = name_file.split('.')[0:-1]
         file_curve = '.'.join(file_curve)
         check_incomplete = False
-        with open(file, 'r') as file_study:
+        with TextIOWrapper(open_member(file)) as file_study:
             lines = file_study.read()
             file_study.seek(0)
             header['header_global'] = Controller.parsing_generic(file_study)
@@ -297,7 +441,7 @@ class Controller:
                     num_segment += 1
                     dict_segments[segment.name] = segment
                 new_curve = Curve(file_curve, title, header,
-                                  dict_segments, pulling_length)
+                                  dict_segments, pulling_length, range_baseline, range_std)
                 dict_align = Controller.alignment_curve(
                     file, new_curve, threshold_align)
                 new_curve.features['automatic_AL'] = dict_align
@@ -308,7 +452,8 @@ class Controller:
     ################################################################################################
 
     @ staticmethod
-    def create_object_curve(file, name_file, threshold_align, pulling_length=50):
+    def create_object_curve(file, name_file, threshold_align, pulling_length=50,
+                            range_baseline=1000, range_std=200, new_jpk=None):
         """
         Creation of the Curve object after extraction of the data from the jpk-nt-force coded file
 
@@ -317,6 +462,12 @@ class Controller:
                 path to the jpk-nt-force folder to extract and transform into a Curve python object
             threshold_align: int
                 percentage of maximum force for misalignment
+            range_baseline: int
+                number of points for the baselines
+            range_std: int
+                number of points for the standard deviations
+            new_jpk: JPKFile
+                curve already extracted (curve of a force map), extracted from the file if None
 
         :return:
             new_curve: Object
@@ -325,7 +476,8 @@ class Controller:
                 takes True if the file is incomplete otherwise False
         """
         new_curve = None
-        new_jpk = JPKFile(file)
+        if new_jpk is None:
+            new_jpk = JPKFile(file)
         # .replace('.jpk-nt-force', '')
         # file_curve = name_file.__str__().split(sep)[-1]
         file_curve = name_file.split('.')[0:-1]
@@ -384,7 +536,7 @@ class Controller:
                 dict_segments[new_segment.name] = new_segment
             title = new_jpk.headers['title']
             new_curve = Curve(file_curve, title, new_jpk.headers,
-                              dict_segments, pulling_length)
+                              dict_segments, pulling_length, range_baseline, range_std)
             dict_align = Controller.alignment_curve(
                 file, new_curve, threshold_align)
             new_curve.features['automatic_AL'] = dict_align
@@ -416,7 +568,7 @@ class Controller:
             path_dir_problem = Path(
                 DATA_DIR + sep + 'File_rejected' + sep + 'problem_curve' + sep + 'TXT')
         path_dir_problem.mkdir(parents=True, exist_ok=True)
-        copy(file, str(path_dir_problem))
+        Controller.copy_rejected(file, path_dir_problem)
         # print('###########################################')
         # print(type(error).__name__, ':')
         # print(error)
@@ -438,6 +590,34 @@ class Controller:
 
     ############################################################################################
 
+    @staticmethod
+    def copy_rejected(file, path_directory):
+        """
+        Copy of a curve file to a folder of rejected files. For a curve inside an archive
+        (path of the archive, ARCHIVE_SEPARATOR, folder of the curve), the archive is copied once.
+        A curve file inside a bundle is written alone, without the rest of the bundle
+
+        :parameters:
+            file: str
+                name of the curve file
+            path_directory: Path
+                folder of the rejected files
+        """
+        parts = str(file).split(ARCHIVE_SEPARATOR)
+        in_archive = parts[-1].endswith('/')
+        if in_archive:
+            parts = parts[:-1]
+        if len(parts) == 1:
+            if not in_archive or not (Path(path_directory) / Path(parts[0]).name).exists():
+                copy(parts[0], str(path_directory))
+        else:
+            name_copy = Path(path_directory) / member_name(parts[-1])
+            if not in_archive or not name_copy.exists():
+                with open_member(ARCHIVE_SEPARATOR.join(parts)) as member, open(name_copy, 'wb') as file_copy:
+                    file_copy.write(member.read())
+
+    ############################################################################################
+
     @ staticmethod
     def file_incomplete_rejected(extension, file):
         """
@@ -457,7 +637,7 @@ class Controller:
             path_dir_incomplete = Path(
                 DATA_DIR + sep + 'File_rejected' + sep + 'Incomplete' + sep + 'TXT')
         path_dir_incomplete.mkdir(parents=True, exist_ok=True)
-        copy(file, str(path_dir_incomplete))
+        Controller.copy_rejected(file, path_dir_incomplete)
         print("File incomplete")
 
     ##############################################################################################
@@ -548,13 +728,15 @@ class Controller:
         main_axis = curve.features['main_axis']['axe']
         force_data = segment.corrected_data[main_axis + 'Signal1']
         distance_data = segment.corrected_data['distance']
-        fitted_data = curve.graphics['fitted_' + segment.name]
         ax.plot(distance_data, force_data, color="#c2a5cf")
-        ax.plot(distance_data, fitted_data, color="#5aae61",
-                label=curve.features['model'] + " fit")
+        if 'fitted_' + segment.name in curve.graphics:
+            # no fit of "Pull" for the curves classified before the fits (methods 'full_analysis')
+            fitted_data = curve.graphics['fitted_' + segment.name]
+            ax.plot(distance_data, fitted_data, color="#5aae61",
+                    label=curve.features['model'] + " fit")
         # y_smooth = curve.graphics['y_smooth_' + segment.name]
-        y_smooth = curve.smooth(
-            force_data, self.view.methods['width_window_smooth'], 2)
+        y_smooth = curve.smooth_segment(
+            segment.name, self.view.methods['width_window_smooth'], 2)
         ax.plot(distance_data, y_smooth,
                 color="#80cdc1", label='smooth')
         index_x_0 = 0
@@ -1128,15 +1310,16 @@ class Controller:
         dict_align = new_curve.check_alignment_curve(threshold_align)
         if dict_align['AL'] == 'No':
             path_dir_alignment = ""
-            name_file = file.split(sep)[-1]
+            # name of the curve file, or of the archive of a curve of a force map
+            name_file = [name for name in map(member_name, file.split(ARCHIVE_SEPARATOR)) if name][-1]
             if name_file.split('.')[-1] == "txt":
                 path_dir_alignment = Path(
                     DATA_DIR + sep + 'File_rejected' + sep + 'Alignment' + sep + 'TXT')
-            elif name_file.split('.')[-1] == "jpk-nt-force":
+            elif name_file.split('.')[-1] in ("jpk-nt-force",) + MAP_EXTENSIONS:
                 path_dir_alignment = Path(
                     DATA_DIR + sep + 'File_rejected' + sep + 'Alignment' + sep + 'JPK')
             path_dir_alignment.mkdir(parents=True, exist_ok=True)
-            copy(file, str(path_dir_alignment))
+            Controller.copy_rejected(file, path_dir_alignment)
         return dict_align
 
     #############################################################################################
@@ -1563,76 +1746,26 @@ class Controller:
 
     ##############################################################################################
 
-    def output_save(self, path_directory):
+    def output_save(self, path_directory, output_format=None, methods=None):
         """
-        Transformation of the characteristics of each curve into a general dataframe.
-        Writing of this dataframe in a csv file
+        Transformation of the characteristics of each curve into a typed feature table.
+        Writing of this dataframe in a csv file, and in a typed columnar file alongside if requested
 
         :parameters:
             path_directory: str
                 name of the folder to save the output
+            output_format: str
+                format of the typed file: 'parquet', 'feather' or 'npz' (csv only if None)
+            methods: dict
+                parameters of the analysis, stored in the metadata of the typed file
         """
         print("output_save")
         today = datetime.now().strftime("%d-%m-%Y_%H-%M-%S")
         name_file= ""
         if len(self.dict_curve) > 0:
-            dict_infos_curves = {}
-            for curve in self.dict_curve.values():
-                curve.creation_output_curve()
-                dict_infos_curves[curve.file] = curve.output
-            self.output = self.output.from_dict(
-                dict_infos_curves,  orient='index')
-            self.output['main_axis'] = self.output['main_axis_sign'] + \
-                self.output['main_axis_axe']
-            self.output.drop(
-                ['main_axis_sign', 'main_axis_axe'], axis=1, inplace=True)
-            if 'valid_fit_press' not in self.output:
-                self.output['valid_fit_press'] = False
-            if 'valid_fit_pull' not in self.output:
-                self.output['valid_fit_pull'] = False
-            name_parameters = ""
-            error_parameters = ''
-            if self.output['model'][0] == 'linear':
-                name_parameters = 'slope (pN/nm)'
-                error_parameters = 'error (pN/nm)'
-            elif self.output['model'][0] == 'sphere':
-                name_parameters = 'young (Pa)'
-                error_parameters = 'error young (Pa)'
-            liste_labels = ['treat_supervised', 'automatic_type', 'type', 'report_problem' ,'automatic_AL', 'AL', 'automatic_AL_axe',
-                            'optical_state', 'model', 'Date', 'Hour', 'condition', 'drug', 'tolerance', 'bead', 'cell', 'couple',
-                            'main_axis', 'stiffness (N/m)', 'theorical_contact_force (N)', 'theorical_distance_Press (m)',
-                            'theorical_speed_Press (m/s)', 'theorical_freq_Press (Hz)', 'theorical_distance_Pull (m)',
-                            'theorical_speed_Pull (m/s)', 'theorical_freq_Pull (Hz)', 'baseline_origin_press (N)',
-                            'baseline_corrected_press (pN)', 'std_origin_press (N)', 'std_corrected_press (pN)',
-                            name_parameters, error_parameters, 'contact_point_index', 'contact_point_value',
-                            'force_min_press_index', 'force_min_press_value', 'force_min_curve_index',
-                            'force_min_curve_value', 'time_min_curve_index', 'time_min_curve_value (s)',
-                            'point_release_index', 'point_release_value', 'force_max_pull_index',
-                            'force_max_pull_value', 'force_max_curve_index', 'force_max_curve_value',
-                            'transition_point_index', 'transition_point_value (pN)', 'point_return_endline_index',
-                            'point_return_endline_value']
-            if len(liste_labels) != len(self.output.columns):
-                for label in self.output.columns:
-                    if label not in liste_labels:
-                        if label == 'type':
-                            liste_labels.insert(1, label)
-                        elif label.startswith('time_segment_pause'):
-                            self.output[label] = self.output[label].replace(
-                                np.nan, 0)
-                            if label.endswith('Wait1 (s)'):
-                                liste_labels.insert(liste_labels.index(
-                                    'theorical_freq_Press (Hz)') + 1, label)
-                            else:
-                                liste_labels.insert(liste_labels.index(
-                                    'theorical_freq_Pull (Hz)') + 1, label)
-                        else:
-                            liste_labels.append(label)
-            self.output = self.output[liste_labels]
-
-            self.output.rename(columns={'contact_point_value': 'contact_point_value  (pN)', 'force_min_press_value': 'force_min_press_value (pN)',
-                                        'force_min_curve_value': 'force_min_curve_value (pN)', 'force_max_curve_value': 'force_max_curve_value (pN)',
-                                        'point_release_value': 'point_release_value (pN)', 'force_max_pull_value': 'force_max_pull_value (pN)',
-                                        'point_return_endline_value': 'point_return_endline_value (pN)'}, inplace=True)
+            table = FeatureTable.from_curves(self.dict_curve.values())
+            typed = table.typed_output()
+            self.output = format_output(typed)
 
             for incomplete in self.list_file_imcomplete:
                 self.output.loc[incomplete, 'automatic_type'] = 'INC'
@@ -1644,6 +1777,254 @@ class Controller:
             name_file = path_directory + sep + 'output_' + today + '.csv'
             self.output.to_csv(name_file, sep='\t',
                                encoding='utf-8', na_rep="NaN")
+            if output_format is not None:
+                write_columnar(name_file[:-len('.csv')], typed, self.list_file_imcomplete, output_format, methods)
+        return name_file
+
+    ##############################################################################################
+
+    def all_files(self):
+        """
+        Files of the controller in one list (lists of files by folder beyond 1000 files)
+        """
+        return [file for item in self.files for file in (item if isinstance(item, list) else [item])]
+
+    ##############################################################################################
+
+    def run_shard(self, methods, shard, nb_shards, path_directory, mode='hash'):
+        """
+        Analysis of the files of one shard of the files of the controller, independently of the
+        other shards (other process or node). The records of the curves, the incomplete files
+        and the counts of the files by type are written in a partial file, the progress
+        in a journal of the shard
+
+        :parameters:
+            methods: dict
+                Set of parameters to enter in the interface to launch the analysis
+            shard: int
+                number of the shard (0 to nb_shards - 1)
+            nb_shards: int
+                number of shards
+            path_directory: str
+                folder of the results of the shards, shared by the nodes
+            mode: str
+                distribution of the files ('hash' of the curve names or 'directory')
+
+        :return:
+            name_journal: str
+                name of the journal of the shard
+        """
+        files = self.all_files()
+        files_shard = [file for file, number in zip(files, partition(files, nb_shards, mode))
+                       if number == shard]
+        Path(path_directory).mkdir(parents=True, exist_ok=True)
+        name = shard_name(shard, nb_shards)
+        name_journal = str(path_directory) + sep + name + '.json'
+        journal = {'shard': shard, 'nb_shards': nb_shards, 'mode': mode, 'digest': files_digest(files),
+                   'nb_files_analysis': len(files), 'nb_files': len(files_shard),
+                   'methods': {key: str(value) for key, value in methods.items()},
+                   'partial': name + '_partial.json', 'status': 'running',
+                   'start': datetime.now().strftime("%d-%m-%Y_%H-%M-%S")}
+        write_journal(name_journal, journal)
+        self.create_dict_curves(methods, files_shard)
+        positions = {file: index for index, file in enumerate(files)}
+        records = []
+        for curve in self.dict_curve.values():
+            curve.creation_output_curve()
+            records.append((file_position(curve.features['relative_path'], positions), curve.file,
+                            dict(curve.output)))
+        positions_incomplete = {}
+        for file in reversed(files_shard):
+            positions_incomplete[member_name(file)] = positions[file]
+        incomplete = sorted((positions_incomplete.get(name_file, len(files)), name_file)
+                            for name_file in self.list_file_imcomplete)
+        write_partial(str(path_directory) + sep + journal['partial'],
+                      {'records': records, 'incomplete': incomplete, 'types': dict(self.dict_type_files)})
+        journal.update({'status': 'done', 'end': datetime.now().strftime("%d-%m-%Y_%H-%M-%S"),
+                        'nb_curves': len(records), 'types': dict(self.dict_type_files)})
+        write_journal(name_journal, journal)
+        return name_journal
+
+    ##############################################################################################
+
+    def merge_shards(self, path_directory, path_output=None, output_format=None):
+        """
+        Merge of the results of all the shards in the output of an analysis of all the files
+        at once: curves in the order of the files, incomplete files (INC rows), counts
+        of the files by type. The output file is written as by output_save
+
+        :parameters:
+            path_directory: str
+                folder of the results of the shards
+            path_output: str
+                folder of the output file (folder of the shards by default)
+            output_format: str
+                format of the typed file written alongside: 'parquet', 'feather' or 'npz' (csv only if None)
+
+        :return:
+            name_file: str
+                name of the output file
+        """
+        journals, partials = read_shards(path_directory)
+        if self.files and files_digest(self.all_files()) != journals[0]['digest']:
+            raise ValueError('the shards analyzed other files than those of the controller')
+        # stable sort: the curves of a file (force map) keep their order
+        records = sorted((record for partial in partials for record in partial['records']),
+                         key=lambda record: record[0])
+        incomplete = sorted(item for partial in partials for item in partial['incomplete'])
+        self.dict_type_files = {}
+        for partial in partials:
+            for type_file, nb in partial['types'].items():
+                self.dict_type_files[type_file] = self.dict_type_files.get(type_file, 0) + nb
+        self.list_file_imcomplete = set(name_file for _, name_file in incomplete)
+        print('merge of ' + str(len(journals)) + ' shards: ' + str(len(records)) + ' curves, ' +
+              ', '.join(type_file + ' ' + str(nb) for type_file, nb in self.dict_type_files.items()))
+        if path_output is None:
+            path_output = path_directory
+        today = datetime.now().strftime("%d-%m-%Y_%H-%M-%S")
+        name_file = ""
+        if len(records) > 0:
+            table = FeatureTable([name_curve for _, name_curve, _ in records])
+            for index, (_, _, record) in enumerate(records):
+                table.fill(index, record)
+            typed = table.typed_output()
+            self.output = format_output(typed)
+            for _, name_file in incomplete:
+                self.output.loc[name_file, 'automatic_type'] = 'INC'
+                self.output.loc[name_file, 'type'] = 'INC'
+            Path(path_output).mkdir(parents=True, exist_ok=True)
+            name_file = str(path_output) + sep + 'output_' + today + '.csv'
+            self.output.to_csv(name_file, sep='\t', encoding='utf-8', na_rep="NaN")
+            if output_format is not None:
+                write_columnar(name_file[:-len('.csv')], typed, [name for _, name in incomplete],
+                               output_format, journals[0]['methods'])
+        write_journal(str(path_output) + sep + 'merge_' + today + '.json',
+                      {'nb_shards': len(journals), 'digest': journals[0]['digest'], 'output': name_file,
+                       'nb_curves': len(records), 'types': self.dict_type_files,
+                       'incomplete': [name_file for _, name_file in incomplete]})
+        return name_file
+
+    ##############################################################################################
+
+    def sweep(self, methods, grid, path_directory=None):
+        """
+        Classification and alignment of the curves for all the parameter sets of a grid
+        (threshold_align, factor_noise, jump_force, jump_point, jump_distance), the curves being
+        analyzed only once with the methods. Writing of the results in two csv files
+
+        :parameters:
+            methods: dict
+                Set of parameters of the analysis of the curves
+            grid: dict
+                for each parameter of the sweep, list of the values to try
+            path_directory: str
+                name of the folder to save the results (no file if None)
+
+        :return:
+            curves: DataFrame
+                type and alignment of each curve for each parameter set
+            counts: DataFrame
+                number of curves of each type for each parameter set
+        """
+        if len(self.dict_curve) == 0:
+            self.create_dict_curves(methods)
+        start = time()
+        curves, counts = ParameterSweep.from_curves(self.dict_curve.values(), methods).run(grid)
+        print('sweep: ' + str(len(counts)) + ' parameter sets, ' + str(len(self.dict_curve)) +
+              ' curves, ' + format(time() - start, '.3f') + ' s')
+        if path_directory is not None:
+            today = datetime.now().strftime("%d-%m-%Y_%H-%M-%S")
+            Path(path_directory).mkdir(parents=True, exist_ok=True)
+            curves.to_csv(path_directory + sep + 'sweep_curves_' + today + '.csv', sep='\t',
+                          encoding='utf-8', index=False)
+            counts.to_csv(path_directory + sep + 'sweep_counts_' + today + '.csv', sep='\t',
+                          encoding='utf-8')
+        return curves, counts
+
+    ##############################################################################################
+
+    def calibrate(self, methods, output_files, path_directory, grid=None, cache=None, nb_folds=5):
+        """
+        Calibration of the thresholds of the classification (factor_noise, jump_force, jump_point,
+        jump_distance) on the types corrected in supervised output files. Writing of the methods
+        with the calibrated thresholds in a methods file
+
+        :parameters:
+            methods: dict
+                Set of parameters of the analysis of the curves
+            output_files: list(str)
+                output files of supervised analyses of the curves
+            path_directory: str
+                name of the folder to save the methods file
+            grid: dict
+                for each threshold, list of the values to try (values at the quantiles of the curves by default)
+            cache: str
+                npz file of the values of the curves used by the sweep, read if it exists
+                (no analysis of the curves), written otherwise
+            nb_folds: int
+                number of folds of the cross-validation
+
+        :return:
+            parameters: dict
+                calibrated thresholds
+            scores: dict
+                agreement with the supervised types (Calibration.run)
+            name_file: str
+                name of the methods file
+        """
+        labels = supervised_labels(output_files)
+        if cache is not None and Path(cache).exists():
+            sweep = ParameterSweep.load(cache, methods)
+        else:
+            if len(self.dict_curve) == 0:
+                self.create_dict_curves(methods)
+            sweep = ParameterSweep.from_curves(self.dict_curve.values(), methods)
+            if cache is not None:
+                sweep.save(cache)
+        start = time()
+        parameters, scores = Calibration(sweep, labels, nb_folds).run(grid)
+        print('calibration: ' + str(scores['nb_curves']) + ' supervised curves, ' + str(scores['nb_sets']) +
+              ' parameter sets, agreement ' + format(scores['agreement'], '.3f') + ', cross-validation ' +
+              format(scores['cross_validation'], '.3f') + ', ' + format(time() - start, '.3f') + ' s')
+        print(parameters)
+        today = datetime.now().strftime("%d-%m-%Y_%H-%M-%S")
+        name_file = Controller.write_methods(dict(methods, **parameters), path_directory + sep +
+                                             'methods_calibrated_' + today + '_.tsv')
+        return parameters, scores, name_file
+
+    ##############################################################################################
+
+    @staticmethod
+    def read_methods(file):
+        """
+        Parameters of an analysis in a methods file (first line, missing values None)
+
+        :parameters:
+            file: str or file
+                methods file (.tsv) written by the interface
+
+        :return:
+            methods: dict
+        """
+        methods_data = pd.read_csv(file, sep='\t', header=0, index_col=0)
+        return {name: None if pd.isna(value) else value for name, value in methods_data.iloc[0].items()}
+
+    ##############################################################################################
+
+    @staticmethod
+    def write_methods(methods, name_file):
+        """
+        Writing of the parameters of an analysis in a methods file readable by the interface
+
+        :parameters:
+            methods: dict
+                Set of parameters of the analysis
+            name_file: str
+                name of the methods file (.tsv)
+        """
+        Path(name_file).parent.mkdir(parents=True, exist_ok=True)
+        output_methods = pd.DataFrame.from_dict({'methods': methods}, orient='index')
+        output_methods.to_csv(name_file, sep='\t', encoding='utf-8', na_rep="NaN")
         return name_file
 
     ##############################################################################################
@@ -1661,6 +2042,28 @@ def parse_args():
         "-o", "--output", help="Name of the folder where to save the results", required=True)
     parser.add_argument("-m", "--method", type=argparse.FileType('r'),
                         help="path to a method file (.tsv)", required=True)
+    parser.add_argument("-s", "--sweep", type=str,
+                        help="path to a grid of parameters to sweep (.tsv, one column per parameter)")
+    parser.add_argument("-c", "--calibrate", type=str, nargs='+',
+                        help="output files of supervised analyses to calibrate the thresholds of the classification")
+    parser.add_argument("--cache", type=str,
+                        help="npz file of the values of the curves for the sweep and the calibration")
+    parser.add_argument("-w", "--watch", action='store_true',
+                        help="analysis of the curves of the folder as they are recorded, until Ctrl+C")
+    parser.add_argument("--interval", type=float, default=1.0,
+                        help="duration (s) between two polls of the folder in watch mode")
+    parser.add_argument("--shard", type=str,
+                        help="analysis of one shard of the files, K/N for the shard K of N (from 0)")
+    parser.add_argument("--shard-mode", type=str, default='hash', choices=SHARD_MODES,
+                        help="distribution of the files in the shards")
+    parser.add_argument("--merge", action='store_true',
+                        help="merge of the results of the shards written in the output folder")
+    parser.add_argument("--index", type=str,
+                        help="json file of the index of the folders, only the folders modified since"
+                        " the previous analysis being scanned again")
+    parser.add_argument("--output-format", type=str, choices=tuple(COLUMNAR_FORMATS),
+                        help="typed columnar file written alongside the csv output"
+                        " (npz when pyarrow is not installed)")
     return parser.parse_args()
 
 
@@ -1670,7 +2073,26 @@ if __name__ == "__main__":
     PATH_FILES = args.path
     OUTPUT_DIRECTORY = args.output
     METHOD = args.method
-    controller = Controller(None, PATH_FILES)
-    controller.create_dict_curves(METHOD)
-    controller.output_save(OUTPUT_DIRECTORY)
+    if args.watch:
+        FolderWatcher(Controller(None), PATH_FILES, Controller.read_methods(METHOD), OUTPUT_DIRECTORY,
+                      args.interval, output_format=args.output_format).run()
+    else:
+        controller = Controller(None, PATH_FILES, args.index)
+        if args.merge:
+            controller.merge_shards(OUTPUT_DIRECTORY, output_format=args.output_format)
+        elif args.shard is not None:
+            SHARD, NB_SHARDS = (int(number) for number in args.shard.split('/'))
+            controller.run_shard(Controller.read_methods(METHOD), SHARD, NB_SHARDS, OUTPUT_DIRECTORY,
+                                 args.shard_mode)
+        elif args.calibrate is not None:
+            controller.calibrate(Controller.read_methods(METHOD), args.calibrate, OUTPUT_DIRECTORY,
+                                 cache=args.cache)
+        elif args.sweep is not None:
+            GRID = pd.read_csv(args.sweep, sep='\t', header=0)
+            controller.sweep(Controller.read_methods(METHOD),
+                             {name: GRID[name].dropna().tolist() for name in GRID}, OUTPUT_DIRECTORY)
+        else:
+            METHODS = Controller.read_methods(METHOD)
+            controller.create_dict_curves(METHODS)
+            controller.output_save(OUTPUT_DIRECTORY, args.output_format, METHODS)
     print("--- %s seconds ---" % (time() - START_TIME))
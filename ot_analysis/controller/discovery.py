@@ -0,0 +1,285 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# @author Thierry GALLIANO
+# @contributors Pierre-Henri PUECH, Laurent LIMOZIN, Guillaume GAY
+"""
+Discovery of the curve files of a study folder: the folders are scanned by worker threads
+(os.scandir), the names of the curves are parsed once, and the content of each folder can be kept
+in a persistent index so that a later discovery only scans again the folders whose modification
+time changed
+"""
+import json
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from pathlib import Path
+from time import time
+from ..extractor.bundle import is_bundle, list_bundle
+from ..extractor.jpk_extractor import MAP_EXTENSIONS
+
+# name of a curve: bead, cell, couple letters, then date and time of the acquisition
+CURVE_NAME = re.compile(r"^b(?P<bead>[1-9]+)c(?P<cell>[1-9]+)(?P<couple>[a-z]{0,2})-"
+                        r"(?:(?P<date>\d{4}\.\d{2}\.\d{2})-(?P<time>\d{2}\.\d{2}\.\d{2}\.\d+))?")
+
+# extensions of the curve files
+CURVE_EXTENSIONS = ('txt', 'jpk-nt-force') + MAP_EXTENSIONS
+
+# version of the format of the index
+INDEX_VERSION = 1
+
+# modification times closer than this (s) to the scan may still change within the same tick
+MTIME_MARGIN = 2.0
+
+
+def parse_name(name_file):
+    """
+    Metadata of a curve extracted from the name of its file
+
+    :parameters:
+        name_file: str
+            name of the file, without the folders
+
+    :return:
+        metadata: dict or None
+            bead, cell, couple, date, time (None if absent), name of the curve
+            (name of the file shortened as the analysis names the curves, without extension)
+            and extension, None if the name is not the name of a curve
+    """
+    match = CURVE_NAME.match(name_file)
+    if match is None:
+        return None
+    metadata = match.groupdict()
+    name_curve = name_file.split('-')
+    name_curve = str(name_curve[0][0:4]) + '-' + '-'.join(name_curve[1:])
+    metadata['name'] = '.'.join(name_curve.split('.')[0:-1])
+    metadata['extension'] = name_file.split('.')[-1]
+    return metadata
+
+###############################################################################################
+
+
+def scan_directory(path):
+    """
+    Content of a folder
+
+    :parameters:
+        path: str
+            path of the folder
+
+    :return:
+        entry: dict
+            'mtime': modification time of the folder (ns), 'entries': name, True for a folder,
+            size and modification time (ns) of each element, in the order of the folder
+    """
+    mtime = os.stat(path).st_mtime_ns
+    entries = []
+    with os.scandir(path) as iterator:
+        for element in iterator:
+            try:
+                if element.is_dir():
+                    entries.append([element.name, True, 0, 0])
+                elif element.is_file():
+                    stat = element.stat()
+                    entries.append([element.name, False, stat.st_size, stat.st_mtime_ns])
+            except OSError:
+                continue
+    return {'mtime': mtime, 'entries': entries}
+
+###############################################################################################
+
+
+class DirectoryIndex:
+    """
+    Content of the scanned folders, recorded in a json file between two discoveries
+    """
+
+    def __init__(self, name_index=None, nb_workers=8):
+        """
+        :parameters:
+            name_index: str
+                json file of the index (index kept in memory only if None)
+            nb_workers: int
+                number of threads scanning the folders
+        """
+        self.name_index = name_index
+        self.nb_workers = max(1, nb_workers)
+        self.directories = {}
+        self.nb_scanned = 0
+        if name_index is not None and os.path.isfile(name_index):
+            try:
+                with open(name_index, 'r') as file_index:
+                    content = json.load(file_index)
+                if content.get('version') == INDEX_VERSION:
+                    self.directories = content['directories']
+            except (OSError, ValueError, KeyError):
+                print('index ' + name_index + ' not readable, the folders are scanned again')
+
+    #########################################################################################
+
+    def save(self):
+        """
+        Recording of the index (written in a temporary file, then renamed)
+        """
+        if self.name_index is None:
+            return
+        name_temporary = self.name_index + '.tmp'
+        with open(name_temporary, 'w') as file_index:
+            json.dump({'version': INDEX_VERSION, 'directories': self.directories}, file_index)
+        os.replace(name_temporary, self.name_index)
+
+    #########################################################################################
+
+    def scan(self, path, start):
+        """
+        Content of a folder, read in the index if the folder did not change since its recording
+
+        :parameters:
+            path: str
+                path of the folder
+            start: float
+                time of the beginning of the discovery
+        """
+        recorded = self.directories.get(path)
+        if recorded is not None and recorded['mtime'] is not None \
+                and recorded['mtime'] == os.stat(path).st_mtime_ns:
+            return recorded, False
+        entry = scan_directory(path)
+        if entry['mtime'] / 1e9 > start - MTIME_MARGIN:
+            # folder modified during the scan: scanned again at the next discovery
+            entry['mtime'] = None
+        for element in entry['entries']:
+            if not element[1]:
+                element.append(parse_name(element[0]))
+                if element[4] is None and is_bundle(element[0]):
+                    element.append(None)
+        return entry, True
+
+    #########################################################################################
+
+    def walk(self, path):
+        """
+        Scan of a tree of folders by worker threads, the folders being scanned as they are found
+
+        :parameters:
+            path: str
+                path of the root folder
+        """
+        start = time()
+        self.nb_scanned = 0
+        found = {}
+        with ThreadPoolExecutor(max_workers=self.nb_workers) as executor:
+            pending = {executor.submit(self.scan, path, start): path}
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    path_directory = pending.pop(future)
+                    try:
+                        entry, scanned = future.result()
+                    except OSError as error:
+                        print('folder not readable: ' + path_directory + ' (' + str(error) + ')')
+                        continue
+                    self.nb_scanned += scanned
+                    found[path_directory] = entry
+                    for name, is_dir, *_ in entry['entries']:
+                        if is_dir:
+                            sub_path = os.path.join(path_directory, name)
+                            pending[executor.submit(self.scan, sub_path, start)] = sub_path
+        # the folders of the tree no longer present are forgotten
+        prefix = os.path.join(path, '')
+        for path_directory in [key for key in self.directories if key == path or key.startswith(prefix)]:
+            if path_directory not in found:
+                del self.directories[path_directory]
+        self.directories.update(found)
+
+    #########################################################################################
+
+    def bundle_members(self, path, element):
+        """
+        Curve files of a bundle, listed again only if its size or modification time changed
+        (a bundle can be rewritten without changing the modification time of its folder)
+
+        :parameters:
+            path: str
+                path of the bundle
+            element: list
+                element of the index of the bundle (name, False, size, mtime, None, members)
+        """
+        try:
+            stat = os.stat(path)
+        except OSError as error:
+            print('bundle not readable: ' + path + ' (' + str(error) + ')')
+            return []
+        element[2], element[3] = stat.st_size, stat.st_mtime_ns
+        if element[5] is None or element[5][0] != [element[2], element[3]]:
+            try:
+                files = [file for file in list_bundle(path, CURVE_NAME.pattern)
+                         if file.split('.')[-1] in CURVE_EXTENSIONS]
+            except Exception as error:
+                print('bundle not readable: ' + path + ' (' + str(error) + ')')
+                files = []
+            element[5] = [[element[2], element[3]], files]
+        return element[5][1]
+
+    #########################################################################################
+
+    def curve_files(self, path, dict_files):
+        """
+        Curve files of a tree of folders, in the order of the recursive reading of the folders,
+        grouped by name of folder (the curves of a bundle being grouped under its name)
+
+        :parameters:
+            path: str
+                path of a study folder (or of a file)
+            dict_files: dict
+                file list of each folder, completed
+
+        :return:
+            dict_files: dict
+        """
+        path = str(Path(path))
+        if not os.path.isdir(path):
+            name_file = os.path.basename(path)
+            if parse_name(name_file) is not None:
+                dict_files[os.path.basename(os.path.dirname(path))] = [path]
+            elif is_bundle(name_file):
+                stat = os.stat(path)
+                files = self.bundle_members(path, [name_file, False, stat.st_size, stat.st_mtime_ns, None, None])
+                if files:
+                    dict_files.setdefault(name_file, []).extend(files)
+            return dict_files
+        # the index is kept by absolute path, the files are given from the path of the study
+        root = os.path.abspath(path)
+        self.walk(root)
+        self.collect(root, path, dict_files)
+        self.save()
+        return dict_files
+
+    #########################################################################################
+
+    def collect(self, path_index, path_directory, dict_files):
+        """
+        Curve files of a scanned folder and of its sub-folders, each sub-folder being read
+        where it is found in the folder
+
+        :parameters:
+            path_index: str
+                absolute path of the folder in the index
+            path_directory: str
+                path of the folder given to the files
+            dict_files: dict
+                file list of each folder, completed
+        """
+        entry = self.directories.get(path_index)
+        if entry is None:
+            return
+        name_directory = os.path.basename(path_directory)
+        for element in entry['entries']:
+            file = os.path.join(path_directory, element[0])
+            if element[1]:
+                self.collect(os.path.join(path_index, element[0]), file, dict_files)
+            elif element[4] is not None:
+                dict_files.setdefault(name_directory, []).append(file)
+            elif len(element) > 5:
+                files = self.bundle_members(file, element)
+                if files:
+                    dict_files.setdefault(element[0], []).extend(files)
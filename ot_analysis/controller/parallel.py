@@ -0,0 +1,55 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# @author Thierry GALLIANO
+# @contributors Pierre-Henri PUECH, Laurent LIMOZIN, Guillaume GAY
+"""
+Execution of a function on the elements of a sequence in worker threads,
+with a bounded number of results waiting to be used
+"""
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+
+def bounded_map(function, items, nb_workers=4, max_pending=None):
+    """
+    Results of a function on each element, in the order of the elements, computed in advance
+    by worker threads. At most max_pending elements are submitted and not yet used,
+    so that the results of a long sequence are never all in memory
+
+    :parameters:
+        function: callable(item)
+            function to apply
+        items: iterable
+            elements, read as the results are used
+        nb_workers: int
+            number of worker threads (the function is called in the calling thread if lower than 2)
+        max_pending: int
+            maximum number of results computed in advance (2 * nb_workers by default)
+
+    :return:
+        (item, result, error): generator of each element with its result, or with the exception
+        raised by the function (result None)
+    """
+    if nb_workers is None or nb_workers < 2:
+        for item in items:
+            try:
+                yield item, function(item), None
+            except Exception as error:
+                yield item, None, error
+        return
+    if max_pending is None:
+        max_pending = 2 * nb_workers
+    items = iter(items)
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=nb_workers) as executor:
+        for item in items:
+            pending.append((item, executor.submit(function, item)))
+            if len(pending) >= max_pending:
+                break
+        while pending:
+            item, future = pending.popleft()
+            for next_item in items:
+                pending.append((next_item, executor.submit(function, next_item)))
+                break
+            error = future.exception()
+            yield item, None if error is not None else future.result(), error
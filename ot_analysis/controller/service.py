@@ -0,0 +1,430 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# @author Thierry GALLIANO
+# @contributors Pierre-Henri PUECH, Laurent LIMOZIN, Guillaume GAY
+"""
+Local analysis service: an HTTP server (standard library) receiving analysis jobs (list of files
+and methods) in JSON, analyzing their files in a pool of worker processes started once,
+streaming their progress and returning the rows of the output in JSON (or typed Arrow with pyarrow).
+Each worker keeps the curves it decoded, a file analyzed again being only re-analyzed
+
+usage: python -m ot_analysis.controller.service [--host 127.0.0.1] [--port 8765] [--workers 2]
+
+    POST /jobs                      {"files": [...], "methods": {...}} -> {"job": id}
+    GET  /jobs/<id>                 status of the job
+    GET  /jobs/<id>/progress        one JSON line per analyzed file, until the end of the job
+    GET  /jobs/<id>/results         rows of the output (?format=arrow for an Arrow stream)
+"""
+import argparse
+import json
+import os
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from itertools import count
+from multiprocessing import get_context
+from threading import Condition, Lock, Thread
+from urllib.parse import urlparse, parse_qs
+import pandas as pd
+from ..extractor.bundle import ARCHIVE_SEPARATOR
+from ..model.feature_table import FeatureTable, format_output, typed_frame
+from .columnar import arrow_schema, arrow_table
+from .controller import Controller
+
+# number of decoded files kept by each worker
+CACHE_SIZE = 128
+
+# curves decoded by the worker, by file and creation parameters
+DECODED = OrderedDict()
+
+
+def warm_up():
+    """
+    Empty task making a worker process import the analysis before the first job
+    """
+    return os.getpid()
+
+###############################################################################################
+
+
+def analyze_file(file, methods):
+    """
+    Analysis of a file in a worker, the curves decoded by a previous job being analyzed again
+    with the methods of this job (only the stages whose methods changed are run again).
+    A file with a problem (PB) is not kept, to be read again by the next job
+
+    :parameters:
+        file: str
+            path of the curve file
+        methods: dict
+            parameters of the analysis
+
+    :return:
+        result: dict
+            'output': rows of the output of the curves of the file,
+            'typed': the same rows with their types (typed output),
+            'types': counts of the files by type ('txt', 'jpk', 'NC', 'PB', 'INC', 'DP'),
+            'cached': True if the file was already decoded by the worker
+    """
+    stat = os.stat(file.split(ARCHIVE_SEPARATOR)[0])
+    key = (file, stat.st_size, stat.st_mtime_ns) + tuple(
+        methods.get(name, default) for name, default in
+        (('threshold_align', None), ('pulling_length', 50), ('range_baseline', 1000), ('range_std', 200)))
+    controller = Controller(None)
+    decoded = DECODED.get(key)
+    cached = decoded is not None
+    if not cached:
+        controller.create_dict_curves(methods, [file])
+        decoded = (list(controller.dict_curve.values()), set(controller.list_file_imcomplete),
+                   dict(controller.dict_type_files))
+        if not controller.dict_type_files.get('PB', 0):
+            DECODED[key] = decoded
+            if len(DECODED) > CACHE_SIZE:
+                DECODED.popitem(last=False)
+    else:
+        DECODED.move_to_end(key)
+        controller.dict_type_files = dict(decoded[2])
+        controller.list_file_imcomplete = set(decoded[1])
+        for curve in decoded[0]:
+            controller.analysis_new_curve(curve, methods, curve.features['relative_path'], file.split('.')[-1])
+    curves = list(controller.dict_curve.values())
+    typed = FeatureTable.from_curves(curves).typed_output() if curves else pd.DataFrame()
+    output = format_output(typed)
+    for incomplete in controller.list_file_imcomplete:
+        for rows in (output, typed):
+            rows.loc[incomplete, 'automatic_type'] = 'INC'
+            rows.loc[incomplete, 'type'] = 'INC'
+    return {'output': output, 'typed': typed, 'types': controller.dict_type_files, 'cached': cached}
+
+###############################################################################################
+
+
+class Job:
+    """
+    Analysis of a list of files, with its progress and its results
+    """
+
+    def __init__(self, id_job, files, methods):
+        """
+        :parameters:
+            id_job: int
+                number of the job
+            files: list(str)
+                paths of the curve files
+            methods: dict
+                parameters of the analysis
+        """
+        self.id_job = id_job
+        self.files = list(files)
+        self.methods = methods
+        self.outputs = [None] * len(self.files)
+        self.typed = [None] * len(self.files)
+        self.errors = {}
+        self.types = {}
+        self.nb_cached = 0
+        self.events = []
+        self.condition = Condition()
+
+    #########################################################################################
+
+    @property
+    def finished(self):
+        """
+        True when all the files are analyzed
+        """
+        return len(self.events) == len(self.files)
+
+    #########################################################################################
+
+    def record(self, index, future):
+        """
+        Recording of the result of a file and notification of the progress
+
+        :parameters:
+            index: int
+                position of the file in the job
+            future: Future
+                analysis of the file
+        """
+        error = future.exception()
+        with self.condition:
+            if error is None:
+                result = future.result()
+                self.outputs[index] = result['output']
+                self.typed[index] = result['typed']
+                self.nb_cached += result['cached']
+                for type_file, nb in result['types'].items():
+                    self.types[type_file] = self.types.get(type_file, 0) + nb
+            else:
+                self.errors[self.files[index]] = type(error).__name__ + ': ' + str(error)
+            self.events.append({'file': self.files[index], 'done': len(self.events) + 1,
+                                'total': len(self.files),
+                                'error': None if error is None else self.errors[self.files[index]]})
+            self.condition.notify_all()
+
+    #########################################################################################
+
+    def status(self):
+        """
+        Progress of the job
+        """
+        with self.condition:
+            return {'job': self.id_job, 'status': 'done' if self.finished else 'running',
+                    'done': len(self.events), 'total': len(self.files),
+                    'cached': self.nb_cached, 'types': dict(self.types), 'errors': dict(self.errors)}
+
+    #########################################################################################
+
+    def output(self, typed=False):
+        """
+        Rows of the output of the analyzed files, in the order of the files
+        (with their types if typed, formatted as in the output file otherwise)
+        """
+        with self.condition:
+            outputs = [output for output in (self.typed if typed else self.outputs)
+                       if output is not None and len(output) > 0]
+        return pd.concat(outputs, sort=False) if outputs else pd.DataFrame()
+
+###############################################################################################
+
+
+class AnalysisService:
+    """
+    HTTP server of the analysis jobs and pool of the worker processes
+    """
+
+    def __init__(self, host='127.0.0.1', port=8765, nb_workers=2):
+        """
+        :parameters:
+            host: str
+                address of the server (local only by default)
+            port: int
+                port of the server (0: free port chosen by the system)
+            nb_workers: int
+                number of worker processes
+        """
+        self.executor = ProcessPoolExecutor(max_workers=max(1, nb_workers), mp_context=get_context('spawn'))
+        # the workers import the analysis before the first job
+        for future in [self.executor.submit(warm_up) for _ in range(max(1, nb_workers))]:
+            future.result()
+        self.jobs = {}
+        self.lock = Lock()
+        self.numbers = count(1)
+        self.server = ThreadingHTTPServer((host, port), ServiceHandler)
+        self.server.daemon_threads = True
+        self.server.service = self
+        self.thread = None
+
+    #########################################################################################
+
+    @property
+    def address(self):
+        """
+        Address of the server (http://host:port)
+        """
+        host, port = self.server.server_address[0:2]
+        return 'http://' + host + ':' + str(port)
+
+    #########################################################################################
+
+    def submit(self, files, methods):
+        """
+        Creation of a job and submission of its files to the workers
+
+        :parameters:
+            files: list(str)
+                paths of the curve files
+            methods: dict
+                parameters of the analysis
+
+        :return:
+            job: Job
+        """
+        with self.lock:
+            job = Job(next(self.numbers), files, methods)
+            self.jobs[job.id_job] = job
+        for index, file in enumerate(job.files):
+            future = self.executor.submit(analyze_file, file, methods)
+            future.add_done_callback(lambda future, index=index: job.record(index, future))
+        return job
+
+    #########################################################################################
+
+    def start(self):
+        """
+        Launch of the server in a thread
+        """
+        self.thread = Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    #########################################################################################
+
+    def shutdown(self):
+        """
+        Stop of the server and of the workers
+        """
+        self.server.shutdown()
+        self.server.server_close()
+        self.executor.shutdown(cancel_futures=True)
+
+###############################################################################################
+
+
+class ServiceHandler(BaseHTTPRequestHandler):
+    """
+    Requests of the service
+    """
+
+    def send_json(self, content, code=200):
+        """
+        Response in JSON
+        """
+        body = json.dumps(content).encode('utf-8')
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    #########################################################################################
+
+    def job(self, parts):
+        """
+        Job of the path of the request (None after an error response)
+        """
+        job = None
+        if len(parts) >= 2 and parts[1].isdigit():
+            job = self.server.service.jobs.get(int(parts[1]))
+        if job is None:
+            self.send_json({'error': 'unknown job'}, 404)
+        return job
+
+    #########################################################################################
+
+    def do_POST(self):
+        """
+        Submission of a job
+        """
+        if urlparse(self.path).path.strip('/') != 'jobs':
+            self.send_json({'error': 'unknown path'}, 404)
+            return
+        try:
+            request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+            files = request['files']
+            methods = request['methods']
+            if not isinstance(files, list) or not isinstance(methods, dict):
+                raise ValueError('files must be a list and methods a dictionary')
+        except (ValueError, KeyError, TypeError) as error:
+            self.send_json({'error': 'bad request: ' + str(error)}, 400)
+            return
+        job = self.server.service.submit(files, methods)
+        self.send_json({'job': job.id_job, 'total': len(job.files)}, 202)
+
+    #########################################################################################
+
+    def do_GET(self):
+        """
+        Status, progress and results of a job
+        """
+        url = urlparse(self.path)
+        parts = url.path.strip('/').split('/')
+        if parts[0] != 'jobs':
+            self.send_json({'error': 'unknown path'}, 404)
+            return
+        job = self.job(parts)
+        if job is None:
+            return
+        if len(parts) == 2:
+            self.send_json(job.status())
+        elif parts[2] == 'progress':
+            self.stream_progress(job)
+        elif parts[2] == 'results':
+            self.send_results(job, parse_qs(url.query).get('format', ['json'])[0])
+        else:
+            self.send_json({'error': 'unknown path'}, 404)
+
+    #########################################################################################
+
+    def stream_progress(self, job):
+        """
+        One JSON line per analyzed file as the files are analyzed, then the status of the job
+        (response ended by the closing of the connection)
+        """
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        sent = 0
+        while True:
+            with job.condition:
+                job.condition.wait_for(lambda: len(job.events) > sent)
+                events = job.events[sent:]
+            for event in events:
+                self.wfile.write(json.dumps(event).encode('utf-8') + b'\n')
+            self.wfile.flush()
+            sent += len(events)
+            if sent == len(job.files):
+                break
+        self.wfile.write(json.dumps(job.status()).encode('utf-8') + b'\n')
+        self.close_connection = True
+
+    #########################################################################################
+
+    def send_results(self, job, format_results):
+        """
+        Rows of the output of the job, in JSON (one object per curve, its name in 'curve',
+        in the order of the files; two curves may have the same name) or as an Arrow stream
+        with the types of the typed output files and the methods of the job in its metadata
+        """
+        if not job.finished:
+            self.send_json(job.status(), 409)
+            return
+        if format_results == 'arrow':
+            try:
+                import pyarrow
+            except ImportError:
+                self.send_json({'error': 'the Arrow format requires pyarrow'}, 406)
+                return
+            output = typed_frame(job.output(typed=True))
+            table = arrow_table(output, arrow_schema(list(output.columns), job.methods))
+            sink = pyarrow.BufferOutputStream()
+            with pyarrow.ipc.new_stream(sink, table.schema) as writer:
+                writer.write_table(table)
+            body = sink.getvalue().to_pybytes()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/vnd.apache.arrow.stream')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        else:
+            rows = job.output().rename_axis('curve').reset_index().to_json(orient='records')
+            self.send_json({'job': job.id_job, 'rows': json.loads(rows), 'errors': job.status()['errors']})
+
+    #########################################################################################
+
+    def log_message(self, format_message, *args):
+        """
+        No log of each request on the standard error
+        """
+
+
+def parse_args():
+    """
+    function to add command line arguments to run the service
+    """
+    parser = argparse.ArgumentParser(description="Local analysis service")
+    parser.add_argument("--host", type=str, default='127.0.0.1', help="address of the server")
+    parser.add_argument("--port", type=int, default=8765, help="port of the server")
+    parser.add_argument("-w", "--workers", type=int, default=2, help="number of worker processes")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    SERVICE = AnalysisService(args.host, args.port, args.workers)
+    print('analysis service on ' + SERVICE.address + ' (Ctrl+C to stop)')
+    try:
+        SERVICE.server.serve_forever()
+    except KeyboardInterrupt:
+        SERVICE.shutdown()
@@ -0,0 +1,196 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# @author Thierry GALLIANO
+# @contributors Pierre-Henri PUECH, Laurent LIMOZIN, Guillaume GAY
+"""
+Distribution of the files of an analysis in shards analyzed independently (one process or node
+per shard), and merge of their results in the order of an analysis of all the files at once.
+The files of a same curve name are always in the same shard, so that the duplicates
+are detected in a shard as in the whole analysis
+"""
+import hashlib
+import json
+import os
+import re
+import zlib
+import numpy as np
+from ..extractor.bundle import ARCHIVE_SEPARATOR, member_name
+from .discovery import parse_name
+
+# modes of distribution of the files
+SHARD_MODES = ('hash', 'directory')
+
+# name of the journal of a shard
+JOURNAL_NAME = re.compile(r'^shard_\d{3}_of_\d{3}\.json$')
+
+
+def shard_name(shard, nb_shards):
+    """
+    Name of the files of a shard, without extension
+    """
+    return 'shard_' + format(shard, '03d') + '_of_' + format(nb_shards, '03d')
+
+###############################################################################################
+
+
+def shard_key(file):
+    """
+    Key of the distribution of a file: name of its curve (name of the file if not a curve)
+    """
+    name_file = member_name(file)
+    metadata = parse_name(name_file)
+    return name_file if metadata is None else metadata['name']
+
+###############################################################################################
+
+
+def files_digest(files):
+    """
+    Digest of the list of the files of the analysis, identical on all the nodes if they found
+    the same files in the same order
+    """
+    return hashlib.sha256('\n'.join(files).encode('utf-8')).hexdigest()
+
+###############################################################################################
+
+
+def partition(files, nb_shards, mode='hash'):
+    """
+    Shard of each file, deterministic (same shards on all the nodes)
+
+    :parameters:
+        files: list(str)
+            files of the analysis
+        nb_shards: int
+            number of shards
+        mode: str
+            'hash': by hash of the curve name, 'directory': folders distributed by size
+            (largest first in the lightest shard)
+
+    :return:
+        shards: list(int)
+            shard of each file
+    """
+    if mode not in SHARD_MODES:
+        raise ValueError('mode of distribution ' + str(mode) + ' not in ' + ', '.join(SHARD_MODES))
+    keys = [shard_key(file) for file in files]
+    if mode == 'hash':
+        return [zlib.crc32(key.encode('utf-8')) % nb_shards for key in keys]
+    # a curve name is kept in the folder where it appears first
+    directories = {}
+    for file, key in zip(files, keys):
+        directories.setdefault(key, os.path.dirname(file.split(ARCHIVE_SEPARATOR)[0]))
+    sizes = {}
+    for file, key in zip(files, keys):
+        try:
+            size = os.path.getsize(file.split(ARCHIVE_SEPARATOR)[0])
+        except OSError:
+            size = 0
+        sizes[directories[key]] = sizes.get(directories[key], 0) + size
+    loads = [0] * nb_shards
+    shard_directories = {}
+    for directory in sorted(sizes, key=lambda directory: (-sizes[directory], directory)):
+        shard = min(range(nb_shards), key=lambda index: (loads[index], index))
+        shard_directories[directory] = shard
+        loads[shard] += sizes[directory]
+    return [shard_directories[directories[key]] for key in keys]
+
+###############################################################################################
+
+
+def file_position(relative_path, positions):
+    """
+    Position in the analysis of the file of a curve (archive of a curve of a force map)
+
+    :parameters:
+        relative_path: str
+            path of the file of the curve
+        positions: dict
+            position of each file of the analysis
+    """
+    while relative_path not in positions and ARCHIVE_SEPARATOR in relative_path:
+        relative_path = relative_path.rsplit(ARCHIVE_SEPARATOR, 1)[0]
+    return positions.get(relative_path, len(positions))
+
+###############################################################################################
+
+
+def write_journal(name_file, journal):
+    """
+    Writing of the journal of a shard (temporary file renamed, never partially written)
+    """
+    with open(name_file + '.tmp', 'w') as file_journal:
+        json.dump(journal, file_journal, indent=1, default=str)
+    os.replace(name_file + '.tmp', name_file)
+
+###############################################################################################
+
+
+def json_value(value):
+    """
+    Value of a record of a curve in JSON (numpy values as Python values, others as text)
+    """
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    return str(value)
+
+###############################################################################################
+
+
+def write_partial(name_file, partial):
+    """
+    Writing of the partial results of a shard in JSON (records of the curves in the order of the shard,
+    incomplete files, counts of the files by type), data only, read without executing anything
+    """
+    with open(name_file + '.tmp', 'w') as file_partial:
+        json.dump(partial, file_partial, default=json_value)
+    os.replace(name_file + '.tmp', name_file)
+
+###############################################################################################
+
+
+def read_shards(path_directory):
+    """
+    Journals and partial results of the shards of a folder, checked complete and consistent
+
+    :parameters:
+        path_directory: str
+            folder of the results of the shards
+
+    :return:
+        journals: list(dict)
+            journal of each shard, in the order of the shards
+        partials: list(dict)
+            partial results of each shard
+    """
+    journals = []
+    for name in sorted(os.listdir(path_directory)):
+        if JOURNAL_NAME.match(name):
+            with open(os.path.join(path_directory, name), 'r') as file_journal:
+                journals.append(json.load(file_journal))
+    if not journals:
+        raise ValueError('no shard in ' + str(path_directory))
+    # journals of another run (other number of shards) would merge stale results
+    numbers = sorted(set(journal['nb_shards'] for journal in journals))
+    if len(numbers) > 1:
+        raise ValueError('shards of different runs (' + ', '.join(str(number) for number in numbers) +
+                         ' shards) in ' + str(path_directory))
+    nb_shards = numbers[0]
+    shards = sorted(journal['shard'] for journal in journals)
+    if shards != list(range(nb_shards)):
+        raise ValueError('missing shards: ' + ', '.join(
+            str(shard) for shard in range(nb_shards) if shard not in shards))
+    journals = sorted(journals, key=lambda journal: journal['shard'])
+    for key in ('digest', 'methods', 'mode'):
+        if any(journal[key] != journals[0][key] for journal in journals):
+            raise ValueError('shards with different ' + key)
+    unfinished = [str(journal['shard']) for journal in journals if journal['status'] != 'done']
+    if unfinished:
+        raise ValueError('shards not finished: ' + ', '.join(unfinished))
+    partials = []
+    for journal in journals:
+        with open(os.path.join(path_directory, journal['partial']), 'r') as file_partial:
+            partials.append(json.load(file_partial))
+    return journals, partials
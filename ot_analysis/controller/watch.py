@@ -0,0 +1,228 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# @author Thierry GALLIANO
+# @contributors Pierre-Henri PUECH, Laurent LIMOZIN, Guillaume GAY
+"""
+Analysis of the curves of an acquisition folder as they are recorded: the folder is polled,
+a new file is analyzed once its size and modification time no longer change, its row is appended
+to the output file and the counts of the classifications are updated
+"""
+import os
+from datetime import datetime
+from os import sep
+from pathlib import Path
+from time import time, sleep
+import pandas as pd
+from ..extractor.bundle import ARCHIVE_SEPARATOR
+from ..model.feature_table import FeatureTable, format_output, output_header
+from ..model.sweep import TYPES
+from .columnar import ColumnarWriter
+from .discovery import DirectoryIndex
+
+# columns of the running counts, after the classifications
+COUNT_COLUMNS = TYPES + ('INC', 'AL_No', 'nb')
+
+
+class FolderWatcher:
+    """
+    Polling of an acquisition folder and incremental analysis of its completed curve files
+    """
+
+    def __init__(self, controller, path, methods, path_directory, interval=1.0, stable_polls=2, settle=1.0,
+                 output_format=None):
+        """
+        :parameters:
+            controller: Controller
+                controller analyzing the curves (its curves are kept between two polls)
+            path: str
+                acquisition folder
+            methods: dict
+                parameters of the analysis
+            path_directory: str
+                folder of the output files
+            interval: float
+                duration (s) between two polls
+            stable_polls: int
+                number of successive polls where a file must have the same size and modification time
+            settle: float
+                minimum age (s) of the last modification of a file before its analysis
+            output_format: str
+                format of the typed file written alongside the output file, one row group
+                per analysis: 'parquet', 'feather' or 'npz' (csv only if None)
+        """
+        self.controller = controller
+        self.path = str(path)
+        self.methods = methods
+        self.interval = interval
+        self.stable_polls = max(1, stable_polls)
+        self.settle = settle
+        self.index = DirectoryIndex(None, methods.get('nb_workers', 4))
+        # size, modification time and number of polls without change of the files not analyzed yet
+        self.observed = {}
+        self.analyzed = set()
+        self.columns = None
+        self.counts = pd.DataFrame(columns=COUNT_COLUMNS, dtype=int)
+        self.counts.index.name = 'couple'
+        today = datetime.now().strftime("%d-%m-%Y_%H-%M-%S")
+        Path(path_directory).mkdir(parents=True, exist_ok=True)
+        self.name_output = str(path_directory) + sep + 'output_watch_' + today + '.csv'
+        self.name_counts = str(path_directory) + sep + 'counts_watch_' + today + '.csv'
+        self.writer = None
+        # typed rows of incomplete files waiting for the first curve (columns of the typed file)
+        self.typed_pending = []
+        if output_format is not None:
+            self.writer = ColumnarWriter(str(path_directory) + sep + 'output_watch_' + today, output_format, methods)
+        self.latencies = []
+
+    #########################################################################################
+
+    def poll(self):
+        """
+        Files completed since the previous poll (size and modification time stable)
+
+        :return:
+            completed: list(str)
+                files ready for the analysis, in the order of the discovery
+        """
+        dict_files = self.index.curve_files(self.path, {})
+        completed = []
+        now = time()
+        for files in dict_files.values():
+            for file in files:
+                if file in self.analyzed:
+                    continue
+                try:
+                    stat = os.stat(file.split(ARCHIVE_SEPARATOR)[0])
+                except OSError:
+                    self.observed.pop(file, None)
+                    continue
+                state = (stat.st_size, stat.st_mtime_ns)
+                previous = self.observed.get(file)
+                nb_stable = previous[1] + 1 if previous is not None and previous[0] == state else 1
+                self.observed[file] = (state, nb_stable)
+                if nb_stable >= self.stable_polls and now - stat.st_mtime >= self.settle:
+                    completed.append(file)
+        return completed
+
+    #########################################################################################
+
+    def analyze(self, files):
+        """
+        Analysis of completed files, their rows being appended to the output file
+        and their classifications added to the counts
+
+        :parameters:
+            files: list(str)
+                completed files
+
+        :return:
+            output: DataFrame
+                rows of the new curves
+        """
+        names = set(self.controller.dict_curve)
+        self.controller.create_dict_curves(self.methods, files)
+        for file in files:
+            self.analyzed.add(file)
+            self.latencies.append(time() - self.observed.pop(file)[0][1] / 1e9)
+        curves = [curve for name, curve in self.controller.dict_curve.items() if name not in names]
+        typed = FeatureTable.from_curves(curves).typed_output() if curves else pd.DataFrame()
+        output = format_output(typed)
+        for incomplete in self.controller.list_file_imcomplete:
+            output.loc[incomplete, 'automatic_type'] = 'INC'
+            output.loc[incomplete, 'type'] = 'INC'
+            typed.loc[incomplete, 'automatic_type'] = 'INC'
+            typed.loc[incomplete, 'type'] = 'INC'
+        if len(output) == 0:
+            return output
+        # header of the output of the model (a first file incomplete has only its type)
+        if self.columns is None:
+            self.columns = output_header(self.methods.get('model'))
+        new_columns = [name for name in output.columns if name not in self.columns]
+        for name in new_columns:
+            # after the column preceding it in the output of the curves
+            previous = list(output.columns).index(name) - 1
+            self.columns.insert(self.columns.index(output.columns[previous]) + 1 if previous >= 0 else 0, name)
+        if new_columns:
+            if os.path.exists(self.name_output):
+                # rows already written, rewritten with the new columns
+                written = pd.read_csv(self.name_output, sep='\t', header=0, index_col=0, dtype=str,
+                                      keep_default_na=False)
+                written.reindex(columns=self.columns).to_csv(self.name_output, sep='\t', encoding='utf-8',
+                                                             na_rep="NaN")
+        output = output.reindex(columns=self.columns)
+        if self.writer is not None:
+            # the columns of the typed file are those of the header when it receives its first curve
+            self.typed_pending.append(typed)
+            if curves:
+                self.write_typed()
+        if os.path.exists(self.name_output):
+            output.to_csv(self.name_output, sep='\t', encoding='utf-8', na_rep="NaN", mode='a', header=False)
+        else:
+            output.to_csv(self.name_output, sep='\t', encoding='utf-8', na_rep="NaN")
+        self.update_counts(output)
+        return output
+
+    #########################################################################################
+
+    def write_typed(self):
+        """
+        Appending of the typed rows waiting to the typed file, as one row group
+        """
+        if self.typed_pending:
+            self.writer.write(pd.concat(self.typed_pending).reindex(columns=self.columns))
+            self.typed_pending = []
+
+    #########################################################################################
+
+    def update_counts(self, output):
+        """
+        Addition of new rows to the counts of the classifications of each couple bead/cell
+        and of all the curves
+
+        :parameters:
+            output: DataFrame
+                rows of the new curves
+        """
+        couples = output['couple'].fillna('NaN') if 'couple' in output else pd.Series('NaN', index=output.index)
+        counts = pd.DataFrame(0, index=couples.unique(), columns=COUNT_COLUMNS)
+        for couple, type_curve, alignment in zip(couples, output['automatic_type'],
+                                                 output.get('automatic_AL', [None] * len(output))):
+            if type_curve in counts.columns:
+                counts.loc[couple, type_curve] += 1
+            counts.loc[couple, 'AL_No'] += int(alignment == 'No')
+            counts.loc[couple, 'nb'] += 1
+        self.counts = self.counts.add(counts, fill_value=0).astype(int)
+        self.counts.index.name = 'couple'
+        self.counts.to_csv(self.name_counts, sep='\t', encoding='utf-8')
+        total = self.counts.sum()
+        adhesion = total['AD'] + total['FTU'] + total['ITU']
+        print('watch: ' + str(total['nb']) + ' curves, ' + ', '.join(
+            name + ' ' + str(total[name]) for name in COUNT_COLUMNS[:-1]) +
+            ', adhesion ' + format(100 * adhesion / max(total['nb'], 1), '.0f') + '%, tubes ' +
+            format(100 * (total['FTU'] + total['ITU']) / max(total['nb'], 1), '.0f') + '%')
+
+    #########################################################################################
+
+    def run(self, duration=None):
+        """
+        Polling of the folder until the end of the duration (until an interruption if None)
+
+        :parameters:
+            duration: float
+                duration (s) of the watch
+        """
+        start = time()
+        print('watch of ' + self.path + ' (Ctrl+C to stop)')
+        try:
+            while duration is None or time() - start < duration:
+                files = self.poll()
+                if files:
+                    self.analyze(files)
+                sleep(self.interval)
+        except KeyboardInterrupt:
+            print('end of the watch')
+        finally:
+            if self.writer is not None:
+                self.write_typed()
+                self.writer.close()
+        return self.counts
@@ -0,0 +1,295 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# @author Thierry GALLIANO
+# @contributors Pierre-Henri PUECH, Laurent LIMOZIN, Guillaume GAY
+"""
+Access to the curve files inside bundles (zip or tar archives of curve files, possibly nested)
+without extraction to disk: a file in a bundle is designated by the path of the bundle followed
+by the path of the file in it, separated by ARCHIVE_SEPARATOR (bundle.zip::b1c1-....jpk-nt-force,
+outer.tar::inner.zip::b1c1-....jpk-nt-force). During an analysis, a BundleReader reads each
+bundle once, in the order of its files, instead of opening it again for each file
+"""
+import re
+import tarfile
+from collections import OrderedDict
+from io import BytesIO
+from threading import Lock
+from zipfile import ZipFile, is_zipfile
+
+# separator between the path of an archive and the path of a file inside it
+ARCHIVE_SEPARATOR = '::'
+
+# extensions of the bundles
+BUNDLE_EXTENSIONS = ('.zip', '.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tar.xz')
+
+# readers of the bundles of the analyses in progress, used by open_member
+READERS = []
+
+# number of files kept by a reader after their reading (copies of the rejected files)
+NB_RECENT = 16
+
+# maximum number of bytes kept in memory by a reader (files read ahead, last files read, inner bundles)
+MAX_BUFFERED = 256 * 2**20
+
+
+def is_bundle(name):
+    """
+    True if the name is the name of a bundle
+    """
+    return str(name).lower().endswith(BUNDLE_EXTENSIONS)
+
+###############################################################################################
+
+
+def member_name(path):
+    """
+    Name of a file, or of a file in a bundle, without the folders
+    """
+    return re.split(r'[\\/]', str(path).split(ARCHIVE_SEPARATOR)[-1])[-1]
+
+###############################################################################################
+
+
+def open_stream(stream, member):
+    """
+    Seekable stream of a file of a bundle
+
+    :parameters:
+        stream: file
+            seekable binary stream of the bundle
+        member: str
+            path of the file in the bundle
+
+    :return:
+        member_stream: file
+            stream read directly in the bundle when it is seekable (zip, uncompressed tar),
+            in memory otherwise
+    """
+    stream.seek(0)
+    if is_zipfile(stream):
+        member_stream = ZipFile(stream).open(member)
+    else:
+        stream.seek(0)
+        member_stream = tarfile.open(fileobj=stream).extractfile(member)
+    if not member_stream.seekable():
+        member_stream = BytesIO(member_stream.read())
+    return member_stream
+
+###############################################################################################
+
+
+def open_member(path, in_memory=True):
+    """
+    Binary stream of a file, or of a file in (nested) bundles, read through the BundleReader
+    of the analysis in progress when it is one of its files
+
+    :parameters:
+        path: str
+            path of the file (bundle, ARCHIVE_SEPARATOR, path in the bundle...)
+        in_memory: bool
+            True to read the file of the last bundle in memory (curve file, a few Mo),
+            False to read it in the bundle (inner bundle)
+
+    :return:
+        stream: file
+            seekable binary stream
+    """
+    parts = str(path).split(ARCHIVE_SEPARATOR)
+    for reader in list(READERS if in_memory else []):
+        content = reader.read(str(path))
+        if content is not None:
+            return BytesIO(content)
+    file = open(parts[0], 'rb')
+    stream = file
+    for member in parts[1:]:
+        stream = open_stream(stream, member)
+    if in_memory and len(parts) > 1:
+        stream.seek(0)
+        stream = BytesIO(stream.read())
+        file.close()
+    return stream
+
+###############################################################################################
+
+
+def list_bundle(path, pattern=None):
+    """
+    Files of a bundle, the inner bundles being listed recursively
+
+    :parameters:
+        path: str
+            path of the bundle (possibly inside another bundle)
+        pattern: str
+            regular expression that the names of the files must match (all the files if None)
+
+    :return:
+        files: list(str)
+            path of each file (path of the bundle, ARCHIVE_SEPARATOR, path in the bundle)
+    """
+    with open_member(path, False) as stream:
+        if is_zipfile(stream):
+            names = [name for name in ZipFile(stream).namelist() if not name.endswith('/')]
+        else:
+            stream.seek(0)
+            names = [member.name for member in tarfile.open(fileobj=stream) if member.isfile()]
+    files = []
+    for name in names:
+        file = str(path) + ARCHIVE_SEPARATOR + name
+        if is_bundle(name):
+            files += list_bundle(file, pattern)
+        elif pattern is None or re.match(pattern, member_name(name)):
+            files.append(file)
+    return files
+
+###############################################################################################
+
+
+class BundleReader:
+    """
+    Reading of the files of the bundles of an analysis with one opening of each bundle:
+    a tar bundle is read as a stream (decompressed once, in the order of its files),
+    a zip bundle is kept open. The files read before being requested (files requested
+    out of the order of the bundle) are kept in memory until their reading, the last files read
+    a little longer (copy of a rejected file after its reading).
+    The files and inner bundles kept in memory hold at most MAX_BUFFERED bytes: beyond, a file
+    is not kept and open_member opens its bundle again to read it.
+    While the reader is used as a context, open_member reads the files of its bundles through it
+    """
+
+    def __init__(self, files):
+        """
+        :parameters:
+            files: list(str)
+                files of the analysis (only the files in bundles are read by the reader)
+        """
+        self.wanted = set()
+        for file in files:
+            parts = str(file).split(ARCHIVE_SEPARATOR)
+            # the inner bundles are read once too
+            for index in range(2, len(parts) + 1):
+                self.wanted.add(ARCHIVE_SEPARATOR.join(parts[0:index]))
+        self.archives = {}
+        self.contents = {}
+        self.recent = OrderedDict()
+        self.streams = []
+        self.nb_opens = 0
+        self.nb_buffered = 0
+        self.lock = Lock()
+
+    #########################################################################################
+
+    def __enter__(self):
+        READERS.append(self)
+        return self
+
+    #########################################################################################
+
+    def __exit__(self, *args):
+        READERS.remove(self)
+        self.close()
+
+    #########################################################################################
+
+    def archive(self, path):
+        """
+        Opened bundle (ZipFile, or iterator of the files of a tar stream with the TarFile)
+        """
+        if path not in self.archives:
+            if ARCHIVE_SEPARATOR in path:
+                content = self.read_locked(path)
+                if self.nb_buffered + len(content) > MAX_BUFFERED:
+                    # inner bundle too large to be kept: its files are opened again by open_member
+                    prefix = path + ARCHIVE_SEPARATOR
+                    self.wanted = {name for name in self.wanted if not name.startswith(prefix)}
+                    raise KeyError(path)
+                self.nb_buffered += len(content)
+                stream = BytesIO(content)
+            else:
+                stream = open(path, 'rb')
+                self.streams.append(stream)
+                self.nb_opens += 1
+            if is_zipfile(stream):
+                self.archives[path] = ZipFile(stream)
+            else:
+                stream.seek(0)
+                tar = tarfile.open(fileobj=stream, mode='r|*')
+                self.archives[path] = (tar, iter(tar))
+        return self.archives[path]
+
+    #########################################################################################
+
+    def read_locked(self, path):
+        """
+        Content of a file of a bundle, the lock of the reader being held
+        """
+        if path in self.contents:
+            content = self.contents.pop(path)
+            self.nb_buffered -= len(content)
+            return content
+        bundle, member = path.rsplit(ARCHIVE_SEPARATOR, 1)
+        archive = self.archive(bundle)
+        if isinstance(archive, ZipFile):
+            return archive.read(member)
+        tar, members = archive
+        for tar_member in members:
+            name = bundle + ARCHIVE_SEPARATOR + tar_member.name
+            if not tar_member.isfile() or name not in self.wanted:
+                continue
+            if name != path and self.nb_buffered + tar_member.size > MAX_BUFFERED:
+                # not kept: opened again by open_member
+                self.wanted.discard(name)
+                continue
+            content = tar.extractfile(tar_member).read()
+            if name == path:
+                return content
+            self.contents[name] = content
+            self.nb_buffered += len(content)
+        raise KeyError(path)
+
+    #########################################################################################
+
+    def read(self, path):
+        """
+        Content of a file of the bundles of the analysis
+
+        :parameters:
+            path: str
+                path of the file (bundle, ARCHIVE_SEPARATOR, path in the bundle...)
+
+        :return:
+            content: bytes
+                content of the file, None if it is not a file of the analysis or if it was
+                read long ago (the file is then opened again by open_member)
+        """
+        with self.lock:
+            if path in self.recent:
+                return self.recent[path]
+            if path not in self.wanted:
+                return None
+            try:
+                content = self.read_locked(path)
+            except KeyError:
+                return None
+            # a file is read once in its bundle
+            self.wanted.discard(path)
+            self.recent[path] = content
+            self.nb_buffered += len(content)
+            while self.recent and (len(self.recent) > NB_RECENT or self.nb_buffered > MAX_BUFFERED):
+                self.nb_buffered -= len(self.recent.popitem(last=False)[1])
+            return content
+
+    #########################################################################################
+
+    def close(self):
+        """
+        Closing of the bundles
+        """
+        for archive in self.archives.values():
+            (archive if isinstance(archive, ZipFile) else archive[0]).close()
+        for stream in self.streams:
+            stream.close()
+        self.archives = {}
+        self.contents = {}
+        self.recent = OrderedDict()
+        self.streams = []
+        self.nb_buffered = 0
@@ -5,10 +5,19 @@
 """
 JPK archive extractor for comprehensive processing of optical tweezer curves
 """
+import re
+from copy import deepcopy
 from pathlib import Path
 from zipfile import ZipFile
 import numpy as np
 from struct import unpack_from
+from io import BytesIO
+from threading import Lock
+from .bundle import ARCHIVE_SEPARATOR, open_member, member_name
+from .zip_reader import read_members
+
+# extensions of the archives holding several force curves (force map, QI data)
+MAP_EXTENSIONS = ('jpk-force-map', 'jpk-qi-data')
 
 ################################################################################################################################
 ################################################################################################################################
@@ -252,31 +261,49 @@ class JPKFile:
 
     """
 
-    def __init__(self, compressed_repository):
+    def __init__(self, compressed_repository, force_map=None, index=None):
         """
         Initializes JPKFile object.
         
         :parameters: 
             compressed_repository: str
                 Filename of archive to read data from.
+            force_map: JPKForceMap
+                archive of several curves holding the curve (None for a single curve archive)
+            index: int
+                index of the curve in the force map
         """
-        self.jpk_zip = ZipFile(compressed_repository)
-        self.data = None
         #: Dictionary containing parameters read from the top level
         #: ``header.properties`` file.
         self.parameters = {}
         self.headers = {}
-        self.headers['title'] = compressed_repository.__str__().split(
-            "/")[-1].replace(".jpk-nt-force", "")
+        self.data = None
         #: Number of segments in archive.
         self.num_segments = 0
         #: Dictionary containing one JPKSegment instance per segment.
         self.segments = []
         #: ``None`` if no shared header is present, dictionary containing parameters otherwise.
         self.shared_parameters = None
-
-        # create list of file names in archive (strings, not only file handles).
-        list_of_filenames = self.jpk_zip.namelist()
+        #: folder of the curve in the archive
+        self.prefix = ''
+        #: content of the files of the curve read in the order of the archive
+        self.contents = {}
+        self.force_map = force_map
+        if force_map is None:
+            # archive on disk or in a bundle (read from memory)
+            self.jpk_zip = ZipFile(open_member(compressed_repository))
+            self.headers['title'] = member_name(compressed_repository).replace(".jpk-nt-force", "")
+            # create list of file names in archive (strings, not only file handles).
+            list_of_filenames = self.jpk_zip.namelist()
+        else:
+            # the shared header of the force map is parsed once for all its curves
+            self.jpk_zip = force_map.jpk_zip
+            self.headers['title'] = force_map.title + '-' + str(index)
+            self.prefix = force_map.prefix(index)
+            self.shared_parameters = deepcopy(force_map.shared_parameters)
+            self.headers['shared'] = force_map.headers['shared']
+            self.headers['calibrations'] = force_map.headers['calibrations']
+            list_of_filenames = list(force_map.members[index])
 
         self.read_files(list_of_filenames)
 
@@ -291,6 +318,25 @@ class JPKFile:
         self.headers["header_global"]
         self.segments
 
+        :parameters:
+            list_of_filenames: list
+                list of files in the archive to browse
+        """
+        # files read in a few sequential reads rather than one seek per file
+        self.contents = read_members(self.jpk_zip, [self.prefix + fname for fname in list_of_filenames
+                                                    if not fname.endswith('/')],
+                                     None if self.force_map is None else self.force_map.lock)
+        try:
+            self.read_contents(list_of_filenames)
+        finally:
+            self.contents = {}
+
+    #####################################################################################################
+
+    def read_contents(self, list_of_filenames):
+        """
+        Processing of the files of the curve read by read_files
+
         :parameters:
             list_of_filenames: list
                 list of files in the archive to browse
@@ -298,13 +344,17 @@ class JPKFile:
         # top header should also be present and the first file in the filelist.
         top_header = list_of_filenames.pop(
             list_of_filenames.index('header.properties'))
-        top_header_f = self.jpk_zip.open(top_header)
+        top_header_f = self.open_member(top_header)
         top_header_content = top_header_f.readlines()
         top_header_content = JPKFile.decode_binary_strings(top_header_content)
 
         # parse content of top header file to self.parameters.
         self.parameters, self.headers["header_global"] = JPKFile.parse_header_file(
             top_header_content, "header")
+        if self.force_map is not None:
+            # settings of the force map completed by those of the curve
+            self.headers["header_global"] = dict(self.force_map.headers["header_global"],
+                                                 **self.headers["header_global"])
         # if shared header is present ...
         if list_of_filenames.count("shared-data/header.properties"):
             self.parse_shared_header(list_of_filenames)
@@ -340,6 +390,20 @@ class JPKFile:
 
     #####################################################################################################
 
+    def open_member(self, fname):
+        """
+        Opening of a file of the curve in the archive
+
+        :parameters:
+            fname: str
+                name of the file relative to the folder of the curve
+        """
+        if self.prefix + fname in self.contents:
+            return BytesIO(self.contents[self.prefix + fname])
+        return self.jpk_zip.open(self.prefix + fname)
+
+    #####################################################################################################
+
     @staticmethod
     def decode_binary_strings(list_of_binary_strings):
         """
@@ -398,7 +462,10 @@ class JPKFile:
         for line in content[start + 1:]:
             key_header = ""
             key, value = str(line).split('=')
-            if choice_parse == "header":
+            if choice_parse == "map":
+                # settings of the force map named as those of a single curve
+                key_header = key.split('.', 1)[-1].replace("settings.force-settings.", "settings.")
+            elif choice_parse == "header":
                 if len(key.split('.')) > 3:
                     key_header = key.split('header')[1].replace(
                         ".force-settings", "settings")
@@ -447,19 +514,43 @@ class JPKFile:
         shared_header = list_of_filenames.pop(
             list_of_filenames.index("shared-data/header.properties")
         )
-        shared_header_f = self.jpk_zip.open(shared_header)
+        self.shared_parameters, self.headers["shared"], self.headers['calibrations'] = \
+            JPKFile.read_shared_header(self.jpk_zip, shared_header)
+
+    #####################################################################################################
+
+    @staticmethod
+    def read_shared_header(jpk_zip, shared_header):
+        """
+        Decoding and parsing of the conversion and calibration file of an archive
+
+        :parameters:
+            jpk_zip: ZipFile
+                archive
+            shared_header: str
+                name of the file in the archive
+
+        :return:
+            shared_parameters: dict
+                multi-layer dictionary of the conversions
+            header_shared: dict
+                single layer dictionary of the file
+            calibrations: dict
+                sensitivity and stiffness of each channel
+        """
+        shared_header_f = jpk_zip.open(shared_header)
         shared_header_content = shared_header_f.readlines()
         shared_header_content = JPKFile.decode_binary_strings(
             shared_header_content)
         # Parse header content to dictionary.
-        self.shared_parameters, self.headers["shared"] = JPKFile.parse_header_file(
+        shared_parameters, header_shared = JPKFile.parse_header_file(
             shared_header_content, "shared")
         # print(self.shared_parameters)
-        nb_features = int(self.headers["shared"]['lcd-infos.count'])-1
+        nb_features = int(header_shared['lcd-infos.count'])-1
         calibrations = {}
-        for k, v in self.headers["shared"].items():
+        for k, v in header_shared.items():
             for index_feature in range(0, nb_features, 1):
-                name_feature = self.headers["shared"][str(
+                name_feature = header_shared[str(
                     index_feature) + '.channel.name']
                 if k == str(index_feature) + '.conversion-set.conversion.distance.scaling.multiplier':
                     k = name_feature + '_sensitivity'
@@ -467,7 +558,7 @@ class JPKFile:
                 if k == str(index_feature) + '.conversion-set.conversion.force.scaling.multiplier':
                     k = name_feature + '_stiffness'
                     calibrations[k] = v
-        self.headers['calibrations'] = calibrations
+        return shared_parameters, header_shared, calibrations
 
     #####################################################################################################
 
@@ -482,7 +573,7 @@ class JPKFile:
             fname: str(file)
                 header file to decode and parse
         """
-        header_f = self.jpk_zip.open(fname)
+        header_f = self.open_member(fname)
         header_content = header_f.readlines()
         header_content = JPKFile.decode_binary_strings(header_content)
         segment.parameters, segment.header = JPKFile.parse_header_file(
@@ -556,7 +647,7 @@ class JPKFile:
                 file to analyze and decode
         """
         channel_label = split[3][:-4]
-        data_f = self.jpk_zip.open(fname)
+        data_f = self.open_member(fname)
         content = data_f.read()
         # if debug:
         #     print(segment_number, channel_label)
@@ -725,6 +816,91 @@ class JPKFile:
                 a[key] = b[key]
 
 
+################################################################################################################################
+################################################################################################################################
+
+
+class JPKForceMap:
+    """
+    Class to handle an archive of several force curves (force map, QI data) whose curves are stored
+    in indexed folders (``index/<n>/header.properties``, ``index/<n>/segments/...``)
+    with one shared header. The curves are read one at a time, on demand
+    """
+
+    def __init__(self, compressed_repository):
+        """
+        Reading of the header of the force map and of the shared header, listing of the curves
+
+        :parameters:
+            compressed_repository: str
+                Filename of archive to read data from.
+        """
+        self.path = compressed_repository.__str__()
+        # archive on disk or in a bundle (read in the bundle, the curves being read on demand)
+        self.jpk_zip = ZipFile(open_member(self.path, False))
+        #: lock of the archive, whose curves are read by several threads
+        self.lock = Lock()
+        self.title = re.sub(r'\.(' + '|'.join(MAP_EXTENSIONS) + ')$', '', member_name(self.path))
+        self.headers = {}
+        list_of_filenames = self.jpk_zip.namelist()
+        top_header_content = JPKFile.decode_binary_strings(self.jpk_zip.open('header.properties').readlines())
+        self.parameters, self.headers['header_global'] = JPKFile.parse_header_file(top_header_content, "map")
+        self.shared_parameters, self.headers['shared'], self.headers['calibrations'] = \
+            JPKFile.read_shared_header(self.jpk_zip, "shared-data/header.properties")
+        #: files of each curve, relative to its folder
+        self.members = {}
+        for fname in list_of_filenames:
+            split = fname.split("/", 2)
+            if len(split) == 3 and split[0] == "index" and split[1].isdigit() and split[2] != '':
+                self.members.setdefault(int(split[1]), []).append(split[2])
+        self.indexes = sorted(index for index, members in self.members.items()
+                              if 'header.properties' in members)
+
+    #################################################################################################################
+
+    def __len__(self):
+        """
+        Number of curves in the archive
+        """
+        return len(self.indexes)
+
+    #################################################################################################################
+
+    @staticmethod
+    def prefix(index):
+        """
+        Folder of a curve in the archive
+        """
+        return 'index/' + str(index) + '/'
+
+    #################################################################################################################
+
+    def curve(self, index):
+        """
+        Extraction of a curve of the archive
+
+        :parameters:
+            index: int
+                index of the curve
+
+        :return:
+            jpk_file: JPKFile
+                curve with its segments, as read from a single curve archive
+        """
+        return JPKFile(self.path + ARCHIVE_SEPARATOR + self.prefix(index), self, index)
+
+    #################################################################################################################
+
+    def curves(self):
+        """
+        Generator of the curves of the archive, extracted one at a time
+
+        :return:
+            (index, jpk_file): index of the curve and its JPKFile
+        """
+        for index in self.indexes:
+            yield index, self.curve(index)
+
 if __name__ == "__main__":
     PATH_FILE = Path("../data_test/jpk_nt_force/")
     FILE = PATH_FILE / "b3c3-2021.06.07-14.50.58.217.jpk-nt-force"
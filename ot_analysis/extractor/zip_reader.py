@@ -0,0 +1,122 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# @author Thierry GALLIANO
+# @contributors Pierre-Henri PUECH, Laurent LIMOZIN, Guillaume GAY
+"""
+Reading of several members of a zip archive in the order of their position in the archive:
+the members are located with the central directory, the close members are read together
+in a few sequential reads and decompressed in memory (no back and forth seeks on slow storages)
+"""
+import zlib
+from contextlib import nullcontext
+from struct import unpack_from
+from zipfile import ZIP_STORED, ZIP_DEFLATED, BadZipFile, sizeFileHeader, structFileHeader
+
+# members closer than this number of bytes are read in a single read
+MAX_GAP = 64 * 1024
+
+
+def read_plan(jpk_zip, names, max_gap=MAX_GAP):
+    """
+    Ranges of the archive to read to get some of its members
+
+    :parameters:
+        jpk_zip: ZipFile
+            archive
+        names: list(str)
+            names of the members to read
+        max_gap: int
+            maximum number of unused bytes read between two members of a same range
+
+    :return:
+        ranges: list(tuple(int, int, list(ZipInfo)))
+            start, end and members of each range, in the order of the archive
+    """
+    infos = sorted(jpk_zip.infolist(), key=lambda info: info.header_offset)
+    # a member ends where the next one (or the central directory) starts
+    ends = {info.header_offset: following.header_offset for info, following in zip(infos, infos[1:])}
+    if infos:
+        ends[infos[-1].header_offset] = jpk_zip.start_dir
+    required = sorted((jpk_zip.getinfo(name) for name in set(names)), key=lambda info: info.header_offset)
+    ranges = []
+    for info in required:
+        end = ends[info.header_offset]
+        if ranges and info.header_offset - ranges[-1][1] <= max_gap:
+            ranges[-1][1] = end
+            ranges[-1][2].append(info)
+        else:
+            ranges.append([info.header_offset, end, [info]])
+    return [tuple(plan_range) for plan_range in ranges]
+
+###############################################################################################
+
+
+def decompress(info, block, offset):
+    """
+    Content of a member from the bytes of the archive that contain it
+
+    :parameters:
+        info: ZipInfo
+            member
+        block: bytes
+            bytes of the archive read
+        offset: int
+            position of the local header of the member in the block
+
+    :return:
+        content: bytes or None
+            content of the member, None if its compression is not handled here
+    """
+    header = unpack_from(structFileHeader, block, offset)
+    if header[0] != b"PK\003\004":
+        raise BadZipFile("bad magic number for the member " + info.filename)
+    start = offset + sizeFileHeader + header[10] + header[11]
+    data = block[start:start + info.compress_size]
+    if info.flag_bits & 0x1:
+        return None
+    if info.compress_type == ZIP_STORED:
+        content = bytes(data)
+    elif info.compress_type == ZIP_DEFLATED:
+        content = zlib.decompress(data, -15)
+    else:
+        return None
+    if zlib.crc32(content) != info.CRC:
+        raise BadZipFile("bad CRC-32 for the member " + info.filename)
+    return content
+
+###############################################################################################
+
+
+def read_members(jpk_zip, names, lock=None, max_gap=MAX_GAP):
+    """
+    Contents of some members of an archive, read in the order of the archive
+
+    :parameters:
+        jpk_zip: ZipFile
+            archive
+        names: list(str)
+            names of the members to read
+        lock: Lock
+            lock of the archive when it is shared by several threads
+        max_gap: int
+            maximum number of unused bytes read between two members of a same read
+
+    :return:
+        contents: dict
+            content of each member
+    """
+    if lock is None:
+        lock = nullcontext()
+    contents = {}
+    for start, end, infos in read_plan(jpk_zip, names, max_gap):
+        with lock:
+            jpk_zip.fp.seek(start)
+            block = memoryview(jpk_zip.fp.read(end - start))
+        for info in infos:
+            content = decompress(info, block, info.header_offset - start)
+            if content is None:
+                # encrypted member or other compression, read by zipfile
+                with lock:
+                    content = jpk_zip.read(info)
+            contents[info.filename] = content
+    return contents
@@ -0,0 +1,154 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# @author Thierry GALLIANO
+# @contributors Pierre-Henri PUECH, Laurent LIMOZIN, Guillaume GAY
+"""
+File describing the uniform axes (time, distance) of the segments,
+stored as (start, stop, number of points) instead of float arrays
+"""
+import math
+import numpy as np
+
+
+class UniformAxis:
+    """
+    Axis whose values are np.linspace(start, stop, nb_points) followed by the successive
+    additions of offsets, as built by the extraction and the normalization of the curves.
+    The values are computed with the same floating point operations as the arrays they replace,
+    materialized only on request, and the lookups index <-> value are O(1).
+    """
+
+    def __init__(self, start, stop, nb_points, offsets=()):
+        """
+        :parameters:
+            start, stop: float
+                first and last value of the linspace
+            nb_points: int
+                number of points of the axis
+            offsets: tuple(float)
+                values added one after the other to the linspace
+        """
+        self.start = float(start)
+        self.stop = float(stop)
+        self.nb_points = int(nb_points)
+        self.offsets = tuple(float(offset) for offset in offsets)
+
+    #########################################################################################
+
+    @classmethod
+    def from_values(cls, values, reference=None):
+        """
+        Axis describing exactly an array, None if the array is not uniform
+
+        :parameters:
+            values: Series or np.array
+                values of the axis
+            reference: UniformAxis
+                axis of which the values could be a shift (seriesTime = time + offset)
+
+        :return:
+            axis: UniformAxis or None
+        """
+        values = np.asarray(values)
+        if values.dtype != np.float64 or values.ndim != 1 or len(values) == 0:
+            return None
+        candidates = []
+        if reference is not None and len(reference) == len(values):
+            candidates.append(reference.shifted(values[0] - reference.value(0)))
+        candidates.append(cls(values[0], values[-1], len(values)))
+        for axis in candidates:
+            if np.array_equal(axis.values(), values):
+                return axis
+        return None
+
+    #########################################################################################
+
+    def __len__(self):
+        """
+        Number of points of the axis
+        """
+        return self.nb_points
+
+    #########################################################################################
+
+    @property
+    def step(self):
+        """
+        Difference between two successive points of the linspace
+        """
+        if self.nb_points < 2:
+            return 0.0
+        return (self.stop - self.start) / (self.nb_points - 1)
+
+    #########################################################################################
+
+    def shifted(self, offset):
+        """
+        New axis whose values are the values of this axis plus an offset
+
+        :parameters:
+            offset: float
+                value added to the axis
+        """
+        return UniformAxis(self.start, self.stop, self.nb_points, self.offsets + (offset,))
+
+    #########################################################################################
+
+    def values(self):
+        """
+        Materialization of the axis (new array at each call)
+        """
+        values = np.linspace(self.start, self.stop, self.nb_points, dtype=float)
+        for offset in self.offsets:
+            values = values + offset
+        return values
+
+    #########################################################################################
+
+    def value(self, index):
+        """
+        Value of a point of the axis, identical to values()[index]
+
+        :parameters:
+            index: int
+                position of the point (negative allowed)
+        """
+        index = range(self.nb_points)[index]
+        if index == self.nb_points - 1 and self.nb_points > 1:
+            value = self.stop
+        elif self.nb_points < 2:
+            value = index * (self.stop - self.start) + self.start
+        else:
+            div = self.nb_points - 1
+            step = (self.stop - self.start) / div
+            if step == 0:
+                value = index / div * (self.stop - self.start) + self.start
+            else:
+                value = index * step + self.start
+        for offset in self.offsets:
+            value = value + offset
+        return np.float64(value)
+
+    #########################################################################################
+
+    def index_before(self, value):
+        """
+        Position of the last point of an increasing axis lower than or equal to a value
+        (-1 if all the points are greater), as np.searchsorted(values, value, 'right') - 1
+
+        :parameters:
+            value: float
+                searched value
+        """
+        if self.nb_points == 0:
+            return -1
+        step = self.step
+        if step <= 0 or not math.isfinite(value):
+            return int(np.searchsorted(self.values(), value, 'right')) - 1
+        index = math.floor((value - self.value(0)) / step)
+        index = min(max(index, -1), self.nb_points - 1)
+        while index + 1 < self.nb_points and self.value(index + 1) <= value:
+            index += 1
+        while index >= 0 and self.value(index) > value:
+            index -= 1
+        return index
@@ -0,0 +1,256 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# @author Thierry GALLIANO
+# @contributors Pierre-Henri PUECH, Laurent LIMOZIN, Guillaume GAY
+"""
+File describing the batch analysis of the curves of a same protocol: the segments
+of the same name, length and sampling rate are stacked in 2D arrays (one line per curve)
+so that the extrema, the baselines, the smoothing, the contact and release points
+and the closed-form fits of all of them are computed in vectorized calls.
+The results are given back to each curve, whose own analysis uses them
+instead of computing them again
+"""
+import numpy as np
+from .smoothing import smooth_batch, odd_window
+from .fitting import fit_approach_linear_batch, fit_retraction_batch
+
+# time channel of the fit of each segment
+FIT_TIME = {'Press': 'seriesTime', 'Pull': 'time'}
+
+
+def sampling_key(curve, name_segment):
+    """
+    Characteristics of a segment that must be identical to stack it with the segments of other curves
+
+    :parameters:
+        curve: Curve
+            curve of the segment
+        name_segment: str
+            name of the segment
+
+    :return:
+        key: tuple
+            number of points and sampling rate (Hz) of the segment
+    """
+    segment = curve.dict_segments[name_segment]
+    nb_points = len(segment.values(curve.features['main_axis']['axe'] + 'Signal1'))
+    duration = float(segment.header_segment['segment-settings.duration'])
+    rate = 0.0
+    if duration > 0:
+        rate = float(segment.header_segment['segment-settings.num-points']) / duration
+    return nb_points, rate
+
+###############################################################################################
+
+
+class SegmentStack:
+    """
+    Segments of the same name of several curves, of the same length and sampling rate,
+    with the force on the main axis of each curve stacked in a 2D array
+    """
+
+    def __init__(self, curves, name_segment):
+        """
+        :parameters:
+            curves: list(Curve)
+                curves whose segments are stacked
+            name_segment: str
+                name of the segment
+        """
+        self.curves = list(curves)
+        self.name_segment = name_segment
+        self.segments = [curve.dict_segments[name_segment] for curve in self.curves]
+        self.channels = [curve.features['main_axis']['axe'] + 'Signal1' for curve in self.curves]
+        self.force = np.vstack([segment.values(channel)
+                                for segment, channel in zip(self.segments, self.channels)])
+
+    #########################################################################################
+
+    def __len__(self):
+        """
+        Number of stacked curves
+        """
+        return len(self.curves)
+
+    #########################################################################################
+
+    def stacked(self, channel):
+        """
+        2D array of a channel of the segments (one line per curve)
+
+        :parameters:
+            channel: str
+                name of the column
+        """
+        return np.vstack([segment.values(channel) for segment in self.segments])
+
+    #########################################################################################
+
+    def extrema(self):
+        """
+        Minimum and maximum, with their first index, of the forces on the three axes
+        of all the segments, given to the segments as if computed by Segment.extrema
+        """
+        channels = [channel for channel in ('xSignal1', 'ySignal1', 'zSignal1')
+                    if all(segment.has_channel(channel) for segment in self.segments)]
+        values = np.stack([self.stacked(channel) for channel in channels], axis=2)
+        indexes_min = values.argmin(axis=1)
+        indexes_max = values.argmax(axis=1)
+        for line, segment in enumerate(self.segments):
+            extrema = {}
+            for column, channel in enumerate(channels):
+                extrema[channel] = {'index_min': int(indexes_min[line, column]),
+                                    'min': values[line, indexes_min[line, column], column],
+                                    'index_max': int(indexes_max[line, column]),
+                                    'max': values[line, indexes_max[line, column], column]}
+            segment.set_extrema(extrema)
+
+    #########################################################################################
+
+    def baselines(self, range_data, end=False):
+        """
+        Mean of the force over the first (last) points of each segment
+
+        :parameters:
+            range_data: int
+                number of points
+            end: bool
+                True for the last points
+        """
+        window = self.force[:, -range_data:] if end else self.force[:, :range_data]
+        if window.shape[1] == 0:
+            return np.full(len(self), np.nan)
+        return window.mean(axis=1)
+
+    #########################################################################################
+
+    def smoothed(self, window_length, order_polynome):
+        """
+        Smoothed force of all the segments, given to the smoothing caches of the curves
+
+        :parameters:
+            window_length: int
+                size of the sliding window (made odd)
+            order_polynome: int
+                order of the polynomial fitted in the window
+
+        :return:
+            y_smooth: np.array
+                smoothed forces, one line per curve
+        """
+        y_smooth = smooth_batch(self.force, window_length, order_polynome)
+        for line, curve in enumerate(self.curves):
+            curve.smoothing.put(self.name_segment, self.channels[line], window_length,
+                                order_polynome, y_smooth[line])
+        return y_smooth
+
+    #########################################################################################
+
+    def contacts(self, y_smooth):
+        """
+        Contact point ("Press", last point in the noise of the baseline) or release point
+        ("Pull", first point in the noise) of each curve, as Curve.retrieve_contact
+
+        :parameters:
+            y_smooth: np.array
+                smoothed forces, one line per curve
+
+        :return:
+            indexes: np.array
+                index of the point for each curve (0 if not found)
+        """
+        baseline = np.array([curve.features['baseline_corrected_press (pN)'] for curve in self.curves])[:, None]
+        std = np.array([curve.features['std_corrected_press (pN)'] for curve in self.curves])[:, None]
+        inside = (baseline - std < y_smooth) & (y_smooth < np.abs(baseline) + np.abs(std))
+        if self.name_segment == "Press":
+            indexes = inside.shape[1] - 1 - inside[:, ::-1].argmax(axis=1)
+        else:
+            indexes = inside.argmax(axis=1)
+        return np.where(inside.any(axis=1), indexes, 0)
+
+###############################################################################################
+
+
+class BatchAnalysis:
+    """
+    Steps of the analysis of the curves computed for the stacks of identical segments,
+    the results being recorded in the curves (extrema of the segments, smoothed signals,
+    values in Curve.precomputed) before their analysis
+    """
+
+    def __init__(self, curves, min_curves=2):
+        """
+        :parameters:
+            curves: list(Curve)
+                curves to analyze
+            min_curves: int
+                minimum number of identical segments to stack them
+        """
+        self.curves = list(curves)
+        self.min_curves = min_curves
+
+    #########################################################################################
+
+    def stacks(self, name_segment):
+        """
+        Stacks of the segments of the same name, length and sampling rate
+
+        :parameters:
+            name_segment: str
+                name of the segment
+
+        :return:
+            stacks: list(SegmentStack)
+        """
+        groups = {}
+        for curve in self.curves:
+            if name_segment in curve.dict_segments:
+                key = (sampling_key(curve, name_segment), curve.range_baseline)
+                groups.setdefault(key, []).append(curve)
+        return [SegmentStack(curves, name_segment) for curves in groups.values()
+                if len(curves) >= self.min_curves]
+
+    #########################################################################################
+
+    def run(self, methods):
+        """
+        Computation of the stacked steps of the analysis
+
+        :parameters:
+            methods: dict
+                parameters of the analysis
+
+        :return:
+            nb_stacked: dict
+                number of curves stacked for each segment
+        """
+        window = odd_window(methods['width_window_smooth'])
+        closed_form = methods.get('fit_method', 'closed_form') == 'closed_form'
+        names = []
+        for curve in self.curves:
+            names += [name for name in curve.dict_segments if name not in names]
+        nb_stacked = {}
+        for name_segment in names:
+            nb_stacked[name_segment] = 0
+            for stack in self.stacks(name_segment):
+                nb_stacked[name_segment] += len(stack)
+                stack.extrema()
+                if name_segment not in FIT_TIME:
+                    continue
+                y_smooth = stack.smoothed(window, 2)
+                indexes = stack.contacts(y_smooth)
+                if name_segment == 'Pull':
+                    range_baseline = stack.curves[0].range_baseline
+                    for curve, channel, baseline in zip(stack.curves, stack.channels,
+                                                        stack.baselines(range_baseline, True)):
+                        curve.precomputed[('baseline', 'Pull', True, channel[0], range_baseline)] = baseline
+                popt = pcov = None
+                if closed_form and name_segment == 'Press' and methods['model'].lower() == 'linear':
+                    popt, pcov = fit_approach_linear_batch(stack.stacked(FIT_TIME['Press']), y_smooth)
+                elif closed_form and name_segment == 'Pull':
+                    popt, pcov = fit_retraction_batch(stack.stacked(FIT_TIME['Pull']), y_smooth)
+                for line, curve in enumerate(stack.curves):
+                    curve.precomputed[('contact', name_segment, window)] = int(indexes[line])
+                    if popt is not None:
+                        curve.precomputed[('fit', name_segment, window)] = (popt[line], pcov[line])
+        return nb_stacked
@@ -0,0 +1,232 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# @author Thierry GALLIANO
+# @contributors Pierre-Henri PUECH, Laurent LIMOZIN, Guillaume GAY
+"""
+File describing the calibration of the thresholds of the classification on supervised curves:
+the types given by the sweep of a grid of thresholds are compared with the types corrected
+by the user, and the thresholds with the best agreement are selected (with a cross-validation
+of this selection on folds of curves)
+"""
+import numpy as np
+import pandas as pd
+from .sweep import grid_points
+
+# thresholds of the classification calibrated
+CALIBRATED_PARAMETERS = ('factor_noise', 'jump_force', 'jump_point', 'jump_distance')
+
+# range and type of the thresholds in the widgets of the interface
+PARAMETER_RANGES = {'factor_noise': (0.0, 99.99, float), 'jump_force': (0.0, 99.99, float),
+                    'jump_point': (0, 5000, int), 'jump_distance': (0, 5000, int)}
+
+
+def supervised_labels(files):
+    """
+    Types of the curves corrected by the user in output files of supervised analyses
+    (the last file giving the type of a curve present in several files)
+
+    :parameters:
+        files: list(str)
+            names of the output files (.csv, separated by tabulations)
+
+    :return:
+        labels: Series
+            type of each curve, indexed by the name of the curve
+    """
+    labels = pd.Series(dtype=object)
+    for file in files:
+        output = pd.read_csv(file, sep='\t', header=0, index_col=0)
+        labels = pd.concat((labels, output['type']))
+    labels = labels[~labels.index.duplicated(keep='last')]
+    return labels[labels.notna() & (labels != 'INC')]
+
+###############################################################################################
+
+
+def interface_values(name, values):
+    """
+    Values of a threshold in the range of its widget in the interface,
+    rounded up to an integer for the integer widgets (distinct values, sorted)
+
+    :parameters:
+        name: str
+            name of the calibrated parameter
+        values: np.array
+            values of the threshold
+    """
+    low, high, type_value = PARAMETER_RANGES[name]
+    values = np.clip(np.asarray(values, dtype=float), low, high)
+    if type_value is int:
+        values = np.ceil(values)
+    return np.unique(values)
+
+###############################################################################################
+
+
+def quantile_values(values, nb_values, decimals=0):
+    """
+    At most nb_values distinct thresholds at regular quantiles of a sample,
+    rounded up to the precision of the interface (a threshold equal to a value
+    is rounded above it)
+
+    :parameters:
+        values: np.array
+            sample
+        nb_values: int
+            maximum number of values
+        decimals: int
+            number of decimals of the thresholds
+    """
+    values = np.asarray(values, dtype=float)
+    values = values[np.isfinite(values)]
+    if len(values) == 0:
+        return np.empty(0)
+    scale = 10.0 ** decimals
+    return np.unique(np.floor(np.quantile(values, np.linspace(0, 1, nb_values)) * scale + 1) / scale)
+
+###############################################################################################
+
+
+class Calibration:
+    """
+    Search of the thresholds of the classification in best agreement with the supervised types
+    """
+
+    def __init__(self, sweep, labels, nb_folds=5, seed=0, chunk=2000):
+        """
+        :parameters:
+            sweep: ParameterSweep
+                values of the analyzed curves
+            labels: Series
+                supervised type of the curves, indexed by their name
+            nb_folds: int
+                number of folds of the cross-validation
+            seed: int
+                seed of the random distribution of the curves in the folds
+            chunk: int
+                number of parameter sets classified together
+        """
+        self.sweep = sweep
+        self.columns = np.array([index for index, name in enumerate(sweep.names) if name in labels.index],
+                                dtype=int)
+        if len(self.columns) == 0:
+            raise ValueError('no supervised curve among the curves of the sweep')
+        self.labels = np.array([labels[sweep.names[index]] for index in self.columns])
+        self.nb_folds = max(1, min(nb_folds, len(self.columns)))
+        self.folds = np.random.default_rng(seed).permutation(len(self.columns)) % self.nb_folds
+        self.chunk = chunk
+
+    #########################################################################################
+
+    def default_grid(self, nb_values=10):
+        """
+        Values of the thresholds at the quantiles of the values they are compared to
+        (maximum force, jumps with the tolerance of the methods), with those of the methods
+
+        :parameters:
+            nb_values: int
+                maximum number of values per threshold
+
+        :return:
+            grid: dict
+                list of the values of each calibrated parameter
+        """
+        methods = self.sweep.methods
+        curves = [self.sweep.curves[index] for index in self.columns]
+        nb_points = []
+        distances = []
+        for curve in curves:
+            found, nb_point, distance = curve.jumps_end([methods['factor_noise']])
+            if found[0]:
+                nb_points.append(nb_point[0])
+                distances.append(distance[0])
+        grid = {'factor_noise': np.arange(1.0, 10.5, 0.5),
+                'jump_force': quantile_values([curve.force_max for curve in curves], nb_values, 2),
+                'jump_point': quantile_values(nb_points, nb_values),
+                'jump_distance': quantile_values(distances, nb_values)}
+        return {name: interface_values(name, np.append(values, methods[name])) for name, values in grid.items()}
+
+    #########################################################################################
+
+    def best_point(self, scores, points):
+        """
+        Parameter set with the best agreement, the closest to the methods of the analysis
+        among the sets of equal agreement (relative distance on each threshold)
+
+        :parameters:
+            scores: np.array
+                agreement of each parameter set
+            points: DataFrame
+                parameter sets
+
+        :return:
+            best: int
+                index of the parameter set
+        """
+        best = np.flatnonzero(scores >= scores.max() - 1e-12)
+        distance = np.zeros(len(best))
+        for name in CALIBRATED_PARAMETERS:
+            values = points[name].to_numpy(dtype=float)
+            span = values.max() - values.min()
+            if span > 0:
+                distance += np.abs(values[best] - float(self.sweep.methods[name])) / span
+        return int(best[np.argmin(distance)])
+
+    #########################################################################################
+
+    def agreement(self, points):
+        """
+        Agreement of the types of the sweep with the supervised types
+
+        :parameters:
+            points: DataFrame
+                parameter sets
+
+        :return:
+            matches: np.array(bool)
+                True if the type of the curve is the supervised type,
+                one line per parameter set, one column per supervised curve
+        """
+        matches = np.empty((len(points), len(self.columns)), dtype=bool)
+        for start in range(0, len(points), self.chunk):
+            types = self.sweep.classification(points.iloc[start:start + self.chunk])
+            matches[start:start + self.chunk] = types[:, self.columns] == self.labels
+        return matches
+
+    #########################################################################################
+
+    def run(self, grid=None):
+        """
+        Calibration of the thresholds
+
+        :parameters:
+            grid: dict
+                list of the values of each calibrated parameter (default_grid by default)
+
+        :return:
+            parameters: dict
+                values of the calibrated parameters with the best agreement on all the curves,
+                in the ranges and types of the interface
+            scores: dict
+                'agreement': agreement of these parameters, 'cross_validation': mean agreement
+                on each fold of the parameters selected on the other folds, 'folds': agreement
+                on each fold, 'nb_curves' and 'nb_sets': numbers of supervised curves and of parameter sets
+        """
+        if grid is None:
+            grid = self.default_grid()
+        # thresholds that the interface can load (non negative, integers for the jumps)
+        points = grid_points({name: interface_values(name, grid[name]) for name in CALIBRATED_PARAMETERS
+                              if name in grid}, self.sweep.methods)
+        matches = self.agreement(points)
+        folds = []
+        for fold in range(self.nb_folds):
+            test = self.folds == fold
+            train = ~test if self.nb_folds > 1 else test
+            best = self.best_point(matches[:, train].mean(axis=1), points)
+            folds.append(float(matches[best, test].mean()))
+        scores = matches.mean(axis=1)
+        best = self.best_point(scores, points)
+        parameters = {name: PARAMETER_RANGES[name][2](interface_values(name, [points[name].iloc[best]])[0])
+                      for name in CALIBRATED_PARAMETERS}
+        return parameters, {'agreement': float(scores[best]), 'cross_validation': float(np.mean(folds)),
+                            'folds': folds, 'nb_curves': len(self.columns), 'nb_sets': len(points)}
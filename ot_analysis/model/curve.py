@@ -6,12 +6,17 @@
 File describing the instance class of the curved objects
 """
 import math
-import traceback
+from time import perf_counter
 import numpy as np
-import pandas as pd
-from scipy.optimize import curve_fit
-from scipy.signal import savgol_filter
 from .optical_effect import OpticalEffect
+from .curve_arrays import CurveArrays
+from .graphics_store import GraphicsStore
+from .feature_table import flatten_features
+from .pipeline import AnalysisPipeline
+from .smoothing import SmoothingCache, smooth, odd_window
+from .multiresolution import CoarseToFine
+from .fitting import FIT_METHODS, FitBudget, linear_least_squares, fit_approach_linear, fit_retraction, \
+    fit_approach_sphere, sphere_seed, curve_fit_counted, fit_with_fallback
 
 
 class Curve:
@@ -20,9 +25,16 @@ class Curve:
     """
     # pylint: disable=unbalanced-tuple-unpacking
 
-    def __init__(self, file, title, header, dict_segments, pulling_length):
+    def __init__(self, file, title, header, dict_segments, pulling_length,
+                 range_baseline=1000, range_std=200):
         """
         Initialization attributes of the object and launch the functions
+
+        :parameters:
+            range_baseline: int
+                number of points at the start of "Press" (end of "Pull") for the baselines
+            range_std: int
+                number of points at the start of "Press" (end of "Pull") for the standard deviations
         """
         ######### Attributes #################
         self.file = file
@@ -32,9 +44,22 @@ class Curve:
         self.parameters_header = header
         self.dict_segments = dict_segments  # Liste d'objets segments
         self.features = {}
-        self.graphics = {}
+        self.graphics = GraphicsStore(self)
         self.output = {'bead': bead, 'cell': cell, 'couple': couple}
         self.output['treat_supervised'] = False
+        self.fit_method = FIT_METHODS[0]
+        self.fit_budget = FitBudget()
+        self.range_baseline = range_baseline
+        self.range_std = range_std
+        self.smoothing = SmoothingCache(dict_segments)
+        # results of the batch analysis (see batch.py) by step and parameters, used once
+        self.precomputed = {}
+        self.data_version = 0
+        self.pipeline = AnalysisPipeline(self)
+        self.arrays = {'data_original': CurveArrays.from_frames(
+            [segment.data for segment in dict_segments.values()])}
+        for index_segment, segment in enumerate(dict_segments.values()):
+            segment.attach(self.arrays['data_original'], index_segment, False)
         self.message = ""
         self.message += "\n========================================================================\n"
         self.message += self.file
@@ -43,21 +68,29 @@ class Curve:
         ######### methods ###############
         self.identification_main_axis()
         self.normalization_data()
-        self.correction_optical_effect_object = OpticalEffect(self)
+        self.optical_effect = None
         self.check_incomplete = self.segment_retraction_troncated(
             pulling_length)
         if not self.check_incomplete:
             baseline_origin = self.calcul_baseline("Press")
-            self.features['baseline_origin_press (N)'] = format(
-                baseline_origin * 1e12, '.3E')
+            self.features['baseline_origin_press (N)'] = baseline_origin * 1e12
             beseline_corrected = self.calcul_baseline('Press', True)
-            self.features['baseline_corrected_press (pN)'] = format(
-                beseline_corrected * 1e12, '.3E')
+            self.features['baseline_corrected_press (pN)'] = beseline_corrected * 1e12
             std_origin = self.calcul_std("Press")
-            self.features['std_origin_press (N)'] = format(std_origin, '.3E')
+            self.features['std_origin_press (N)'] = std_origin
             std_corrected = self.calcul_std("Press", True)
-            self.features['std_corrected_press (pN)'] = format(
-                std_corrected, '.3E')
+            self.features['std_corrected_press (pN)'] = std_corrected
+
+    ################################################################################################
+
+    @property
+    def correction_optical_effect_object(self):
+        """
+        Correction of the optical effect of the curve, created at the first use
+        """
+        if self.optical_effect is None:
+            self.optical_effect = OpticalEffect(self)
+        return self.optical_effect
 
     ################################################################################################
     # Initialization methods of the curves object:
@@ -117,23 +150,36 @@ class Curve:
         """
         # print("curve_reversal")
         for segment in self.dict_segments.values():
-            segment.corrected_data['xSignal1'] = - \
-                segment.corrected_data['xSignal1']
-            segment.corrected_data['ySignal1'] = - \
-                segment.corrected_data['ySignal1']
-            segment.corrected_data['zSignal1'] = - \
-                segment.corrected_data['zSignal1']
+            for column in ('xSignal1', 'ySignal1', 'zSignal1'):
+                segment.set_values(column, -segment.values(column))
+        self.clear_cache()
+
+    ################################################################################################
+
+    def clear_cache(self):
+        """
+        Removal of the smoothed signals and of the windowed statistics
+        to call after a modification of the corrected data of the segments
+        """
+        self.smoothing.clear()
+        self.precomputed.clear()
+        self.graphics.clear_cache()
+        self.data_version += 1
+        for segment in self.dict_segments.values():
+            segment.clear_statistics()
 
     ################################################################################################
 
-    def calcul_baseline(self, name_segment, corrected_data=False, axe="", range_data=1000):
+    def calcul_baseline(self, name_segment, corrected_data=False, axe="", range_data=None):
         """
         Determination of the baseline of the curve by calculating
-        the average over the first or the last 200 points
+        the average over the first or the last points
 
         :parameters:
             name_segment: str
                 name of the segment on which to search the baseline
+            range_data: int
+                nb point for the calcul (by default range_baseline of the curve)
         :return:
             basseline: float
                 value of the baseline as a function of the segment
@@ -142,16 +188,17 @@ class Curve:
         baseline = 0
         if axe == "":
             axe = self.features["main_axis"]['axe']
+        if range_data is None:
+            range_data = self.range_baseline
         segment = self.dict_segments[name_segment]
         if segment.header_segment['segment-settings.style'] == "motion":
-            if corrected_data:
-                data_analyze = segment.corrected_data
-            else:
-                data_analyze = segment.data
-            if name_segment == "Press":
-                baseline = data_analyze[axe + 'Signal1'][0:range_data].mean()
+            key = ('baseline', name_segment, corrected_data, axe, range_data)
+            if key in self.precomputed:
+                baseline = self.precomputed[key]
+            elif name_segment == "Press":
+                baseline = segment.statistics(axe + 'Signal1', corrected_data).mean(0, range_data)
             elif name_segment == "Pull":
-                baseline = data_analyze[axe + 'Signal1'][-range_data:].mean()
+                baseline = segment.statistics(axe + 'Signal1', corrected_data).mean(-range_data, None)
         self.message += "\n" + str(baseline)
         return baseline
 
@@ -159,38 +206,57 @@ class Curve:
 
     def normalization_data(self):
         """
-        Normalize the data on the main axis
+        Normalize the data on the main axis, channel by channel on the contiguous
+        arrays of the curve (the uniform time axes are shifted without being materialized),
+        then attach the segments to the corrected arrays
         """
         # print("normalization_data")
-        num_segment = 0
         time_start = 0.0
         choice_axe = ['x', 'y', 'z']
         main_axis = self.features["main_axis"]['axe']
+        original = self.arrays['data_original']
+        segments = list(self.dict_segments.values())
+        channels = {}
+        axes = {}
         for axe in choice_axe:
             baseline = self.calcul_baseline("Press", False, axe)
             column = axe + 'Signal1'
-            for segment in self.dict_segments.values():
-                data = segment.data[[column]].copy()
-                data = data.sub(baseline, axis=0)
-                segment.corrected_data[column] = data[column] * 1e12
-        for segment in self.dict_segments.values():
-            segment.corrected_data['time'] = segment.data['time'] - \
-                segment.data['time'][0]
-            if num_segment == 0 and float(segment.header_segment['segment-settings.duration']) > 0.0:
-                time_start = segment.data['time'][0]
-            segment.corrected_data['seriesTime'] = segment.data['seriesTime'].sub(
-                time_start)
-            num_segment += 1
-            stiffness = float(
-                self.parameters_header['calibrations'][main_axis + 'Signal1_stiffness'].replace(" N/m", ""))
-            self.features['stiffness (N/m)'] = format(stiffness, '.3E')
-            stiffness = stiffness * (1e12/1e9)
-            if 'distance' in segment.data:
-                distances = segment.data['distance'] * 1e9
-                forces = segment.corrected_data[column]
+            channels[column] = (original.channel(column) - baseline) * 1e12
+        if 'time' in original.axes:
+            axes['time'] = [axis.shifted(-axis.value(0)) for axis in original.axes['time']]
+        else:
+            channels['time'] = np.empty(len(original))
+            for index_segment in range(len(segments)):
+                start, stop = original.bounds(index_segment)
+                time = original.view(index_segment, 'time')
+                channels['time'][start:stop] = time - time[0]
+        if len(segments) > 0 and float(segments[0].header_segment['segment-settings.duration']) > 0.0:
+            time_start = original.value(0, 'time', 0)
+        if 'seriesTime' in original.axes:
+            axes['seriesTime'] = [axis.shifted(-time_start) for axis in original.axes['seriesTime']]
+        else:
+            channels['seriesTime'] = original.channel('seriesTime') - time_start
+        stiffness = float(
+            self.parameters_header['calibrations'][main_axis + 'Signal1_stiffness'].replace(" N/m", ""))
+        self.features['stiffness (N/m)'] = stiffness
+        stiffness = stiffness * (1e12/1e9)
+        segment_channels = []
+        for index_segment, segment in enumerate(segments):
+            columns = ['xSignal1', 'ySignal1', 'zSignal1', 'time', 'seriesTime']
+            if segment.has_channel('distance', False):
+                if 'distance' not in channels:
+                    channels['distance'] = np.full(len(original), np.nan)
+                start, stop = original.bounds(index_segment)
+                distances = original.view(index_segment, 'distance') * 1e9
+                forces = channels[column][start:stop]
                 data_corrected_stiffness = distances - forces / stiffness
-                segment.corrected_data['distance'] = np.abs(
+                channels['distance'][start:stop] = np.abs(
                     data_corrected_stiffness - data_corrected_stiffness[0])  # (nm)
+                columns.append('distance')
+            segment_channels.append(columns)
+        self.arrays['data_corrected'] = CurveArrays(channels, original.boundaries, segment_channels, axes)
+        for index_segment, segment in enumerate(segments):
+            segment.attach(self.arrays['data_corrected'], index_segment)
         if self.features["main_axis"]["sign"] == "+":
             self.curve_reversal()
 
@@ -208,7 +274,7 @@ class Curve:
         nb_point_segment = int(
             segment.header_segment['segment-settings.num-points'])
         size_data = len(
-            segment.data[self.features["main_axis"]['axe'] + 'Signal1'])
+            segment.values(self.features["main_axis"]['axe'] + 'Signal1', False))
         check_segment_troncated = True
         if nb_point_segment == size_data:
             check_segment_troncated = False
@@ -219,16 +285,16 @@ class Curve:
 
     ###############################################################################################
 
-    def calcul_std(self, name_segment, corrected_data=False, axe="", range_data=200):
+    def calcul_std(self, name_segment, corrected_data=False, axe="", range_data=None):
         """
         Determination of the standard deviation of the curve by calculating
-        over the first or the last 200 points
+        over the first or the last points
 
         :parameters:
             name_segment: str
                 name of the segment on which to search the baseline
             range_data: int
-                nb point for the calcul
+                nb point for the calcul (by default range_std of the curve)
 
         :return:
             std: float
@@ -237,16 +303,15 @@ class Curve:
         std = 0
         if axe == "":
             axe = self.features["main_axis"]['axe']
+        if range_data is None:
+            range_data = self.range_std
         segment = self.dict_segments[name_segment]
         if segment.header_segment['segment-settings.style'] == "motion":
-            if corrected_data:
-                data_analyze = segment.corrected_data
-            else:
-                data_analyze = segment.data
+            statistics = segment.statistics(axe + 'Signal1', corrected_data)
             if name_segment == "Press":
-                std = data_analyze[axe + 'Signal1'][0:range_data].std()
+                std = statistics.std(0, range_data)
             elif name_segment == "Pull":
-                std = data_analyze[axe + 'Signal1'][-range_data:].std()
+                std = statistics.std(-range_data, None)
 
         return std
 
@@ -275,16 +340,14 @@ class Curve:
         index_data_max_curve = 0
         force_max_curve = 0
         for segment in self.dict_segments.values():
-            data = segment.corrected_data[main_axis + 'Signal1']
-            time = segment.corrected_data['seriesTime']
-
-            if data_min_curve > data[data.argmin()]:
-                time_min_curve = time[data.argmin()]
-                data_min_curve = data[data.argmin()]
-                index_data_min_curve = data.argmin()
-            if force_max_curve < data[data.argmax()]:
-                force_max_curve = data[data.argmax()]
-                index_data_max_curve = data.argmax()
+            extrema = segment.extrema()[main_axis + 'Signal1']
+            if data_min_curve > extrema['min']:
+                time_min_curve = segment.value('seriesTime', extrema['index_min'])
+                data_min_curve = extrema['min']
+                index_data_min_curve = extrema['index_min']
+            if force_max_curve < extrema['max']:
+                force_max_curve = extrema['max']
+                index_data_max_curve = extrema['index_max']
         data_min_approach = 0
         index_data_min = 0
         segment = self.dict_segments["Press"]
@@ -292,10 +355,10 @@ class Curve:
             segment.header_segment["segment-settings.setpoint.value"])
         force = -force * 1e12
         interval = force * tolerance / 100
-        data = segment.corrected_data[main_axis + 'Signal1']
-        data_min_approach = min(data)
+        extrema = segment.extrema()[main_axis + 'Signal1']
+        data_min_approach = extrema['min']
         if math.isclose(force, data_min_approach, rel_tol=tolerance):
-            index_data_min = data.argmin()
+            index_data_min = extrema['index_min']
         # else:
         #     for index_data in range(0, len(data), 1):
         #         if (force - interval) > data[index_data] > (force + interval):
@@ -342,7 +405,7 @@ class Curve:
         dict_align = {}
         for segment in self.dict_segments.values():
             dict_align[segment.name] = segment.check_alignment(
-                self.features["main_axis"]['axe'], force_min)
+                self.features["main_axis"]['axe'], force_min, self.range_baseline)
         dict_align_final = {}
         for value in dict_align.values():
             if 'AL' not in dict_align_final:
@@ -372,9 +435,9 @@ class Curve:
         """
         print("compare_baseline")
         type_curve = ""
-        baseline_start = float(self.features['baseline_corrected_press (pN)'])
+        baseline_start = self.features['baseline_corrected_press (pN)']
         line_end = self.calcul_baseline("Pull", True)
-        std_start = float(self.features['std_corrected_press (pN)'])
+        std_start = self.features['std_corrected_press (pN)']
         if (baseline_start - std_start*tolerance) < line_end < (baseline_start + std_start*tolerance):
             self.message += "\nbaseline_end Ok\n"
             print("baseline_end Ok")
@@ -410,34 +473,70 @@ class Curve:
         :return:
             values of y smoothing
         """
-        if window_length % 2 == 0:
-            window_length += 1
-        y_smooth = savgol_filter(force_data, window_length, order_polynome)
+        y_smooth = smooth(force_data, window_length, order_polynome)
 
         return y_smooth
 
     ###############################################################################################
 
-    def retrieve_contact(self, data_analyze, segment, tolerance):
+    def smooth_segment(self, name_segment, window_length=51, order_polynome=3):
+        """
+        Smoothing of the force on the main axis of a segment,
+        memoized until the corrected data of the segment are modified
+
+        :parameters:
+            name_segment: str
+                name of the segment ('Press' or 'Pull')
+            window_length: int (odd)
+                size of the sliding window
+            order_polynome: int
+                order of the polynomial fitted in the window
+
+        :return:
+            values of y smoothing (read-only)
+        """
+        return self.smoothing.get(name_segment, self.features['main_axis']['axe'] + 'Signal1',
+                                  window_length, order_polynome)
+
+    ###############################################################################################
+
+    def noise_band(self):
+        """
+        Limits of the noise of the baseline of "Press" used to find the contact and release points
+
+        :return:
+            low, high: float
+                the points strictly between the limits are in the noise
+        """
+        baseline = self.features['baseline_corrected_press (pN)']
+        std = self.features['std_corrected_press (pN)']
+        return baseline - std, abs(baseline) + abs(std)
+
+    ###############################################################################################
+
+    def retrieve_contact(self, data_analyze, segment, tolerance, index_contact=None):
         """
         Allows to determine the contact point of the ball with the cell and contact release cell
 
+        :parameters:
+            index_contact: int
+                point already found by the batch analysis, None to search it
         """
         print('retrieve_contact')
-        list_index_contact = []
-        index_contact = 0
         line_pos_threshold = ""
-        baseline = float(self.features['baseline_corrected_press (pN)'])
-        std = float(self.features['std_corrected_press (pN)'])
+        std = self.features['std_corrected_press (pN)']
         line_pos_threshold = np.full(len(data_analyze), std*tolerance)
-        for index in range(len(data_analyze)-1, -1, -1):
-            if baseline - std < data_analyze[index] < abs(baseline) + abs(std):
-                list_index_contact.append(index)
+        if index_contact is not None:
+            return index_contact, line_pos_threshold
+        index_contact = 0
+        data_analyze = np.asarray(data_analyze)
+        low, high = self.noise_band()
+        list_index_contact = np.flatnonzero((low < data_analyze) & (data_analyze < high))
         if len(list_index_contact) > 0:
             if segment == "Press":
-                index_contact = list_index_contact[0]
+                index_contact = int(list_index_contact[-1])
             else:
-                index_contact = list_index_contact[-1]
+                index_contact = int(list_index_contact[0])
 
         return index_contact, line_pos_threshold
 
@@ -465,12 +564,18 @@ class Curve:
 
     ###############################################################################################
 
-    def fit_curve_approach(self, tolerance, window_smooth):
+    def fit_curve_approach(self, tolerance, window_smooth, window_fit=None):
         """
         creation of the data fit for the curve
+        (the sphere model is fitted with its analytic Jacobian in a window around the contact point,
+        unless "fit_method" is 'curve_fit').
+        Beyond its budget, the fit is replaced by the estimate of its initial guesses
 
         :parameters:
             tolerance: noise threshold in number of times the standard deviation
+            window_fit: int
+                number of points kept on each side of the contact point for the sphere fit
+                (None or 0: whole segment)
 
         :return:
             f_parameters: fit parameters describing the model
@@ -479,16 +584,17 @@ class Curve:
         print('fit_curve_approach')
         main_axis = self.features["main_axis"]['axe']
         segment = self.dict_segments["Press"]
-        force_data = segment.corrected_data[main_axis + 'Signal1']
-        y_smooth = Curve.smooth(force_data, window_smooth, 2)
+        force_data = segment.values(main_axis + 'Signal1')
+        y_smooth = self.smooth_segment('Press', window_smooth, 2)
         # if 'distance' in segment.corrected_data:
         #     distance_data = np.abs(segment.corrected_data['distance'])
-        time_data = segment.corrected_data['seriesTime']
+        time_data = segment.values('seriesTime')
         #self.graphics['y_smooth_Press'] = y_smooth
         index_contact, line_pos_threshold = self.retrieve_contact(
-            y_smooth, "Press", tolerance)
-        self.graphics['threshold_press'] = line_pos_threshold
-        baseline = float(self.features['baseline_corrected_press (pN)'])  # y0
+            y_smooth, "Press", tolerance, self.precomputed.get(('contact', 'Press', odd_window(window_smooth))))
+        self.graphics.set_overlay('threshold_press', 'constant', 'Press', value=line_pos_threshold[0],
+                                  length=len(line_pos_threshold))
+        baseline = self.features['baseline_corrected_press (pN)']  # y0
         x_1 = time_data[len(time_data)-index_contact]
         y_1 = force_data[len(force_data)-index_contact]
         x_2 = time_data[len(time_data)-10]
@@ -499,12 +605,29 @@ class Curve:
             'index': index_contact, 'value': force_data[index_contact]}
         #initial_guesses_accuracy = [10**(9), 10**3, 1]
         initial_guesses_accuracy = [contact_point, k, baseline]
-        f_parameters = curve_fit(
-            self.fit_model_approach, time_data, y_smooth, initial_guesses_accuracy)
+        start = perf_counter()
+        model = self.features['model']
+
+        def fit(budget):
+            if model == 'linear' and self.fit_method == 'closed_form':
+                if ('fit', 'Press', odd_window(window_smooth)) in self.precomputed:
+                    return self.precomputed[('fit', 'Press', odd_window(window_smooth))] + (0,)
+                return fit_approach_linear(time_data, y_smooth) + (0,)
+            if model == 'sphere' and self.fit_method == 'closed_form':
+                return fit_approach_sphere(time_data, y_smooth, index_contact, baseline, window_fit, budget)
+            return curve_fit_counted(self.fit_model_approach, time_data, y_smooth,
+                                     initial_guesses_accuracy, budget)
+
+        def fallback():
+            if model == 'sphere' and self.fit_method == 'closed_form':
+                return sphere_seed(time_data, y_smooth, baseline, index_contact)
+            return initial_guesses_accuracy
+        popt, pcov, nfev, status = fit_with_fallback(fit, fallback, self.fit_budget)
+        f_parameters = (popt, pcov)
+        self.record_fit('fit_press', nfev, start, status)
         #self.message += str(f_parameters)
-        fitted = self.fit_model_approach(
-            time_data, f_parameters[0][0], f_parameters[0][1], f_parameters[0][2])
-        self.graphics['fitted_Press'] = fitted
+        self.graphics.set_overlay('fitted_Press', 'model', 'Press', 'seriesTime', model='fit_model_approach',
+                                  parameters=tuple(f_parameters[0][:3]))
 
         return f_parameters
 
@@ -548,15 +671,15 @@ class Curve:
         #error_contact = None
         slope = None
         f_parameters = self.fit_curve_approach(
-            methods['factor_noise'], methods['width_window_smooth'])
+            methods['factor_noise'], methods['width_window_smooth'], methods.get('window_fit_sphere'))
         if np.isfinite(np.sum(f_parameters[1])):
             error = np.sqrt(np.diag(f_parameters[1]))
         if self.features['model'] == 'linear':
             slope = f_parameters[0][1]
-            self.features['slope (pN/nm)'] = format(slope, '.2E')
+            self.features['slope (pN/nm)'] = slope
             if isinstance(error, np.ndarray):
                 error_young = error[1]
-                self.features['error (pN/nm)'] = format(error_young, '.2E')
+                self.features['error (pN/nm)'] = error_young
             else:
                 self.features['error (pN/nm)'] = error_young
             self.message += "Slope (pN/nm) = " + \
@@ -566,8 +689,10 @@ class Curve:
         elif self.features['model'] == 'sphere':
             young = Curve.determine_young_modulus(
                 f_parameters[0][1], methods['eta'], methods['bead_radius'])
-            error_young = Curve.determine_young_modulus(
-                error[1], methods['eta'], methods['bead_radius'])
+            if isinstance(error, np.ndarray):
+                # no error for the estimate replacing a fit beyond its budget
+                error_young = Curve.determine_young_modulus(
+                    error[1], methods['eta'], methods['bead_radius'])
             if young.any() < 0.0:
                 young = None
                 error_young = None
@@ -612,14 +737,12 @@ class Curve:
         """
         index_return_endline = None
         if type_curve is None:
-            list_data_return_endline = []
-            data = data_analyze[data_analyze.argmax():]
-            data = np.array(data)
-            list_data_return_endline = data[(
-                data < line_pos_threshold)]
-            if list_data_return_endline.size != 0:
-                index_return_endline = np.where(
-                    data_analyze == list_data_return_endline[0])[0][0] + 1
+            data_analyze = np.asarray(data_analyze)
+            index_force_max = int(data_analyze.argmax())
+            list_index_return_endline = np.flatnonzero(
+                data_analyze[index_force_max:] < line_pos_threshold)
+            if list_index_return_endline.size != 0:
+                index_return_endline = index_force_max + int(list_index_return_endline[0]) + 1
                 if index_return_endline >= len(data_analyze):
                     index_return_endline = len(data_analyze)-1
         return index_return_endline
@@ -724,21 +847,118 @@ class Curve:
             type_curve: str
                 classification of the curve at the time of analysis
         """
+        self.curve_return_points(methods, type_curve)
+        type_curve = self.classification(methods, type_curve)
+        return type_curve
+
+    ################################################################################################
+
+    def analysis_tier(self, methods, type_curve):
+        """
+        Depth of the analysis of the "Pull" segment needed by the curve. The classifications known
+        before the fits (NAD from the maximum force, ITU and RE from the baselines)
+        do not need all the steps, unless "full_analysis" is requested in the methods
+
+        :parameters:
+            methods: dict
+                dictionary with all the parameters entered by the user that condition the analysis
+            type_curve: str
+                classification of the curve given by the comparison of the baselines
+
+        :return:
+            tier: str
+                'full' (all the steps), 'adhesion' (curve to classify, all the steps),
+                'NAD' (no fit, no return point, no transition point), 'ITU' (no fit, no transition point)
+                or 'RE' (no fit)
+        """
+        if methods.get('full_analysis', False):
+            return 'full'
+        if type_curve is None:
+            if self.features['force_max_curve']['value'] <= methods['jump_force']:
+                return 'NAD'
+            return 'adhesion'
+        return type_curve
+
+    ################################################################################################
+
+    def curve_return_points(self, methods, type_curve, tier='full'):
+        """
+        Fit of the "Pull" segment of the curve and determination of the representative points
+        used by the classification
+
+        :parameters:
+            methods: dict
+                dictionary with all the parameters entered by the user that condition the analysis
+            type_curve: str
+                classification of the curve at the time of analysis
+            tier: str
+                depth of the analysis given by analysis_tier
+        """
         ###### data ###############
         segment = self.dict_segments['Pull']
-        force_data = segment.corrected_data[self.features["main_axis"]
-                                            ['axe'] + 'Signal1']
-        y_smooth = Curve.smooth(force_data, methods['width_window_smooth'], 2)
-        self.graphics['y_smooth_Pull'] = y_smooth
-        time_data = segment.corrected_data['time']
+        force_data = segment.values(self.features["main_axis"]['axe'] + 'Signal1')
+        window_smooth = methods['width_window_smooth']
+        self.graphics.set_overlay('y_smooth_Pull', 'smooth', 'Pull', window=window_smooth, order=2)
+        time_data = segment.values('time')
 
         ######## calcul release #########
+        index_release = self.precomputed.get(('contact', 'Pull', odd_window(window_smooth)))
+        y_smooth = None
+        if index_release is None and tier not in ('full', 'adhesion') and methods.get('coarse_factor'):
+            # no fit: release point searched on the decimated signal, without smoothing the whole segment
+            detector = CoarseToFine(force_data, window_smooth, 2, methods['coarse_factor'])
+            index_release = detector.band_point(*self.noise_band(), last=False)
+        if index_release is None or tier in ('full', 'adhesion'):
+            y_smooth = self.smooth_segment('Pull', window_smooth, 2)
         index_release, line_pos_threshold = self.retrieve_contact(
-            y_smooth, "Pull", methods['factor_noise'])
-        self.graphics['threshold_pull'] = line_pos_threshold
+            force_data if y_smooth is None else y_smooth, "Pull", methods['factor_noise'], index_release)
+        self.graphics.set_overlay('threshold_pull', 'constant', 'Pull', value=line_pos_threshold[0],
+                                  length=len(line_pos_threshold))
         self.features['point_release'] = {
             'index': index_release, 'value': force_data[index_release]}
 
+        if tier in ('full', 'adhesion'):
+            self.fit_curve_retraction(y_smooth, index_release, window_smooth)
+        if tier == 'NAD':
+            self.features['point_return_endline'] = {
+                'index': 'NaN', 'value': 'NaN'}
+            self.features['transition_point'] = {
+                'index': 'NaN', 'value (pN)': 'NaN'}
+            return
+
+        ############## calcul return point and transition point ######################
+        index_return_endline = Curve.retrieve_retour_line_end(
+            self, y_smooth, line_pos_threshold[0], type_curve)
+        if index_return_endline is not None:
+            #index_transition = index_return_endline - 20
+            self.features['point_return_endline'] = {
+                'index': index_return_endline, 'value': y_smooth[index_return_endline]}
+            # self.features['point_transition'] = {
+            #             'index': index_transition, 'value (pN)': y_smooth[index_transition]}
+            if tier != 'ITU':
+                # the transition point of the ITU curves is the end of the segment (classification)
+                derive_smooth = self.search_transition_point(time_data, force_data)
+        else:
+            self.features['point_return_endline'] = {
+                'index': 'NaN', 'value': 'NaN'}
+            self.features['transition_point'] = {
+                'index': 'NaN', 'value (pN)': 'NaN'}
+
+    ################################################################################################
+
+    def fit_curve_retraction(self, y_smooth, index_release, window_smooth=None):
+        """
+        Fit of the "Pull" segment from the release point
+
+        :parameters:
+            y_smooth: np.array
+                smoothed force of the "Pull" segment
+            index_release: int
+                index of the release point
+            window_smooth: int
+                size of the window of the smoothing, to use the fit of the batch analysis
+        """
+        time_data = self.dict_segments['Pull'].values('time')
         ################## calcul guess and fit ################
         ###### guess  ########
         if index_release > 40:
@@ -755,36 +975,29 @@ class Curve:
             y_2 = y_smooth[0]
         k = (y_1 - y_2) / (x_1 - x_2)
         point_release = time_data[index_release]  # x0
-        baseline = float(self.features['baseline_corrected_press (pN)'])
+        baseline = self.features['baseline_corrected_press (pN)']
         # initial_guess = [10**(9), point_release, 10**3]
         initial_guesses_accuracy = [k, point_release, baseline]
         ######## fit #########
-        f_parameters = curve_fit(
-            Curve.fit_model_retraction, time_data, y_smooth, initial_guesses_accuracy)
+        start = perf_counter()
+
+        def fit(budget):
+            if self.fit_method == 'closed_form':
+                if window_smooth is not None and ('fit', 'Pull', odd_window(window_smooth)) in self.precomputed:
+                    return self.precomputed[('fit', 'Pull', odd_window(window_smooth))] + (0,)
+                return fit_retraction(time_data, y_smooth) + (0,)
+            return curve_fit_counted(Curve.fit_model_retraction, time_data, y_smooth,
+                                     initial_guesses_accuracy, budget)
+
+        def fallback():
+            return initial_guesses_accuracy
+        popt, pcov, nfev, status = fit_with_fallback(fit, fallback, self.fit_budget)
+        f_parameters = (popt, pcov)
+        self.record_fit('fit_pull', nfev, start, status)
         self.message += str(f_parameters)
         self.features['Pente (pN/nm)'] = f_parameters[0][1]
-        fitted = Curve.fit_model_retraction(
-            time_data, f_parameters[0][0], f_parameters[0][1], f_parameters[0][2])
-        self.graphics['fitted_Pull'] = fitted
-
-        ############## calcul return point and transition point ######################
-        index_return_endline = Curve.retrieve_retour_line_end(
-            self, y_smooth, line_pos_threshold[0], type_curve)
-        if index_return_endline is not None:
-            #index_transition = index_return_endline - 20
-            self.features['point_return_endline'] = {
-                'index': index_return_endline, 'value': y_smooth[index_return_endline]}
-            # self.features['point_transition'] = {
-            #             'index': index_transition, 'value (pN)': y_smooth[index_transition]}
-            derive_smooth = self.search_transition_point(time_data, force_data)
-        else:
-            self.features['point_return_endline'] = {
-                'index': 'NaN', 'value': 'NaN'}
-            self.features['transition_point'] = {
-                'index': 'NaN', 'value (pN)': 'NaN'}
-
-        type_curve = self.classification(methods, type_curve)
-        return type_curve
+        self.graphics.set_overlay('fitted_Pull', 'model', 'Pull', 'time', model='fit_model_retraction',
+                                  parameters=tuple(f_parameters[0][:3]))
 
     ################################################################################################
     def fit_linear_classification(self, index_start, index_end, name_fit):
@@ -798,16 +1011,15 @@ class Curve:
         segment = self.dict_segments['Pull']
         y_smooth_pull = self.graphics['y_smooth_Pull']
         distance_data = None
-        if 'distance' in segment.corrected_data:
-            distance_data = np.abs(segment.corrected_data['distance'])
-        f_parameters = curve_fit(
-            Curve.linear_fit, distance_data[index_start:index_end], y_smooth_pull[index_start:index_end])
+        if segment.has_channel('distance'):
+            distance_data = np.abs(segment.values('distance'))
+        f_parameters = self.fit_linear(
+            distance_data[index_start:index_end], y_smooth_pull[index_start:index_end])
         self.features["slope_" + name_fit + " (pN/nm)"] = f_parameters[0][0]
-        fitted_classification = Curve.linear_fit(
-            distance_data[index_start:index_end], f_parameters[0][0], f_parameters[0][1])
-        self.graphics[name_fit] = fitted_classification
-        self.graphics['distance_' +
-                      name_fit] = distance_data[index_start:index_end]
+        self.graphics.set_overlay(name_fit, 'model', 'Pull', 'distance', index_start, index_end,
+                                  absolute=True, model='linear_fit', parameters=tuple(f_parameters[0][:2]))
+        self.graphics.set_overlay('distance_' + name_fit, 'channel', 'Pull', 'distance',
+                                  index_start, index_end, absolute=True)
 
     ###########################################################################################################################
 
@@ -831,29 +1043,32 @@ class Curve:
         """
         ########### data ############
         segment = self.dict_segments['Pull']
-        force_data = segment.corrected_data[self.features["main_axis"]
-                                            ['axe'] + 'Signal1']
+        force_data = segment.values(self.features["main_axis"]['axe'] + 'Signal1')
         distance_data = None
-        if 'distance' in segment.corrected_data:
-            distance_data = np.abs(segment.corrected_data['distance'])
-        time_data = segment.corrected_data['time']
+        if segment.has_channel('distance'):
+            distance_data = np.abs(segment.values('distance'))
+        time_data = segment.values('time')
 
         ############ points characteristics ##################
         index_release = self.features['point_release']['index']
         index_return_endline = self.features['point_return_endline']['index']
 
-        self.graphics = dict([(x, y) for x, y in self.graphics.items(
-        ) if not x.startswith('fitted_classification')])
-        self.graphics = dict([(x, y) for x, y in self.graphics.items(
-        ) if not x.startswith('distance_fitted_classification')])
+        for key in [key for key in self.graphics if key.startswith(
+                ('fitted_classification', 'distance_fitted_classification'))]:
+            del self.graphics[key]
 
         ############## classification NAD, AD, FTU ##################
         if type_curve is None:
-            index_force_max = self.graphics['y_smooth_Pull'][index_release:index_release+1500].argmax()
+            # smoothed on this window only, the NAD curves not needing the whole smoothed segment
+            index_force_max = self.smoothing.window(
+                'Pull', self.features['main_axis']['axe'] + 'Signal1', methods['width_window_smooth'], 2,
+                index_release, index_release+1500).argmax()
             if self.features['force_max_curve']['value'] <= methods['jump_force']:
                 type_curve = 'NAD'
             else:
                 if index_return_endline is not None and index_return_endline != 'NaN':
+                    y_smooth_pull = self.graphics['y_smooth_Pull']
+                    index_max_smooth = int(y_smooth_pull.argmax())
                     # if index_release < index_return_endline:
                     #     index_force_max = self.graphics['y_smooth_Pull'][index_release:index_return_endline].argmax()
                     # elif index_release > index_return_endline:
@@ -861,13 +1076,13 @@ class Curve:
                     # else:
                     index_force_max = self.features['force_max_curve']['index']
                     ##################### calcul jump ########################
-                    jump_force_start_pull = self.graphics['y_smooth_Pull'][self.graphics['y_smooth_Pull'].argmax()] - \
-                        self.graphics['y_smooth_Pull'][index_release]
+                    jump_force_start_pull = y_smooth_pull[index_max_smooth] - \
+                        y_smooth_pull[index_release]
                     jump_nb_points_start = index_force_max - index_release
                     jump_nb_points_end = index_return_endline - index_force_max
 
-                    jump_force_end_pull = self.graphics['y_smooth_Pull'][self.graphics['y_smooth_Pull'].argmax()] - \
-                        self.graphics['y_smooth_Pull'][index_return_endline]
+                    jump_force_end_pull = y_smooth_pull[index_max_smooth] - \
+                        y_smooth_pull[index_return_endline]
 
                     self.features['jump_force_start_pull (pN)'] = jump_force_start_pull
                     self.features['jump_force_end_pull (pN)'] = jump_force_end_pull
@@ -897,9 +1112,8 @@ class Curve:
                         ###### fit max ######
                         jump_nb_points_start = int(
                             self.features['jump_nb_points_start']//3)
-                        y_smooth_pull = self.graphics['y_smooth_Pull']
-                        index_start = y_smooth_pull.argmax()-jump_nb_points_start
-                        index_end = y_smooth_pull.argmax()
+                        index_start = index_max_smooth-jump_nb_points_start
+                        index_end = index_max_smooth
                         self.fit_linear_classification(
                             index_start, index_end, "fitted_classification_max")
 
@@ -911,7 +1125,7 @@ class Curve:
 
                         ####### fit max transition ####
                         if self.features['transition_point']['index'] != 'NaN':
-                            index_start = y_smooth_pull.argmax() + 2
+                            index_start = index_max_smooth + 2
                             index_end = self.features['transition_point']['index']
                             if index_start < index_end:
                                 self.fit_linear_classification(
@@ -939,7 +1153,7 @@ class Curve:
                         type_curve = 'FTU'
 
         else:
-            index_force_max = force_data.argmax()
+            index_force_max = segment.extrema()[self.features["main_axis"]['axe'] + 'Signal1']['index_max']
             if type_curve == "ITU":
                 self.features['transition_point'] = {'index': len(force_data)-1, 'value (pN)': force_data[len(force_data)-1]}
                 index_start = self.features['transition_point']['index'] - 2000
@@ -985,6 +1199,44 @@ class Curve:
         """
         return slope*time_data + offset
 
+    ##################################################################################################
+
+    def fit_linear(self, x_data, y_data):
+        """
+        Fit of a straight line on the data, in closed form by default
+        or with curve_fit if requested in the methods ("fit_method")
+
+        :parameters:
+            x_data: list
+                abscissa of the points to fit
+            y_data: list
+                ordinate of the points to fit
+        :return:
+            f_parameters: tuple
+                (popt, pcov) with popt = [slope, offset]
+        """
+        if self.fit_method == 'curve_fit':
+            return curve_fit_counted(Curve.linear_fit, x_data, y_data, None)[:2]
+        return linear_least_squares(x_data, y_data)
+
+    ##################################################################################################
+
+    def record_fit(self, name_fit, nfev, start, status='ok'):
+        """
+        Recording in the features of the cost and of the status of a fit of a segment
+
+        :parameters:
+            name_fit: str
+                name of the feature ('fit_press' or 'fit_pull')
+            nfev: int
+                number of evaluations of the model and of its Jacobian (0 for a closed-form fit)
+            start: float
+                value of time.perf_counter() at the beginning of the fit
+            status: str
+                'ok', or 'budget' / 'failed' if the parameters are the fallback estimate
+        """
+        self.features[name_fit] = {'nfev': nfev, 'time (s)': perf_counter() - start, 'status': status}
+
     ################################################################################################
         # Launching methods of analysis of the segments of the curve
     ################################################################################################
@@ -992,47 +1244,15 @@ class Curve:
     def analyzed_curve(self, methods, manual_correction):
         """
         launch of the important steps of the analysis of the characteristic elements for a curve
+        (stages of the pipeline, only those whose methods or data changed since the last analysis)
 
         :parameters:
             methods:dictionary with all the parameters provided by the user for the analysis
             correction: change from the initial correction mode requested
         """
-        optical_state = "No_correction"
-        self.detected_min_force()
-        type_curve = self.compare_baseline_start_end(methods['factor_noise'])
-        error = None
-        if not manual_correction:
-            if methods['optical'] == "Correction":
-                try:
-                    self.correction_optical_effect_object.automatic_correction(
-                        methods['factor_noise'])
-                    optical_state = "Auto_correction"
-                except Exception as error:
-                    print('###########################################')
-                    print(())
-                    print(type(error).__name__, ':')
-                    print(error)
-                    print(traceback.format_exc())
-                    print('index error No correction')
-                    print('###########################################')
-        self.curve_approach_analyze(methods)
-        type_curve = self.curve_return_analyze(methods, type_curve)
-        self.features['drug'] = methods['drug']
-        self.features['condition'] = methods['condition']
-        self.features['tolerance'] = methods['factor_noise']
-        self.features['optical_state'] = optical_state
-        if type_curve == None:
-            type_curve = 'RE'
-        if manual_correction:
-            self.features['type'] = type_curve
-        else:
-            self.features['automatic_type'] = type_curve
-        if type_curve == "NAD":
-            self.features['point_return_endline'] = {
-                'index': 'NaN', 'value': 'NaN'}
-            self.features['transition_point'] = {
-                'index': 'NaN', 'value (pN)': 'NaN'}
-        return error
+        self.fit_method = methods.get('fit_method', FIT_METHODS[0])
+        self.fit_budget = FitBudget(methods.get('fit_max_nfev'), methods.get('fit_max_time'))
+        return self.pipeline.run(dict(methods, manual_correction=manual_correction))
 
     ###############################################################################################
         # Methods used in the supervision of the interface
@@ -1046,20 +1266,13 @@ class Curve:
             type_data: str
                 Determined the dataframe to be used for visualization
                 (original data or corrected data)
-            y: str
-                data on the axe Y for the plot
         :return:
-            plot show
+            data_total: DataFrame
+                data of all the segments, whose columns are the contiguous arrays of the curve
         """
-        data_total = pd.DataFrame()
-        for segment in self.dict_segments.values():
-            if type_data == "data_original":
-                data_total = pd.concat(
-                    [data_total, segment.data], ignore_index=True, verify_integrity=True)
-            else:
-                data_total = pd.concat(
-                    [data_total, segment.corrected_data], ignore_index=True,  verify_integrity=True)
-        return data_total
+        if type_data == "data_original":
+            return self.arrays['data_original'].to_dataframe()
+        return self.arrays['data_corrected'].to_dataframe()
 
     ###################################################################################################
 
@@ -1081,25 +1294,18 @@ class Curve:
 
     def creation_output_curve(self):
         """
-        Creation of the output dataframe of each curve
-        Recovery and transformations of the dataframe "features" of the curve
+        Creation of the output dictionary of each curve
+        Recovery of the features of the curve with one level of keys
+        (numbers kept in full precision, formatted when the output file is written)
         """
-        for key_features, value_features in self.features.items():
-            if isinstance(value_features, dict):
-                for key_dict, value_dict in value_features.items():
-                    if key_dict in (key_features, key_features.split('_')[-1]):
-                        self.output[key_features] = value_dict
-                    else:
-                        self.output[key_features + "_" + key_dict] = value_dict
-            else:
-                self.output[key_features] = value_features
+        self.output.update(flatten_features(self.features))
         date = self.file.split('-')[1]
         hour = self.file.split('-')[2].split('.')[0:4]
         hour = '.'.join(hour)
         self.output['Date'] = date
         self.output['Hour'] = hour
-        self.output['theorical_contact_force (N)'] = format(float(
-            self.parameters_header['header_global']['settings.segment.0.setpoint.value']), '.1E')
+        self.output['theorical_contact_force (N)'] = float(
+            self.parameters_header['header_global']['settings.segment.0.setpoint.value'])
         time_segment_pause = 0
         for segment in self.dict_segments.values():
             if segment.header_segment['segment-settings.style'] == 'pause':
@@ -1110,12 +1316,12 @@ class Curve:
             elif segment.header_segment['segment-settings.style'] == 'motion':
                 length = segment.header_segment['segment-settings.length']
                 self.output['theorical_distance_' + segment.name +
-                            ' (m)'] = format(float(length), '.1E')
-                freq = format(float(segment.header_segment['segment-settings.num-points'])/float(
-                    segment.header_segment['segment-settings.duration']), '.1E')
+                            ' (m)'] = float(length)
+                freq = float(segment.header_segment['segment-settings.num-points'])/float(
+                    segment.header_segment['segment-settings.duration'])
                 self.output['theorical_freq_' + segment.name + ' (Hz)'] = freq
-                speed = format(float(segment.header_segment['segment-settings.length'])/float(
-                    segment.header_segment['segment-settings.duration']), '.1E')
+                speed = float(segment.header_segment['segment-settings.length'])/float(
+                    segment.header_segment['segment-settings.duration'])
                 self.output['theorical_speed_' +
                             segment.name + ' (m/s)'] = speed
 
@@ -0,0 +1,222 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# @author Thierry GALLIANO
+# @contributors Pierre-Henri PUECH, Laurent LIMOZIN, Guillaume GAY
+"""
+File describing the columnar storage of the data of a curve
+(one contiguous array per channel for all the segments, implicit uniform axes)
+"""
+import numpy as np
+import pandas as pd
+from .axis import UniformAxis
+
+# channels stored as UniformAxis when they are uniform in all the segments
+AXIS_CHANNELS = ('time', 'seriesTime', 'distance')
+
+
+class CurveArrays:
+    """
+    Data of all the segments of a curve stored channel by channel in contiguous arrays,
+    with the boundaries of the segments. The data of a segment are views on these arrays
+    and the concatenated data of the curve are the arrays themselves.
+    The uniform axes are kept as one UniformAxis per segment and materialized on request.
+    """
+
+    def __init__(self, channels, boundaries, segment_channels, axes=None):
+        """
+        :parameters:
+            channels: dict
+                contiguous array of each channel, by name
+            boundaries: np.array
+                position of the first point of each segment, followed by the total number of points
+            segment_channels: list(list(str))
+                channels present in each segment (in the order of the columns)
+            axes: dict
+                list of the UniformAxis of the segments, by name of channel
+        """
+        self.channels = channels
+        self.axes = {} if axes is None else axes
+        self.boundaries = np.asarray(boundaries, dtype=int)
+        self.segment_channels = segment_channels
+        self.names = []
+        for columns in segment_channels:
+            self.names.extend(name for name in columns if name not in self.names)
+
+    #########################################################################################
+
+    @classmethod
+    def from_frames(cls, frames, axis_channels=AXIS_CHANNELS):
+        """
+        Storage built from the DataFrames of the segments, in the order of the curve.
+        A channel missing in a segment is filled with NaN as with pd.concat
+
+        :parameters:
+            frames: list(DataFrame)
+                data of the segments
+            axis_channels: tuple(str)
+                channels to store as UniformAxis if they are uniform in all the segments
+
+        :return:
+            arrays: CurveArrays
+                contiguous storage of the data
+        """
+        lengths = [len(frame) for frame in frames]
+        boundaries = np.concatenate(([0], np.cumsum(lengths, dtype=int)))
+        segment_channels = [list(frame.columns) for frame in frames]
+        arrays = cls({}, boundaries, segment_channels)
+        for name in arrays.names:
+            if name in axis_channels and all(name in frame for frame in frames):
+                references = [None] * len(frames)
+                if name == 'seriesTime':
+                    # seriesTime = time + offset of the segment
+                    references = arrays.axes.get('time', references)
+                axes = [UniformAxis.from_values(frame[name], reference)
+                        for frame, reference in zip(frames, references)]
+                if None not in axes:
+                    arrays.axes[name] = axes
+                    continue
+            arrays.channels[name] = np.concatenate(
+                [frame[name].to_numpy() if name in frame else np.full(len(frame), np.nan)
+                 for frame in frames])
+        return arrays
+
+    #########################################################################################
+
+    def __len__(self):
+        """
+        Total number of points of the curve
+        """
+        return int(self.boundaries[-1])
+
+    #########################################################################################
+
+    def bounds(self, index_segment):
+        """
+        Positions of a segment in the arrays
+
+        :parameters:
+            index_segment: int
+                position of the segment in the curve
+
+        :return:
+            start, stop: int
+                first position and position after the last point of the segment
+        """
+        return int(self.boundaries[index_segment]), int(self.boundaries[index_segment + 1])
+
+    #########################################################################################
+
+    def has_channel(self, index_segment, name):
+        """
+        True if the channel is present in the segment
+
+        :parameters:
+            index_segment: int
+                position of the segment in the curve
+            name: str
+                name of the channel
+        """
+        return name in self.segment_channels[index_segment]
+
+    #########################################################################################
+
+    def axis(self, index_segment, name):
+        """
+        UniformAxis of a channel for a segment, None if the channel is stored as an array
+
+        :parameters:
+            index_segment: int
+                position of the segment in the curve
+            name: str
+                name of the channel
+        """
+        if name in self.axes:
+            return self.axes[name][index_segment]
+        return None
+
+    #########################################################################################
+
+    def materialize(self, name):
+        """
+        Replacement of the axes of a channel by a contiguous array (before its modification)
+
+        :parameters:
+            name: str
+                name of the channel
+        """
+        if name in self.axes:
+            self.channels[name] = self.channel(name)
+            del self.axes[name]
+
+    #########################################################################################
+
+    def channel(self, name):
+        """
+        Concatenated data of a channel for the whole curve
+        (no copy, except for the axes materialized at each call)
+
+        :parameters:
+            name: str
+                name of the channel
+        """
+        if name in self.axes:
+            return np.concatenate([axis.values() for axis in self.axes[name]])
+        return self.channels[name]
+
+    #########################################################################################
+
+    def view(self, index_segment, name):
+        """
+        Data of a channel for a segment (view on the contiguous array, or materialized axis)
+
+        :parameters:
+            index_segment: int
+                position of the segment in the curve
+            name: str
+                name of the channel
+        """
+        if name in self.axes:
+            return self.axes[name][index_segment].values()
+        start, stop = self.bounds(index_segment)
+        return self.channels[name][start:stop]
+
+    #########################################################################################
+
+    def value(self, index_segment, name, index):
+        """
+        Value of a point of a channel of a segment, O(1) without materializing the axes
+
+        :parameters:
+            index_segment: int
+                position of the segment in the curve
+            name: str
+                name of the channel
+            index: int
+                position of the point in the segment
+        """
+        if name in self.axes:
+            return self.axes[name][index_segment].value(index)
+        start, stop = self.bounds(index_segment)
+        return self.channels[name][start:stop][index]
+
+    #########################################################################################
+
+    def segment_frame(self, index_segment):
+        """
+        DataFrame adapter of a segment whose columns are views on the contiguous arrays
+
+        :parameters:
+            index_segment: int
+                position of the segment in the curve
+        """
+        return pd.DataFrame({name: self.view(index_segment, name)
+                             for name in self.segment_channels[index_segment]}, copy=False)
+
+    #########################################################################################
+
+    def to_dataframe(self):
+        """
+        DataFrame adapter of the whole curve, same result as the pd.concat of the segments
+        but whose columns are the contiguous arrays (no copy, not to be modified)
+        """
+        return pd.DataFrame({name: self.channel(name) for name in self.names}, copy=False)
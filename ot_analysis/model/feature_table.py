@@ -0,0 +1,384 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# @author Thierry GALLIANO
+# @contributors Pierre-Henri PUECH, Laurent LIMOZIN, Guillaume GAY
+"""
+File describing the table of the features of all the curves, with one typed column
+per feature (full precision numbers), formatted only when the output file is written
+"""
+import numpy as np
+import pandas as pd
+
+# columns of the output, in order ('fit_parameter' and 'fit_error' replaced according to the model)
+OUTPUT_COLUMNS = ['treat_supervised', 'automatic_type', 'type', 'report_problem', 'fit_status', 'automatic_AL', 'AL',
+                  'automatic_AL_axe', 'optical_state', 'model', 'Date', 'Hour', 'condition', 'drug',
+                  'tolerance', 'bead', 'cell', 'couple', 'main_axis', 'stiffness (N/m)',
+                  'theorical_contact_force (N)', 'theorical_distance_Press (m)', 'theorical_speed_Press (m/s)',
+                  'theorical_freq_Press (Hz)', 'theorical_distance_Pull (m)', 'theorical_speed_Pull (m/s)',
+                  'theorical_freq_Pull (Hz)', 'baseline_origin_press (N)', 'baseline_corrected_press (pN)',
+                  'std_origin_press (N)', 'std_corrected_press (pN)', 'fit_parameter', 'fit_error',
+                  'contact_point_index', 'contact_point_value', 'force_min_press_index',
+                  'force_min_press_value', 'force_min_curve_index', 'force_min_curve_value',
+                  'time_min_curve_index', 'time_min_curve_value (s)', 'point_release_index',
+                  'point_release_value', 'force_max_pull_index', 'force_max_pull_value',
+                  'force_max_curve_index', 'force_max_curve_value', 'transition_point_index',
+                  'transition_point_value (pN)', 'point_return_endline_index', 'point_return_endline_value']
+
+# parameter of the fit of "Press" and its error according to the model
+FIT_COLUMNS = {'linear': ('slope (pN/nm)', 'error (pN/nm)'),
+               'sphere': ('young (Pa)', 'error young (Pa)')}
+
+# columns of text or of mixed values (all the others are numbers)
+OBJECT_COLUMNS = {'treat_supervised', 'automatic_type', 'type', 'report_problem', 'fit_status', 'automatic_AL', 'AL',
+                  'automatic_AL_axe', 'optical_state', 'model', 'Date', 'Hour', 'condition', 'drug',
+                  'bead', 'cell', 'couple', 'main_axis', 'main_axis_sign', 'main_axis_axe',
+                  'relative_path', 'valid_fit_press', 'valid_fit_pull', 'fit_press_status', 'fit_pull_status'}
+
+# columns of flags (booleans in the typed output files)
+BOOLEAN_COLUMNS = {'treat_supervised', 'report_problem', 'valid_fit_press', 'valid_fit_pull'}
+
+# format of the numbers in the output file (full precision for the other columns)
+OUTPUT_FORMATS = {'stiffness (N/m)': '.3E', 'baseline_origin_press (N)': '.3E',
+                  'baseline_corrected_press (pN)': '.3E', 'std_origin_press (N)': '.3E',
+                  'std_corrected_press (pN)': '.3E', 'slope (pN/nm)': '.2E', 'error (pN/nm)': '.2E',
+                  'theorical_contact_force (N)': '.1E'}
+OUTPUT_FORMATS_PREFIX = {'theorical_distance_': '.1E', 'theorical_freq_': '.1E', 'theorical_speed_': '.1E'}
+
+# units added to the names of the columns of the output
+OUTPUT_NAMES = {'contact_point_value': 'contact_point_value  (pN)',
+                'force_min_press_value': 'force_min_press_value (pN)',
+                'force_min_curve_value': 'force_min_curve_value (pN)',
+                'force_max_curve_value': 'force_max_curve_value (pN)',
+                'point_release_value': 'point_release_value (pN)',
+                'force_max_pull_value': 'force_max_pull_value (pN)',
+                'point_return_endline_value': 'point_return_endline_value (pN)'}
+
+###############################################################################################
+
+
+def flatten_features(features):
+    """
+    Features of a curve with one level of keys, the dictionaries of the points
+    giving one column per entry ("contact_point" + "index" -> "contact_point_index")
+
+    :parameters:
+        features: dict
+            features of a curve
+
+    :return:
+        (name, value): generator of the columns of the curve
+    """
+    for key_features, value_features in features.items():
+        if isinstance(value_features, dict):
+            for key_dict, value_dict in value_features.items():
+                if key_dict in (key_features, key_features.split('_')[-1]):
+                    yield key_features, value_dict
+                else:
+                    yield key_features + "_" + key_dict, value_dict
+        else:
+            yield key_features, value_features
+
+###############################################################################################
+
+
+def column_kind(name):
+    """
+    Type of a column of the table from its name
+
+    :parameters:
+        name: str
+            name of the column
+
+    :return:
+        kind: str
+            'int' for the indexes and the counters, 'object' for the texts, 'float' otherwise
+    """
+    if name in OBJECT_COLUMNS:
+        return 'object'
+    if name.endswith(('_index', '_nfev')) or name.startswith('jump_nb_points'):
+        return 'int'
+    return 'float'
+
+###############################################################################################
+
+
+def output_format(name):
+    """
+    Format of the numbers of a column in the output file, None for the full precision
+
+    :parameters:
+        name: str
+            name of the column
+    """
+    if name in OUTPUT_FORMATS:
+        return OUTPUT_FORMATS[name]
+    for prefix, format_number in OUTPUT_FORMATS_PREFIX.items():
+        if name.startswith(prefix):
+            return format_number
+    return None
+
+###############################################################################################
+
+
+class FeatureTable:
+    """
+    Table of the features of the curves, one row per curve and one typed array per column,
+    filled by index. Columns are created at their first value (missing values NaN / None)
+    """
+
+    def __init__(self, labels):
+        """
+        :parameters:
+            labels: list(str)
+                names of the rows (names of the files of the curves)
+        """
+        self.labels = list(labels)
+        self.columns = {}
+
+    #########################################################################################
+
+    @classmethod
+    def from_curves(cls, curves):
+        """
+        Table filled with the output of each curve (name, date, theoretical values) and its features
+
+        :parameters:
+            curves: list(Curve)
+                curves of the analysis
+
+        :return:
+            table: FeatureTable
+        """
+        curves = list(curves)
+        table = cls([curve.file for curve in curves])
+        for index, curve in enumerate(curves):
+            curve.creation_output_curve()
+            table.fill(index, curve.output)
+        return table
+
+    #########################################################################################
+
+    def __len__(self):
+        """
+        Number of rows of the table
+        """
+        return len(self.labels)
+
+    #########################################################################################
+
+    def column(self, name):
+        """
+        Array of a column, created empty (NaN or None) at the first request
+
+        :parameters:
+            name: str
+                name of the column
+        """
+        if name not in self.columns:
+            if column_kind(name) == 'object':
+                self.columns[name] = np.full(len(self), None, dtype=object)
+            else:
+                self.columns[name] = np.full(len(self), np.nan)
+        return self.columns[name]
+
+    #########################################################################################
+
+    def set(self, row, name, value):
+        """
+        Value of a cell, the texts 'NaN' and None of the numeric columns giving NaN
+
+        :parameters:
+            row: int
+                position of the curve in the table
+            name: str
+                name of the column
+            value:
+                value of the feature
+        """
+        column = self.column(name)
+        if column.dtype != object:
+            if value is None or isinstance(value, str):
+                value = np.nan
+            elif np.ndim(value) > 0:
+                # unexpected structure in a numeric column: the column becomes an object column
+                self.columns[name] = column = column.astype(object)
+        column[row] = value
+
+    #########################################################################################
+
+    def fill(self, row, record):
+        """
+        Values of a row from a dictionary (or a features dictionary of a curve)
+
+        :parameters:
+            row: int
+                position of the curve in the table
+            record: dict
+                values by name of column, with possibly one level of nested dictionaries
+        """
+        for name, value in flatten_features(record):
+            self.set(row, name, value)
+
+    #########################################################################################
+
+    def to_dataframe(self):
+        """
+        DataFrame of the table with its types (nullable integers for the indexes)
+        """
+        data = {}
+        for name, column in self.columns.items():
+            if column.dtype != object and column_kind(name) == 'int':
+                data[name] = pd.array(column, dtype='Int64')
+            else:
+                data[name] = column
+        return pd.DataFrame(data, index=self.labels)
+
+    #########################################################################################
+
+    def output_columns(self, model):
+        """
+        Order of the columns of the output file: the fixed columns, the pauses after
+        the theoretical values of their segment, then the others in their order of creation
+
+        :parameters:
+            model: str
+                model of the fit of "Press" ('linear' or 'sphere')
+        """
+        fit_columns = FIT_COLUMNS.get(model, ('', ''))
+        columns = [fit_columns[0] if name == 'fit_parameter' else fit_columns[1] if name == 'fit_error'
+                   else name for name in OUTPUT_COLUMNS]
+        for name in self.columns:
+            if name in columns or name in ('main_axis_sign', 'main_axis_axe'):
+                continue
+            if name.startswith('time_segment_pause'):
+                if name.endswith('Wait1 (s)'):
+                    columns.insert(columns.index('theorical_freq_Press (Hz)') + 1, name)
+                else:
+                    columns.insert(columns.index('theorical_freq_Pull (Hz)') + 1, name)
+            else:
+                columns.append(name)
+        return columns
+
+    #########################################################################################
+
+    def typed_output(self):
+        """
+        DataFrame of the output with its types: combined main axis, pauses at 0 when absent,
+        columns ordered and renamed, numbers in full precision
+
+        :return:
+            output: DataFrame
+        """
+        main_axis = self.column('main_axis')
+        main_axis[:] = [str(sign) + str(axe) for sign, axe in
+                        zip(self.column('main_axis_sign'), self.column('main_axis_axe'))]
+        for name in ('valid_fit_press', 'valid_fit_pull'):
+            if name not in self.columns:
+                self.column(name)[:] = False
+        for name, column in self.columns.items():
+            if name.startswith('time_segment_pause'):
+                column[np.isnan(column)] = 0
+        model = self.column('model')[0] if len(self) > 0 else None
+        output = self.to_dataframe()
+        output = output.reindex(columns=self.output_columns(model))
+        return output.rename(columns=OUTPUT_NAMES)
+
+    #########################################################################################
+
+    def output(self):
+        """
+        DataFrame of the output file: typed output with the numbers formatted as expected in the file
+
+        :return:
+            output: DataFrame
+        """
+        return format_output(self.typed_output())
+
+###############################################################################################
+
+
+def output_header(model):
+    """
+    Fixed columns of the output file for a model, with their names in the file
+    (the pauses and the other features of the curves come with the curves)
+
+    :parameters:
+        model: str
+            model of the fit of "Press" ('linear' or 'sphere')
+
+    :return:
+        columns: list(str)
+    """
+    return [OUTPUT_NAMES.get(name, name) for name in FeatureTable([]).output_columns(model)]
+
+###############################################################################################
+
+
+def format_output(output):
+    """
+    Numbers of a typed output formatted as expected in the output file
+
+    :parameters:
+        output: DataFrame
+            typed output (FeatureTable.typed_output)
+
+    :return:
+        output: DataFrame
+    """
+    output = output.copy()
+    for name in output.columns:
+        format_number = output_format(name)
+        if format_number is not None and output[name].dtype != object:
+            output[name] = [value if np.isnan(value) else format(value, format_number)
+                            for value in output[name]]
+    return output
+
+###############################################################################################
+
+
+def column_dtype(name):
+    """
+    Type of a column of the typed output files (renamed columns of the output)
+
+    :parameters:
+        name: str
+            name of the column
+
+    :return:
+        dtype: str
+            'Int64' (nullable integers), 'float64', 'boolean' (nullable) or 'string'
+    """
+    if name in BOOLEAN_COLUMNS:
+        return 'boolean'
+    kind = column_kind(name)
+    return {'int': 'Int64', 'float': 'float64'}.get(kind, 'string')
+
+###############################################################################################
+
+
+def typed_frame(output):
+    """
+    Output with explicit types for the typed output files: texts (and lists) as strings,
+    flags as nullable booleans, missing values as NA
+
+    :parameters:
+        output: DataFrame
+            typed output, possibly with INC rows
+
+    :return:
+        output: DataFrame
+    """
+    columns = {}
+    for name in output.columns:
+        dtype = column_dtype(name)
+        column = output[name]
+        if dtype == 'string':
+            column = column.map(lambda value: None if value is None or (isinstance(value, float) and
+                                                                         np.isnan(value)) else str(value))
+        elif dtype == 'boolean':
+            column = column.map(lambda value: None if value is None or (isinstance(value, float) and
+                                                                         np.isnan(value)) else bool(value))
+        elif dtype == 'float64':
+            column = pd.to_numeric(column, errors='coerce')
+        columns[name] = column.astype(dtype)
+    return pd.DataFrame(columns, index=output.index.astype(str))
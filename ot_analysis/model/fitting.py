@@ -0,0 +1,732 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# @author Thierry GALLIANO
+# @contributors Pierre-Henri PUECH, Laurent LIMOZIN, Guillaume GAY
+"""
+Fitting kernels of the contact models of the analysis: closed-form fits for the linear
+and piecewise-linear models, analytic Jacobian for the sphere model
+"""
+from time import perf_counter
+import numpy as np
+from scipy.optimize import curve_fit
+
+FIT_METHODS = ('closed_form', 'curve_fit')
+MAXFEV_SPHERE_WINDOW = 400
+# status of a fit: converged, interrupted by its budget (or maxfev), failed on the data
+FIT_STATUS = ('ok', 'budget', 'failed')
+
+
+def linear_least_squares(x_data, y_data):
+    """
+    Closed-form least squares fit of a straight line y = slope * x + offset
+
+    :parameters:
+        x_data: list(np.array)
+            abscissa of the points to fit
+        y_data: list(np.array)
+            ordinate of the points to fit
+
+    :return:
+        f_parameters: tuple
+            (popt, pcov) in the same format as scipy.optimize.curve_fit
+            with popt = [slope, offset]
+    """
+    x_data = np.asarray(x_data, dtype=float)
+    y_data = np.asarray(y_data, dtype=float)
+    nb_points = len(x_data)
+    if nb_points < 2:
+        raise ValueError("Improper input: at least 2 points are needed for a linear fit, "
+                         + str(nb_points) + " given")
+    x_mean = x_data.mean()
+    y_mean = y_data.mean()
+    x_centered = x_data - x_mean
+    y_centered = y_data - y_mean
+    sxx = np.dot(x_centered, x_centered)
+    sxy = np.dot(x_centered, y_centered)
+    if sxx == 0:
+        raise ValueError("Improper input: abscissa values are all identical")
+    slope = sxy / sxx
+    offset = y_mean - slope * x_mean
+    popt = np.array([slope, offset])
+    pcov = np.full((2, 2), np.inf)
+    if nb_points > 2:
+        residuals = y_centered - slope * x_centered
+        variance = np.dot(residuals, residuals) / (nb_points - 2)
+        pcov = variance * np.array([[1 / sxx, -x_mean / sxx],
+                                    [-x_mean / sxx, 1 / nb_points + x_mean**2 / sxx]])
+    return popt, pcov
+
+###############################################################################################
+
+
+class HingeSums:
+    """
+    Cumulative sums allowing to evaluate in O(1) the least squares fit of a continuous
+    two-piece model (a constant level on one side of a breakpoint, a straight line on the other side)
+    for any position of the breakpoint
+    """
+
+    def __init__(self, x_data, y_data, flat_side='left'):
+        """
+        :parameters:
+            x_data: np.array
+                abscissa of the points, sorted in ascending order
+            y_data: np.array
+                ordinate of the points
+            flat_side: str
+                'left' if the constant level is before the breakpoint (approach model),
+                'right' if it is after (retraction model)
+        """
+        # centering reduces the cancellation in the differences of cumulative sums
+        self.x_mean = x_data.mean()
+        self.x_data = x_data - self.x_mean
+        y_data = y_data - y_data.mean()
+        self.flat_side = flat_side
+        self.nb_points = len(x_data)
+        self.sum_y = y_data.sum()
+        self.sum_yy = np.dot(y_data, y_data)
+        self.cumul_x = np.concatenate(([0.0], np.cumsum(self.x_data)))
+        self.cumul_xx = np.concatenate(([0.0], np.cumsum(self.x_data * self.x_data)))
+        self.cumul_y = np.concatenate(([0.0], np.cumsum(y_data)))
+        self.cumul_xy = np.concatenate(([0.0], np.cumsum(self.x_data * y_data)))
+
+    def line_sums(self, split):
+        """
+        Sums over the points of the linear part
+
+        :parameters:
+            split: int or np.array
+                number of points before the breakpoint
+        :return:
+            tuple of the number of points and the sums of x, x², y and xy on the linear part
+        """
+        if self.flat_side == 'left':
+            return (self.nb_points - split, self.cumul_x[-1] - self.cumul_x[split],
+                    self.cumul_xx[-1] - self.cumul_xx[split], self.cumul_y[-1] - self.cumul_y[split],
+                    self.cumul_xy[-1] - self.cumul_xy[split])
+        return (split, self.cumul_x[split], self.cumul_xx[split], self.cumul_y[split], self.cumul_xy[split])
+
+    def fit(self, split, breakpoint):
+        """
+        Least squares fit of the level and the slope for a given breakpoint
+
+        :parameters:
+            split: int or np.array
+                number of points before the breakpoint
+            breakpoint: float or np.array
+                abscissa of the breakpoint (centered)
+        :return:
+            slope, level, sse: float or np.array
+                slope of the linear part, constant level (centered) and sum of the squared residuals
+        """
+        nb_line, sum_x, sum_xx, sum_y, sum_xy = self.line_sums(split)
+        sum_h = sum_x - nb_line * breakpoint
+        sum_hh = sum_xx - 2 * breakpoint * sum_x + nb_line * breakpoint**2
+        sum_hy = sum_xy - breakpoint * sum_y
+        shh = sum_hh - sum_h**2 / self.nb_points
+        shy = sum_hy - sum_h * self.sum_y / self.nb_points
+        with np.errstate(divide='ignore', invalid='ignore'):
+            slope = np.where(shh > 0, shy / shh, 0.0)
+            sse = np.where(shh > 0, self.sum_yy - shy**2 / shh, self.sum_yy)
+        level = (self.sum_y - slope * sum_h) / self.nb_points
+        return slope, level, sse
+
+    def split_of(self, breakpoint):
+        """
+        Number of points before a breakpoint (flat side included on the left)
+
+        :parameters:
+            breakpoint: float
+                abscissa of the breakpoint (centered)
+        """
+        if self.flat_side == 'left':
+            return int(np.searchsorted(self.x_data, breakpoint, 'right'))
+        return int(np.searchsorted(self.x_data, breakpoint, 'left'))
+
+###############################################################################################
+
+
+def segmented_regression(x_data, y_data, flat_side='left', min_points=2):
+    """
+    Exact search of the breakpoint of a continuous two-piece model made of
+    a constant level on one side and a straight line on the other side.
+    The sum of the squared residuals is evaluated in O(1) for a breakpoint on every point
+    thanks to cumulative sums (O(n) search), then the breakpoint is refined
+    between the two neighbouring points by a golden-section search.
+
+    :parameters:
+        x_data: list(np.array)
+            abscissa of the points, sorted in ascending order
+        y_data: list(np.array)
+            ordinate of the points
+        flat_side: str
+            'left' if the constant level is before the breakpoint (approach model),
+            'right' if it is after (retraction model)
+        min_points: int
+            minimum number of points on each side of the breakpoint
+
+    :return:
+        breakpoint: float
+            abscissa of the change of slope
+        slope: float
+            directing coefficient of the linear part
+        level: float
+            value of the constant part
+        jacobian: np.array
+            derivatives of the model with respect to (breakpoint, slope, level)
+            for each point, used to estimate the covariance
+        residuals: np.array
+            difference between the data and the model
+    """
+    x_data = np.asarray(x_data, dtype=float)
+    y_data = np.asarray(y_data, dtype=float)
+    nb_points = len(x_data)
+    if nb_points < 2 * min_points + 1:
+        raise ValueError("Improper input: not enough points for a segmented regression")
+    sums = HingeSums(x_data, y_data, flat_side)
+    candidates = np.arange(min_points, nb_points - min_points)
+    if flat_side == 'left':
+        # breakpoint on the point j: points 0..j on the constant level
+        splits = candidates + 1
+    else:
+        # breakpoint on the point j: points 0..j-1 on the line
+        splits = candidates
+    _, _, sse = sums.fit(splits, sums.x_data[candidates])
+    best = candidates[np.argmin(sse)]
+
+    # golden-section refinement of the breakpoint between the neighbouring points
+    golden = (np.sqrt(5) - 1) / 2
+    low = sums.x_data[max(best - 1, 0)]
+    high = sums.x_data[min(best + 1, nb_points - 1)]
+
+    def sse_at(breakpoint):
+        return float(sums.fit(sums.split_of(breakpoint), breakpoint)[2])
+    point_1 = high - golden * (high - low)
+    point_2 = low + golden * (high - low)
+    sse_1 = sse_at(point_1)
+    sse_2 = sse_at(point_2)
+    for _ in range(60):
+        if sse_1 < sse_2:
+            high, point_2, sse_2 = point_2, point_1, sse_1
+            point_1 = high - golden * (high - low)
+            sse_1 = sse_at(point_1)
+        else:
+            low, point_1, sse_1 = point_1, point_2, sse_2
+            point_2 = low + golden * (high - low)
+            sse_2 = sse_at(point_2)
+        if high - low <= 1e-12 * max(1.0, abs(high)):
+            break
+    breakpoint = (low + high) / 2
+    if sse_at(breakpoint) > sse_at(sums.x_data[best]):
+        breakpoint = sums.x_data[best]
+    breakpoint = breakpoint + sums.x_mean
+
+    if flat_side == 'left':
+        hinge = np.where(x_data > breakpoint, x_data - breakpoint, 0.0)
+    else:
+        hinge = np.where(x_data < breakpoint, x_data - breakpoint, 0.0)
+    design = np.column_stack((hinge, np.ones(nb_points)))
+    (slope, level), _, _, _ = np.linalg.lstsq(design, y_data, rcond=None)
+    residuals = y_data - (slope * hinge + level)
+    jacobian = np.column_stack((np.where(hinge != 0, -slope, 0.0), hinge, np.ones(nb_points)))
+    return breakpoint, slope, level, jacobian, residuals
+
+###############################################################################################
+
+
+def segmented_regression_batch(x_data, y_data, flat_side='left', min_points=2):
+    """
+    Segmented regression of several signals of the same length at once (one signal per line):
+    the sums of the squared residuals of every breakpoint of every line are evaluated
+    with 2D cumulative sums, then the breakpoints of all the lines are refined together
+    by golden-section searches. Same model and results as segmented_regression
+    (up to the rounding of the vectorized operations)
+
+    :parameters:
+        x_data: np.array
+            abscissa of the points, sorted in strictly ascending order,
+            one line per signal or a single line shared by all the signals
+        y_data: np.array
+            ordinate of the points, one line per signal
+        flat_side: str
+            'left' if the constant level is before the breakpoint (approach model),
+            'right' if it is after (retraction model)
+        min_points: int
+            minimum number of points on each side of the breakpoint
+
+    :return:
+        breakpoint, slope, level: np.array
+            parameters of the model, one value per line
+        pcov: np.array
+            covariance matrix of (breakpoint, slope, level), one matrix per line
+    """
+    y_data = np.atleast_2d(np.asarray(y_data, dtype=float))
+    x_data = np.broadcast_to(np.atleast_2d(np.asarray(x_data, dtype=float)), y_data.shape)
+    nb_lines, nb_points = y_data.shape
+    if nb_points < 2 * min_points + 1:
+        raise ValueError("Improper input: not enough points for a segmented regression")
+    lines = np.arange(nb_lines)
+    # centering reduces the cancellation in the differences of cumulative sums
+    x_mean = x_data.mean(axis=1)
+    x_centered = x_data - x_mean[:, None]
+    y_centered = y_data - y_data.mean(axis=1)[:, None]
+    sum_y = y_centered.sum(axis=1)[:, None]
+    sum_yy = np.einsum('ij,ij->i', y_centered, y_centered)[:, None]
+    cumuls = [np.hstack((np.zeros((nb_lines, 1)), np.cumsum(values, axis=1)))
+              for values in (x_centered, x_centered * x_centered, y_centered, x_centered * y_centered)]
+
+    def sse_of(split, breakpoint):
+        # one line per signal, one column per tested breakpoint
+        sums = [cumul[lines[:, None], split] for cumul in cumuls]
+        nb_line = split
+        if flat_side == 'left':
+            sums = [cumul[:, -1:] - value for cumul, value in zip(cumuls, sums)]
+            nb_line = nb_points - split
+        sum_x, sum_xx, sum_line_y, sum_xy = sums
+        sum_h = sum_x - nb_line * breakpoint
+        sum_hh = sum_xx - 2 * breakpoint * sum_x + nb_line * breakpoint**2
+        sum_hy = sum_xy - breakpoint * sum_line_y
+        shh = sum_hh - sum_h**2 / nb_points
+        shy = sum_hy - sum_h * sum_y / nb_points
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(shh > 0, sum_yy - shy**2 / shh, sum_yy)
+
+    candidates = np.arange(min_points, nb_points - min_points)
+    splits = candidates + 1 if flat_side == 'left' else candidates
+    sse = sse_of(np.broadcast_to(splits, (nb_lines, len(candidates))), x_centered[:, candidates])
+    best = candidates[np.argmin(sse, axis=1)]
+
+    # the refined breakpoint stays between the neighbours of the best point
+    first = np.maximum(best - 1, 0)
+    neighbours = x_centered[lines[:, None], np.minimum(first[:, None] + np.arange(3), nb_points - 1)]
+
+    def sse_at(breakpoint):
+        if flat_side == 'left':
+            split = first + np.count_nonzero(neighbours <= breakpoint[:, None], axis=1)
+        else:
+            split = first + np.count_nonzero(neighbours < breakpoint[:, None], axis=1)
+        return sse_of(split[:, None], breakpoint[:, None])[:, 0]
+    golden = (np.sqrt(5) - 1) / 2
+    low = x_centered[lines, first]
+    high = x_centered[lines, np.minimum(best + 1, nb_points - 1)]
+    point_1 = high - golden * (high - low)
+    point_2 = low + golden * (high - low)
+    sse_1 = sse_at(point_1)
+    sse_2 = sse_at(point_2)
+    active = np.ones(nb_lines, dtype=bool)
+    for _ in range(60):
+        to_left = active & (sse_1 < sse_2)
+        to_right = active & ~(sse_1 < sse_2)
+        high = np.where(to_left, point_2, high)
+        low = np.where(to_right, point_1, low)
+        point_1, point_2 = (np.where(to_left, high - golden * (high - low), np.where(to_right, point_2, point_1)),
+                            np.where(to_right, low + golden * (high - low), np.where(to_left, point_1, point_2)))
+        sse_1, sse_2 = np.where(to_right, sse_2, sse_1), np.where(to_left, sse_1, sse_2)
+        sse_new = sse_at(np.where(to_left, point_1, point_2))
+        sse_1 = np.where(to_left, sse_new, sse_1)
+        sse_2 = np.where(to_right, sse_new, sse_2)
+        active &= high - low > 1e-12 * np.maximum(1.0, np.abs(high))
+        if not active.any():
+            break
+    breakpoint = (low + high) / 2
+    on_point = x_centered[lines, best]
+    breakpoint = np.where(sse_at(breakpoint) > sse_at(on_point), on_point, breakpoint) + x_mean
+
+    breakpoints = breakpoint[:, None]
+    if flat_side == 'left':
+        hinge = np.where(x_data > breakpoints, x_data - breakpoints, 0.0)
+    else:
+        hinge = np.where(x_data < breakpoints, x_data - breakpoints, 0.0)
+    hinge_centered = hinge - hinge.mean(axis=1)[:, None]
+    shh = np.einsum('ij,ij->i', hinge_centered, hinge_centered)
+    shy = np.einsum('ij,ij->i', hinge_centered, y_data)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        slope = np.where(shh > 0, shy / shh, 0.0)
+    level = y_data.mean(axis=1) - slope * hinge.mean(axis=1)
+    residuals = y_data - (slope[:, None] * hinge + level[:, None])
+    jacobian = np.stack((np.where(hinge != 0, -slope[:, None], 0.0), hinge, np.ones_like(hinge)), axis=2)
+    if nb_points <= 3:
+        pcov = np.full((nb_lines, 3, 3), np.inf)
+    else:
+        variance = np.einsum('ij,ij->i', residuals, residuals) / (nb_points - 3)
+        pcov = np.linalg.pinv(np.einsum('lni,lnj->lij', jacobian, jacobian)) * variance[:, None, None]
+    return breakpoint, slope, level, pcov
+
+###############################################################################################
+
+
+def covariance_from_jacobian(jacobian, residuals):
+    """
+    Estimation of the covariance of the parameters as done by scipy.optimize.curve_fit
+    (absolute_sigma=False): pcov = inv(J^T J) * SSE / (n - p)
+
+    :parameters:
+        jacobian: np.array
+            derivatives of the model for each point and each parameter
+        residuals: np.array
+            difference between the data and the model
+
+    :return:
+        pcov: np.array
+            covariance matrix of the parameters
+    """
+    nb_points, nb_parameters = jacobian.shape
+    if nb_points <= nb_parameters:
+        return np.full((nb_parameters, nb_parameters), np.inf)
+    variance = np.dot(residuals, residuals) / (nb_points - nb_parameters)
+    return np.linalg.pinv(jacobian.T @ jacobian) * variance
+
+###############################################################################################
+
+
+def fit_approach_linear(x_data, y_data):
+    """
+    Closed-form fit of the linear contact model of the "Press" segment
+    (baseline before the contact point, then a straight line)
+
+    :parameters:
+        x_data: list(np.array)
+            time data of the "Press" segment
+        y_data: list(np.array)
+            force data of the "Press" segment
+
+    :return:
+        f_parameters: tuple
+            (popt, pcov) with popt = [contact_point, k, baseline] as expected by
+            Curve.fit_model_approach
+    """
+    contact_point, k, baseline, jacobian, residuals = segmented_regression(
+        x_data, y_data, 'left')
+    popt = np.array([contact_point, k, baseline])
+    return popt, covariance_from_jacobian(jacobian, residuals)
+
+###############################################################################################
+
+
+def fit_retraction(x_data, y_data):
+    """
+    Closed-form fit of the model of the "Pull" segment
+    (straight line until the release point, then the end line)
+
+    :parameters:
+        x_data: list(np.array)
+            time data of the "Pull" segment
+        y_data: list(np.array)
+            force data of the "Pull" segment
+
+    :return:
+        f_parameters: tuple
+            (popt, pcov) with popt = [k, point_release, endline] as expected by
+            Curve.fit_model_retraction
+    """
+    point_release, k, endline, jacobian, residuals = segmented_regression(
+        x_data, y_data, 'right')
+    popt = np.array([k, point_release, endline])
+    pcov = covariance_from_jacobian(jacobian, residuals)
+    # jacobian columns are (breakpoint, slope, level), reorder as (slope, breakpoint, level)
+    order = [1, 0, 2]
+    return popt, pcov[np.ix_(order, order)]
+
+###############################################################################################
+
+
+def fit_approach_linear_batch(x_data, y_data):
+    """
+    Closed-form fits of the linear contact model of the "Press" segments of several curves
+    of the same length (see fit_approach_linear)
+
+    :parameters:
+        x_data: np.array
+            time data of the "Press" segments, one line per curve
+        y_data: np.array
+            force data of the "Press" segments, one line per curve
+
+    :return:
+        popt: np.array
+            [contact_point, k, baseline] for each curve
+        pcov: np.array
+            covariance matrix of the parameters for each curve
+    """
+    contact_point, k, baseline, pcov = segmented_regression_batch(x_data, y_data, 'left')
+    return np.column_stack((contact_point, k, baseline)), pcov
+
+
+def fit_retraction_batch(x_data, y_data):
+    """
+    Closed-form fits of the model of the "Pull" segments of several curves
+    of the same length (see fit_retraction)
+
+    :parameters:
+        x_data: np.array
+            time data of the "Pull" segments, one line per curve
+        y_data: np.array
+            force data of the "Pull" segments, one line per curve
+
+    :return:
+        popt: np.array
+            [k, point_release, endline] for each curve
+        pcov: np.array
+            covariance matrix of the parameters for each curve
+    """
+    point_release, k, endline, pcov = segmented_regression_batch(x_data, y_data, 'right')
+    order = [1, 0, 2]
+    return np.column_stack((k, point_release, endline)), pcov[:, order][:, :, order]
+
+###############################################################################################
+
+
+class BudgetExceeded(RuntimeError):
+    """
+    Interruption of an iterative fit whose budget of evaluations or of time is spent
+    """
+
+###############################################################################################
+
+
+class FitBudget:
+    """
+    Budget of evaluations of the model (and of its Jacobian) and of time of an iterative fit,
+    counted by wrapping the functions given to the optimizer
+    """
+
+    def __init__(self, max_nfev=None, max_time=None):
+        """
+        :parameters:
+            max_nfev: int
+                maximum number of evaluations, None or 0 for no limit
+            max_time: float
+                maximum duration of the fit (s), None or 0 for no limit
+        """
+        self.max_nfev = max_nfev
+        self.max_time = max_time
+        self.nfev = 0
+        self.deadline = None
+
+    def start(self):
+        """
+        Beginning of a fit: counter and clock reset
+        """
+        self.nfev = 0
+        self.deadline = perf_counter() + self.max_time if self.max_time else None
+
+    def limited(self, function):
+        """
+        Function counting its calls and raising BudgetExceeded once the budget is spent
+
+        :parameters:
+            function: callable
+                model or Jacobian given to the optimizer
+        """
+        def budgeted(*args):
+            self.nfev += 1
+            if self.max_nfev and self.nfev > self.max_nfev:
+                raise BudgetExceeded("Fit stopped: " + str(self.max_nfev) + " evaluations reached")
+            if self.deadline is not None and perf_counter() > self.deadline:
+                raise BudgetExceeded("Fit stopped: " + str(self.max_time) + " s reached")
+            return function(*args)
+        return budgeted
+
+###############################################################################################
+
+
+def fit_with_fallback(fit, fallback, budget=None):
+    """
+    Fit run under a budget, replaced by the estimate of its initial guesses
+    if it does not converge within the budget (or maxfev) or if it fails on the data
+
+    :parameters:
+        fit: callable(budget)
+            fit returning (popt, pcov, nfev)
+        fallback: callable
+            closed-form or heuristic estimate of the parameters (initial guesses of the fit)
+        budget: FitBudget
+            limits of the fit, None for no limit
+
+    :return:
+        popt: np.array
+            fitted or estimated parameters
+        pcov: np.array
+            covariance matrix of the parameters (infinite for an estimate)
+        nfev: int
+            number of evaluations of the model and of its Jacobian
+        status: str
+            'ok', 'budget' or 'failed' (see FIT_STATUS)
+    """
+    if budget is None:
+        budget = FitBudget()
+    budget.start()
+    try:
+        popt, pcov, nfev = fit(budget)
+        return popt, pcov, nfev, FIT_STATUS[0]
+    except (RuntimeError, ValueError, np.linalg.LinAlgError) as error:
+        print(type(error).__name__, ':', error)
+        status = FIT_STATUS[1] if isinstance(error, RuntimeError) else FIT_STATUS[2]
+    popt = np.asarray(fallback(), dtype=float)
+    return popt, np.full((len(popt), len(popt)), np.inf), budget.nfev, status
+
+###############################################################################################
+
+
+def curve_fit_counted(model, x_data, y_data, initial_guesses, budget=None, **kwargs):
+    """
+    scipy.optimize.curve_fit also returning the number of evaluations of the model
+    (and of its Jacobian when it is given analytically)
+
+    :parameters:
+        model: function
+            model to fit, model(x_data, *parameters)
+        x_data: list(np.array)
+            abscissa of the points to fit
+        y_data: list(np.array)
+            ordinate of the points to fit
+        initial_guesses: list
+            starting values of the parameters
+        budget: FitBudget
+            limits of the fit, None for no limit
+
+    :return:
+        popt: np.array
+            fitted parameters
+        pcov: np.array
+            covariance matrix of the parameters
+        nfev: int
+            number of evaluations of the model and of its Jacobian
+    """
+    if budget is not None:
+        model = budget.limited(model)
+        if callable(kwargs.get('jac')):
+            kwargs['jac'] = budget.limited(kwargs['jac'])
+    popt, pcov, infodict, _, _ = curve_fit(
+        model, x_data, y_data, initial_guesses, full_output=True, **kwargs)
+    nfev = int(infodict.get('nfev', 0)) + int(infodict.get('njev', 0))
+    return popt, pcov, nfev
+
+###############################################################################################
+
+
+def sphere_model(x_data, contact_point, k, baseline):
+    """
+    Hertz contact model of a sphere: baseline before the contact point,
+    then k * (x - contact_point)^(3/2) + baseline
+
+    :parameters:
+        x_data: np.array
+            time data of the "Press" segment
+        contact_point, k, baseline: float
+            parameters of the model
+    """
+    indentation = np.clip(np.asarray(x_data, dtype=float) - contact_point, 0.0, None)
+    return k * indentation**1.5 + baseline
+
+
+def sphere_jacobian(x_data, contact_point, k, baseline):
+    """
+    Analytic derivatives of the sphere model with respect to (contact_point, k, baseline)
+
+    :parameters:
+        x_data: np.array
+            time data of the "Press" segment
+        contact_point, k, baseline: float
+            parameters of the model
+
+    :return:
+        jacobian: np.array
+            one line per point, one column per parameter
+    """
+    # pylint: disable=unused-argument
+    indentation = np.clip(np.asarray(x_data, dtype=float) - contact_point, 0.0, None)
+    root = np.sqrt(indentation)
+    return np.column_stack((-1.5 * k * root, indentation * root, np.ones(len(indentation))))
+
+###############################################################################################
+
+
+def sphere_seed(x_data, y_data, baseline, index_contact):
+    """
+    Initial parameters of the sphere model by linearization:
+    (F - baseline)^(2/3) = k^(2/3) * (x - contact_point) after the contact,
+    so a line fit on the indentation part gives k and the contact point
+
+    :parameters:
+        x_data: np.array
+            time data of the fit window
+        y_data: np.array
+            force data of the fit window
+        baseline: float
+            force level before the contact
+        index_contact: int
+            index of the detected contact point in the window
+
+    :return:
+        initial_guesses: list
+            [contact_point, k, baseline]
+    """
+    # the force can decrease or increase with the indentation according to the main axis
+    sign = 1.0 if y_data[-1] >= baseline else -1.0
+    indentation = sign * (y_data[index_contact:] - baseline)
+    x_indentation = x_data[index_contact:]
+    positive = indentation > 0
+    if np.count_nonzero(positive) > 2:
+        slope, offset = linear_least_squares(
+            x_indentation[positive], indentation[positive]**(2/3))[0]
+        if slope > 0:
+            return [-offset / slope, sign * slope**1.5, baseline]
+    contact_point = x_data[index_contact]
+    depth = max(x_data[-1] - contact_point, np.finfo(float).eps)
+    return [contact_point, (y_data[-1] - baseline) / depth**1.5, baseline]
+
+###############################################################################################
+
+
+def fit_approach_sphere(x_data, y_data, index_contact, baseline, half_window=None, budget=None):
+    """
+    Fit of the sphere (Hertz) model of the "Press" segment with an analytic Jacobian,
+    seeded by the linearized model and restricted to a window around the contact point
+
+    :parameters:
+        x_data: list(np.array)
+            time data of the "Press" segment
+        y_data: list(np.array)
+            force data of the "Press" segment
+        index_contact: int
+            index of the detected contact point
+        baseline: float
+            force level before the contact
+        half_window: int
+            number of points kept on each side of the contact point,
+            None or 0 to fit the whole segment.
+            If the fit in the window does not converge, the whole segment is fitted.
+        budget: FitBudget
+            limits of the two fits together, None for no limit
+
+    :return:
+        popt: np.array
+            [contact_point, k, baseline] as expected by Curve.fit_model_approach
+        pcov: np.array
+            covariance matrix of the parameters
+        nfev: int
+            number of evaluations of the model and of its Jacobian
+    """
+    x_data = np.asarray(x_data, dtype=float)
+    y_data = np.asarray(y_data, dtype=float)
+    nb_points = len(x_data)
+    index_contact = int(min(max(index_contact, 1), nb_points - 3))
+    nfev = 0
+    if half_window:
+        start = max(index_contact - half_window, 0)
+        end = min(index_contact + half_window, nb_points)
+        x_window = x_data[start:end]
+        y_window = y_data[start:end]
+        initial_guesses = sphere_seed(x_window, y_window, baseline, index_contact - start)
+        try:
+            return curve_fit_counted(sphere_model, x_window, y_window, initial_guesses,
+                                     budget, jac=sphere_jacobian, maxfev=MAXFEV_SPHERE_WINDOW)
+        except BudgetExceeded:
+            raise
+        except RuntimeError:
+            # no convergence in the window: the whole segment is fitted
+            nfev = MAXFEV_SPHERE_WINDOW
+    initial_guesses = sphere_seed(x_data, y_data, baseline, index_contact)
+    popt, pcov, nfev_segment = curve_fit_counted(
+        sphere_model, x_data, y_data, initial_guesses, budget, jac=sphere_jacobian)
+    return popt, pcov, nfev + nfev_segment
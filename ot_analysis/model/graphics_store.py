@@ -0,0 +1,267 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# @author Thierry GALLIANO
+# @contributors Pierre-Henri PUECH, Laurent LIMOZIN, Guillaume GAY
+"""
+File describing the storage of the graphics of a curve, where the overlays
+(thresholds, fits, smoothed signals) are kept as parametric descriptions
+and materialized only when a plot or an export reads them
+"""
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from itertools import count
+from threading import RLock
+import numpy as np
+
+
+class OverlayCache:
+    """
+    Cache shared by the curves of the recently materialized overlays,
+    bounded in total number of points (least recently used removed first).
+    Its operations are locked, the curves being analyzed by several threads
+    """
+
+    def __init__(self, max_points=2_000_000):
+        """
+        :parameters:
+            max_points: int
+                maximum number of points kept in the cache (0: no cache)
+        """
+        self.max_points = max_points
+        self.nb_points = 0
+        self.overlays = OrderedDict()
+        self.lock = RLock()
+
+    def get(self, key):
+        """
+        Overlay materialized recently, None if not in the cache
+
+        :parameters:
+            key: tuple
+                identifier of the store and name of the overlay
+        """
+        with self.lock:
+            values = self.overlays.get(key)
+            if values is not None:
+                self.overlays.move_to_end(key)
+            return values
+
+    def put(self, key, values):
+        """
+        Addition of a materialized overlay, with removal of the oldest ones beyond the size
+
+        :parameters:
+            key: tuple
+                identifier of the store and name of the overlay
+            values: np.array
+                values of the overlay (read-only)
+        """
+        if values.size > self.max_points:
+            return
+        with self.lock:
+            self.discard(key)
+            self.overlays[key] = values
+            self.nb_points += values.size
+            while self.nb_points > self.max_points:
+                _, oldest = self.overlays.popitem(last=False)
+                self.nb_points -= oldest.size
+
+    def discard(self, key):
+        """
+        Removal of an overlay of the cache if present
+
+        :parameters:
+            key: tuple
+                identifier of the store and name of the overlay
+        """
+        with self.lock:
+            values = self.overlays.pop(key, None)
+            if values is not None:
+                self.nb_points -= values.size
+
+    def clear(self):
+        """
+        Removal of all the overlays of the cache
+        """
+        with self.lock:
+            self.overlays.clear()
+            self.nb_points = 0
+
+
+# cache shared by all the curves of the session
+OVERLAY_CACHE = OverlayCache()
+
+###############################################################################################
+
+
+class GraphicsStore(MutableMapping):
+    """
+    Dictionary of the graphics of a curve. The plain values (points, scalars) are stored as is,
+    the overlays as a description {'kind', 'segment', 'channel', 'start', 'stop', ...}
+    of a few numbers evaluated on the data of the curve at each reading
+    (through the cache of the recently materialized overlays)
+    """
+    _ids = count()
+
+    def __init__(self, curve, cache=OVERLAY_CACHE):
+        """
+        :parameters:
+            curve: Curve
+                curve whose data are used to materialize the overlays
+            cache: OverlayCache
+                cache of the materialized overlays (None: no cache)
+        """
+        self.curve = curve
+        self.cache = cache
+        self.plain = {}
+        self.overlays = {}
+        self.id_store = next(GraphicsStore._ids)
+
+    #########################################################################################
+
+    def __getitem__(self, key):
+        if key in self.plain:
+            return self.plain[key]
+        description = self.overlays[key]
+        if self.cache is None:
+            return self.materialize(description)
+        values = self.cache.get((self.id_store, key))
+        if values is None:
+            values = self.materialize(description)
+            values.setflags(write=False)
+            self.cache.put((self.id_store, key), values)
+        return values
+
+    def __setitem__(self, key, value):
+        self.discard(key)
+        self.plain[key] = value
+
+    def __delitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+        self.discard(key)
+
+    def __contains__(self, key):
+        return key in self.plain or key in self.overlays
+
+    def __iter__(self):
+        yield from self.plain
+        yield from self.overlays
+
+    def __len__(self):
+        return len(self.plain) + len(self.overlays)
+
+    def __repr__(self):
+        return 'GraphicsStore(' + repr({**self.plain, **self.overlays}) + ')'
+
+    #########################################################################################
+
+    def discard(self, key):
+        """
+        Removal of a value or of an overlay (and of its materialization in the cache)
+
+        :parameters:
+            key: str
+                name of the graphic
+        """
+        self.plain.pop(key, None)
+        self.overlays.pop(key, None)
+        if self.cache is not None:
+            self.cache.discard((self.id_store, key))
+
+    #########################################################################################
+
+    def clear_cache(self):
+        """
+        Removal of the materialized overlays of the curve from the cache,
+        to call after a modification of the corrected data of the segments
+        """
+        if self.cache is not None:
+            for key in self.overlays:
+                self.cache.discard((self.id_store, key))
+
+    #########################################################################################
+
+    def set_overlay(self, key, kind, segment, channel=None, start=None, stop=None, **parameters):
+        """
+        Recording of the description of an overlay
+
+        :parameters:
+            key: str
+                name of the graphic
+            kind: str
+                'constant': value repeated on a length
+                'channel': slice of a column of the corrected data (absolute value if absolute=True)
+                'model': method "model" of the curve evaluated on the slice of a column
+                with the "parameters"
+                'smooth': smoothing of the force of the segment with "window" and "order"
+            segment: str
+                name of the segment
+            channel: str
+                name of the column of the corrected data
+            start, stop: int
+                index range in the segment (whole segment by default)
+            parameters:
+                parameters of the kind (value, length, absolute, model, parameters, window, order)
+        """
+        self.set_description(key, dict(kind=kind, segment=segment, channel=channel,
+                                       start=start, stop=stop, **parameters))
+
+    #########################################################################################
+
+    def set_description(self, key, description):
+        """
+        Recording of an overlay from a description returned by description()
+
+        :parameters:
+            key: str
+                name of the graphic
+            description: dict
+                description of the overlay
+        """
+        self.discard(key)
+        self.overlays[key] = description
+
+    #########################################################################################
+
+    def description(self, key):
+        """
+        Description of an overlay, None for the plain values
+
+        :parameters:
+            key: str
+                name of the graphic
+        """
+        return self.overlays.get(key)
+
+    #########################################################################################
+
+    def materialize(self, description):
+        """
+        Values of an overlay computed from its description and the data of the curve
+
+        :parameters:
+            description: dict
+                description recorded by set_overlay
+
+        :return:
+            values: np.array
+                values of the overlay
+        """
+        segment = self.curve.dict_segments[description['segment']]
+        window = slice(description['start'], description['stop'])
+        kind = description['kind']
+        if kind == 'constant':
+            return np.full(description['length'], description['value'])
+        if kind == 'smooth':
+            return self.curve.smoothing.get(
+                description['segment'], self.curve.features['main_axis']['axe'] + 'Signal1',
+                description['window'], description['order'], memoize=False)[window]
+        data = segment.values(description['channel'])[window]
+        if description.get('absolute', False):
+            data = np.abs(data)
+        if kind == 'channel':
+            return np.array(data)
+        if kind == 'model':
+            return getattr(self.curve, description['model'])(data, *description['parameters'])
+        raise ValueError('unknown kind of overlay: ' + str(kind))
@@ -0,0 +1,242 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# @author Thierry GALLIANO
+# @contributors Pierre-Henri PUECH, Laurent LIMOZIN, Guillaume GAY
+"""
+Coarse-to-fine search of the characteristic points of a segment: the points are localized
+on the block-averaged signal smoothed with a proportionally shorter window, then searched
+again at full resolution in a few blocks around the candidate, smoothed only there
+(same values as the smoothing of the whole segment)
+"""
+import numpy as np
+from .smoothing import smooth, odd_window, window_limits
+
+
+def block_average(values, factor):
+    """
+    Decimation of a signal by the mean of consecutive blocks of points
+    (the last block can be shorter)
+
+    :parameters:
+        values: np.array
+            signal to decimate
+        factor: int
+            number of points per block
+
+    :return:
+        decimated: np.array
+            mean of each block
+    """
+    values = np.asarray(values, dtype=float)
+    nb_blocks = -(-len(values) // factor)
+    padded = np.full(nb_blocks * factor, np.nan)
+    padded[:len(values)] = values
+    return np.nanmean(padded.reshape(nb_blocks, factor), axis=1)
+
+###############################################################################################
+
+
+def derivative(force_data, time_data):
+    """
+    Derivative on three points as Curve.derivation(force_data, time_data, 4),
+    the first and last values repeated at the edges
+
+    :parameters:
+        force_data: np.array
+            force vector
+        time_data: np.array
+            time vector
+    """
+    force_data = np.asarray(force_data, dtype=float)
+    time_data = np.asarray(time_data, dtype=float)
+    inside = (force_data[2:] - force_data[:-2]) / (time_data[2:] - time_data[:-2])
+    return np.concatenate((inside[:1], inside, inside[-1:]))
+
+###############################################################################################
+
+
+class CoarseToFine:
+    """
+    Search of the contact, release, return and transition points of a segment
+    on its decimated signal, refined in a window of full resolution
+    """
+
+    def __init__(self, values, window_length, order_polynome=2, factor=16, margin=2, max_windows=32):
+        """
+        :parameters:
+            values: np.array
+                force of the segment (not smoothed)
+            window_length: int
+                size of the window of the smoothing at full resolution
+            order_polynome: int
+                order of the polynomial fitted in the window
+            factor: int
+                number of points per block of the decimated signal
+            margin: int
+                number of blocks searched at full resolution on each side of a candidate
+            max_windows: int
+                maximum number of windows searched at full resolution for a point
+        """
+        self.values = np.asarray(values, dtype=float)
+        self.nb_points = len(self.values)
+        self.window_length = odd_window(window_length)
+        self.order_polynome = order_polynome
+        self.factor = factor
+        self.margin = margin
+        self.max_windows = max_windows
+        coarse_window = max(odd_window(self.window_length // factor), odd_window(order_polynome + 1))
+        self.coarse = smooth(block_average(self.values, factor), coarse_window, order_polynome)
+        # range of the decimated signal around each block, containing the smoothed points of the block
+        neighbours = np.vstack((np.roll(self.coarse, 1), self.coarse, np.roll(self.coarse, -1)))
+        neighbours[0, 0] = self.coarse[0]
+        neighbours[2, -1] = self.coarse[-1]
+        self.lower = neighbours.min(axis=0)
+        self.upper = neighbours.max(axis=0)
+        self.nb_refined = 0
+
+    #########################################################################################
+
+    def local(self, start, stop):
+        """
+        Smoothed signal at full resolution on [start:stop], equal to the same points
+        of the smoothing of the whole segment
+
+        :parameters:
+            start, stop: int
+                limits of the window (stop excluded)
+        """
+        first, last, start, stop = window_limits(start, stop, self.nb_points, self.window_length)
+        self.nb_refined += last - first
+        return smooth(self.values[first:last], self.window_length, self.order_polynome)[start - first:stop - first]
+
+    #########################################################################################
+
+    def windows(self, blocks):
+        """
+        Limits at full resolution of the blocks around the candidates, in the order of the candidates,
+        without the blocks already searched
+
+        :parameters:
+            blocks: np.array
+                indexes of the candidates in the decimated signal
+
+        :return:
+            (start, stop): generator of the windows (at most max_windows)
+        """
+        searched = np.zeros(len(self.coarse), dtype=bool)
+        nb_windows = 0
+        for block in blocks:
+            if searched[block]:
+                continue
+            first = max(block - self.margin, 0)
+            last = min(block + self.margin + 1, len(self.coarse))
+            searched[first:last] = True
+            yield int(first * self.factor), int(min(last * self.factor, self.nb_points))
+            nb_windows += 1
+            if nb_windows == self.max_windows:
+                return
+
+    #########################################################################################
+
+    def band_point(self, low, high, last=True):
+        """
+        Last ("Press") or first ("Pull") point of the smoothed signal strictly between
+        two limits, as Curve.retrieve_contact
+
+        :parameters:
+            low, high: float
+                limits of the band of the noise of the baseline
+            last: bool
+                True for the last point, False for the first one
+
+        :return:
+            index: int or None
+                index of the point, None if it is not found around the candidates
+        """
+        blocks = np.flatnonzero((low < self.upper) & (self.lower < high))
+        if last:
+            blocks = blocks[::-1]
+        for start, stop in self.windows(blocks):
+            local = self.local(start, stop)
+            indexes = np.flatnonzero((low < local) & (local < high))
+            if len(indexes) > 0:
+                return start + int(indexes[-1] if last else indexes[0])
+        return None
+
+    #########################################################################################
+
+    def maximum(self):
+        """
+        Index of the maximum of the smoothed signal, searched around the blocks
+        that can contain it
+        """
+        index_max = None
+        value_max = -np.inf
+        blocks = np.flatnonzero(self.upper >= self.coarse.max())
+        for start, stop in self.windows(blocks):
+            local = self.local(start, stop)
+            if local.max() > value_max:
+                value_max = local.max()
+                index_max = start + int(local.argmax())
+        return index_max
+
+    #########################################################################################
+
+    def return_point(self, threshold):
+        """
+        First point after the maximum below the threshold, plus one,
+        as Curve.retrieve_retour_line_end
+
+        :parameters:
+            threshold: float
+                threshold of the return to the baseline
+
+        :return:
+            index: int or None
+                index of the return point, None if it is not found around the candidates
+        """
+        index_max = self.maximum()
+        block_max = int(index_max // self.factor)
+        blocks = block_max + np.flatnonzero(self.lower[block_max:] < threshold)
+        for start, stop in self.windows(blocks):
+            start = max(start, index_max)
+            indexes = np.flatnonzero(self.local(start, stop) < threshold)
+            if len(indexes) > 0:
+                return min(start + int(indexes[0]) + 1, self.nb_points - 1)
+        return None
+
+    #########################################################################################
+
+    def transition_point(self, time_data, ratio=0.5):
+        """
+        Point of the steepest descent of the smoothed signal minus one, as Curve.search_transition_point,
+        searched around the blocks whose descent is at least a ratio of the steepest one
+
+        :parameters:
+            time_data: np.array
+                time of the points of the segment
+            ratio: float
+                ratio of the steepest descent of the decimated signal to select the candidates
+
+        :return:
+            index: int
+                index of the transition point
+        """
+        time_data = np.asarray(time_data, dtype=float)
+        slopes_coarse = derivative(self.coarse, block_average(time_data, self.factor))
+        order = np.argsort(slopes_coarse, kind='stable')
+        blocks = order[slopes_coarse[order] <= ratio * slopes_coarse[order[0]]]
+        if len(blocks) == 0:
+            blocks = order[:1]
+        index_min = None
+        slope_min = np.inf
+        for start, stop in self.windows(blocks):
+            # one more point on each side for the derivative on three points
+            first = max(start - 1, 0)
+            last = min(stop + 1, self.nb_points)
+            slopes = derivative(self.local(first, last), time_data[first:last])[start - first:stop - first]
+            index = int(slopes.argmin())
+            if slopes[index] < slope_min or (slopes[index] == slope_min and start + index < index_min):
+                slope_min = slopes[index]
+                index_min = start + index
+        return index_min - 1
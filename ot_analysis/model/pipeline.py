@@ -0,0 +1,340 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# @author Thierry GALLIANO
+# @contributors Pierre-Henri PUECH, Laurent LIMOZIN, Guillaume GAY
+"""
+File describing the analysis of a curve as a chain of stages whose results are memoized:
+a stage is re-run only if one of the methods it depends on, one of the stages before it
+or the data of the curve changed
+"""
+import traceback
+
+
+class Stage:
+    """
+    Step of the analysis of a curve
+    """
+
+    def __init__(self, name, function, keys=(), undo=None, derived=None):
+        """
+        :parameters:
+            name: str
+                name of the stage
+            function: callable(curve, methods, state)
+                computation of the stage, writing its results in the features and the graphics
+                of the curve and in the state of the analysis
+            keys: tuple(str)
+                keys of the methods used by the stage
+            undo: callable(curve, memo)
+                restoration of the data of the curve modified by the stage, before running it again
+            derived: dict(str, callable(curve, methods, state))
+                values computed from the results of the previous stages that condition the stage,
+                recorded in the state by name and added to its signature
+        """
+        self.name = name
+        self.function = function
+        self.keys = keys
+        self.undo = undo
+        self.derived = {} if derived is None else derived
+
+###############################################################################################
+
+
+def changes(before, after):
+    """
+    Entries of a dictionary added, replaced or removed between two states
+
+    :parameters:
+        before: dict
+            copy of the dictionary before the stage
+        after: dict
+            dictionary after the stage
+
+    :return:
+        modified: dict
+            entries added or replaced
+        removed: list
+            keys removed
+        previous: dict
+            values before the stage of the entries replaced or removed
+    """
+    modified = {key: value for key, value in after.items()
+                if key not in before or before[key] is not value}
+    removed = [key for key in before if key not in after]
+    previous = {key: before[key] for key in list(modified) + removed if key in before}
+    return modified, removed, previous
+
+
+def replay(dictionary, modifications, setter=None, deleter=None):
+    """
+    Application of the changes recorded for a stage
+
+    :parameters:
+        dictionary: dict
+            dictionary to modify
+        modifications: tuple(dict, list, dict)
+            entries added or replaced, keys removed and previous values
+        setter: callable(key, value)
+            function used to set an entry (item assignment by default)
+        deleter: callable(key)
+            function used to remove an entry (del by default)
+    """
+    modified, removed, _ = modifications
+    for key in removed:
+        if key in dictionary:
+            if deleter is None:
+                del dictionary[key]
+            else:
+                deleter(key)
+    for key, value in modified.items():
+        if setter is None:
+            dictionary[key] = value
+        else:
+            setter(key, value)
+
+
+def revert(dictionary, modifications, setter=None, deleter=None):
+    """
+    Cancellation of the changes recorded for a stage (values before the stage restored)
+
+    :parameters:
+        dictionary: dict
+            dictionary to modify
+        modifications: tuple(dict, list, dict)
+            entries added or replaced, keys removed and previous values
+        setter: callable(key, value)
+            function used to set an entry (item assignment by default)
+        deleter: callable(key)
+            function used to remove an entry (del by default)
+    """
+    modified, _, previous = modifications
+    replay(dictionary, (previous, [key for key in modified if key not in previous], {}),
+           setter, deleter)
+
+###############################################################################################
+
+
+def stage_min_force(curve, methods, state):
+    """
+    Detection of the minimum force of the approach and of the curve
+    """
+    curve.detected_min_force()
+
+
+def stage_baseline_end(curve, methods, state):
+    """
+    Comparison of the baselines of the beginning and the end of the curve
+    """
+    state['type_curve'] = curve.compare_baseline_start_end(methods['factor_noise'])
+
+
+def stage_optical(curve, methods, state):
+    """
+    Automatic correction of the optical effect (not during a manual correction)
+    """
+    state['optical_state'] = "No_correction"
+    state['error'] = None
+    if not methods['manual_correction'] and methods['optical'] == "Correction":
+        try:
+            curve.correction_optical_effect_object.automatic_correction(
+                methods['factor_noise'])
+            state['optical_state'] = "Auto_correction"
+        except Exception as error:
+            print('###########################################')
+            print(())
+            print(type(error).__name__, ':')
+            print(error)
+            print(traceback.format_exc())
+            print('index error No correction')
+            print('###########################################')
+            state['error'] = error
+
+
+def undo_optical(curve, memo):
+    """
+    Removal of the automatic correction before a new correction
+    """
+    if memo['state'][0].get('optical_state') == "Auto_correction" and curve.optical_effect is not None:
+        curve.optical_effect.undo_corrections()
+        curve.clear_cache()
+
+
+def stage_fit_press(curve, methods, state):
+    """
+    Fit of the "Press" segment
+    """
+    curve.curve_approach_analyze(methods)
+
+
+def analysis_tier(curve, methods, state):
+    """
+    Depth of the analysis of the "Pull" segment (NAD, RE and ITU curves settled before the fits)
+    """
+    return curve.analysis_tier(methods, state['type_curve'])
+
+
+def stage_fit_pull(curve, methods, state):
+    """
+    Fit of the "Pull" segment and search of its characteristic points, as deep as the tier requires
+    """
+    curve.curve_return_points(methods, state['type_curve'], state['tier'])
+
+
+def stage_classification(curve, methods, state):
+    """
+    Classification of the curve (NAD, AD, FTU, ITU, RE)
+    """
+    state['type_curve'] = curve.classification(methods, state['type_curve'])
+
+
+def stage_summary(curve, methods, state):
+    """
+    Recording of the conditions of the analysis and of the classification in the features
+    (with the fits replaced by their fallback estimate, "press: budget" for example)
+    """
+    fallbacks = [name_fit.split('_')[-1] + ': ' + curve.features[name_fit]['status']
+                 for name_fit in ('fit_press', 'fit_pull')
+                 if curve.features.get(name_fit, {}).get('status', 'ok') != 'ok']
+    curve.features['fit_status'] = ', '.join(fallbacks) if fallbacks else 'ok'
+    curve.features['drug'] = methods['drug']
+    curve.features['condition'] = methods['condition']
+    curve.features['tolerance'] = methods['factor_noise']
+    curve.features['optical_state'] = state['optical_state']
+    type_curve = state['type_curve']
+    if type_curve is None:
+        type_curve = 'RE'
+    if methods['manual_correction']:
+        curve.features['type'] = type_curve
+    else:
+        curve.features['automatic_type'] = type_curve
+    if type_curve == "NAD":
+        curve.features['point_return_endline'] = {
+            'index': 'NaN', 'value': 'NaN'}
+        curve.features['transition_point'] = {
+            'index': 'NaN', 'value (pN)': 'NaN'}
+
+
+# stages of the analysis of a curve, in their order of execution
+ANALYSIS_STAGES = (
+    Stage('min_force', stage_min_force),
+    Stage('baseline_end', stage_baseline_end, ('factor_noise',)),
+    Stage('optical', stage_optical, ('optical', 'factor_noise', 'manual_correction'), undo_optical),
+    Stage('fit_press', stage_fit_press, ('model', 'factor_noise', 'width_window_smooth', 'window_fit_sphere',
+                                         'fit_method', 'fit_max_nfev', 'fit_max_time', 'eta', 'bead_radius')),
+    Stage('fit_pull', stage_fit_pull, ('factor_noise', 'width_window_smooth', 'fit_method',
+                                       'fit_max_nfev', 'fit_max_time', 'coarse_factor'),
+          derived={'tier': analysis_tier}),
+    Stage('classification', stage_classification, ('jump_force', 'jump_point', 'jump_distance')),
+    Stage('summary', stage_summary, ('drug', 'condition', 'factor_noise', 'manual_correction')),
+)
+
+###############################################################################################
+
+
+class AnalysisPipeline:
+    """
+    Execution of the stages of the analysis of a curve with memoization of their results
+    (changes of the features, of the graphics and of the state of the analysis).
+    A modification of the data of the curve outside the analysis (manual correction)
+    invalidates all the stages
+    """
+
+    def __init__(self, curve, stages=ANALYSIS_STAGES):
+        """
+        :parameters:
+            curve: Curve
+                curve to analyze
+            stages: tuple(Stage)
+                stages of the analysis in their order of execution
+        """
+        self.curve = curve
+        self.stages = stages
+        self.memo = {}
+        self.data_version = None
+        self.nb_runs = {stage.name: 0 for stage in stages}
+
+    #########################################################################################
+
+    def invalidate(self, name_stage=None):
+        """
+        Removal of the results of a stage and of the following ones (of all the stages by default)
+
+        :parameters:
+            name_stage: str
+                name of the first stage to re-run
+        """
+        names = [stage.name for stage in self.stages]
+        start = 0 if name_stage is None else names.index(name_stage)
+        for name in names[start:]:
+            self.memo.pop(name, None)
+
+    #########################################################################################
+
+    def cancel(self, stage):
+        """
+        Cancellation of the results of a stage in the curve before running it again
+
+        :parameters:
+            stage: Stage
+                stage to cancel
+        """
+        memo = self.memo[stage.name]
+        graphics = self.curve.graphics
+        if stage.undo is not None:
+            stage.undo(self.curve, memo)
+        revert(self.curve.features, memo['features'])
+        revert(graphics.plain, memo['values'], graphics.__setitem__, graphics.discard)
+        revert(graphics.overlays, memo['overlays'], graphics.set_description, graphics.discard)
+
+    #########################################################################################
+
+    def run(self, methods):
+        """
+        Analysis of the curve, re-running only the stages whose inputs changed
+
+        :parameters:
+            methods: dict
+                parameters of the analysis, with the key 'manual_correction'
+
+        :return:
+            error: Exception or None
+                error of the automatic correction of the optical effect
+        """
+        if self.data_version != self.curve.data_version:
+            self.memo.clear()
+        graphics = self.curve.graphics
+        state = {}
+        signature = ()
+        rerun = False
+        for index, stage in enumerate(self.stages):
+            for key, function in stage.derived.items():
+                state[key] = function(self.curve, methods, state)
+            signature = (stage.name, tuple(methods.get(key) for key in stage.keys),
+                         tuple(state[key] for key in stage.derived), signature)
+            memo = self.memo.get(stage.name)
+            if not rerun and memo is not None and memo['signature'] == signature:
+                replay(self.curve.features, memo['features'])
+                replay(graphics.plain, memo['values'], graphics.__setitem__, graphics.discard)
+                replay(graphics.overlays, memo['overlays'], graphics.set_description, graphics.discard)
+                replay(state, memo['state'])
+                continue
+            if not rerun:
+                rerun = True
+                # results of the previous analysis cancelled from the last stage to this one
+                for following in reversed(self.stages[index:]):
+                    if following.name in self.memo:
+                        self.cancel(following)
+                self.invalidate(stage.name)
+            features = dict(self.curve.features)
+            values = dict(graphics.plain)
+            overlays = dict(graphics.overlays)
+            previous_state = dict(state)
+            stage.function(self.curve, methods, state)
+            self.nb_runs[stage.name] += 1
+            self.memo[stage.name] = {'signature': signature,
+                                     'features': changes(features, self.curve.features),
+                                     'values': changes(values, graphics.plain),
+                                     'overlays': changes(overlays, graphics.overlays),
+                                     'state': changes(previous_state, state)}
+        self.data_version = self.curve.data_version
+        return state.get('error')
@@ -5,7 +5,9 @@
 """
 File describing the instance class of the segment objects
 """
+import numpy as np
 import pandas as pd
+from .window_statistics import WindowStatistics
 
 
 class Segment:
@@ -19,15 +21,59 @@ class Segment:
         """
         self.name = name
         self.header_segment = header_segment
-        self.data = data
+        self.arrays = {}
+        self.frames = {False: data, True: pd.DataFrame()}
         self.delta_time = 0
-        self.corrected_data = pd.DataFrame()
         self.statistic_data = pd.DataFrame()
+        self.window_statistics = {}
         self.features = {}
         # print(self.data['distance']*1e9)
 
     #########################################################################################
 
+    @property
+    def data(self):
+        """
+        Original data of the segment (DataFrame built at the first access
+        if the segment is attached to the storage of the curve)
+        """
+        return self.frame(False)
+
+    @data.setter
+    def data(self, data):
+        self.frames[False] = data
+        self.arrays.pop(False, None)
+
+    @property
+    def corrected_data(self):
+        """
+        Corrected data of the segment (DataFrame built at the first access
+        if the segment is attached to the storage of the curve)
+        """
+        return self.frame(True)
+
+    @corrected_data.setter
+    def corrected_data(self, corrected_data):
+        self.frames[True] = corrected_data
+        self.arrays.pop(True, None)
+
+    #########################################################################################
+
+    def frame(self, corrected_data=True):
+        """
+        DataFrame adapter of the data, whose columns are views on the storage of the curve
+
+        :parameters:
+            corrected_data: bool
+                True for the corrected data, False for the original data
+        """
+        if self.frames[corrected_data] is None:
+            arrays, index_segment = self.arrays[corrected_data]
+            self.frames[corrected_data] = arrays.segment_frame(index_segment)
+        return self.frames[corrected_data]
+
+    #########################################################################################
+
     def __str__(self):
         """
         Return function for a print of the object
@@ -64,24 +110,214 @@ class Segment:
 
     #########################################################################################
 
-    def check_alignment(self, main_axis, force_threshold):
+    def attach(self, arrays, index_segment, corrected_data=True):
         """
-        Checking the alignment of the curve segment on the main axis
+        Replacement of the data of the segment by views on the contiguous storage of the curve
+
+        :parameters:
+            arrays: CurveArrays
+                contiguous storage of the data of the curve
+            index_segment: int
+                position of the segment in the curve
+            corrected_data: bool
+                True for the corrected data, False for the original data
+        """
+        self.arrays[corrected_data] = (arrays, index_segment)
+        self.frames[corrected_data] = None
+
+    #########################################################################################
+
+    def values(self, channel, corrected_data=True):
+        """
+        Data of a channel as an array (view on the storage of the curve, no copy,
+        the uniform axes are materialized)
+
+        :parameters:
+            channel: str
+                name of the column
+            corrected_data: bool
+                True for the corrected data, False for the original data
+        """
+        if self.frames[corrected_data] is None:
+            arrays, index_segment = self.arrays[corrected_data]
+            return arrays.view(index_segment, channel)
+        return self.frames[corrected_data][channel].to_numpy()
+
+    #########################################################################################
+
+    def value(self, channel, index, corrected_data=True):
+        """
+        Value of a point of a channel, O(1) without materializing the uniform axes
+
+        :parameters:
+            channel: str
+                name of the column
+            index: int
+                position of the point in the segment
+            corrected_data: bool
+                True for the corrected data, False for the original data
+        """
+        if self.frames[corrected_data] is None:
+            arrays, index_segment = self.arrays[corrected_data]
+            return arrays.value(index_segment, channel, index)
+        return self.frames[corrected_data][channel].to_numpy()[index]
+
+    #########################################################################################
+
+    def axis(self, channel, corrected_data=True):
+        """
+        UniformAxis of a channel, None if the channel is not a uniform axis of the storage
+
+        :parameters:
+            channel: str
+                name of the column
+            corrected_data: bool
+                True for the corrected data, False for the original data
+        """
+        if corrected_data in self.arrays:
+            arrays, index_segment = self.arrays[corrected_data]
+            return arrays.axis(index_segment, channel)
+        return None
+
+    #########################################################################################
+
+    def has_channel(self, channel, corrected_data=True):
+        """
+        True if the channel is present in the data of the segment
+
+        :parameters:
+            channel: str
+                name of the column
+            corrected_data: bool
+                True for the corrected data, False for the original data
+        """
+        if self.frames[corrected_data] is None:
+            arrays, index_segment = self.arrays[corrected_data]
+            return arrays.has_channel(index_segment, channel)
+        return channel in self.frames[corrected_data]
+
+    #########################################################################################
+
+    def set_values(self, channel, values, corrected_data=True):
+        """
+        Modification of the data of a channel, in place in the storage of the curve
+        if the segment is attached to it
+
+        :parameters:
+            channel: str
+                name of the column
+            values: Series or np.array
+                new data of the channel (same length as the segment)
+            corrected_data: bool
+                True for the corrected data, False for the original data
+        """
+        frame = self.frames[corrected_data]
+        if corrected_data in self.arrays:
+            arrays, index_segment = self.arrays[corrected_data]
+            if arrays.has_channel(index_segment, channel):
+                arrays.materialize(channel)
+                view = arrays.view(index_segment, channel)
+                view[:] = np.asarray(values)
+                if frame is None or np.shares_memory(frame[channel].to_numpy(), view):
+                    return
+        self.frame(corrected_data)[channel] = values
+
+    #########################################################################################
+
+    def statistics(self, channel, corrected_data=True):
+        """
+        Windowed statistics of a channel, built once then reused
+        until the corrected data are modified (clear_statistics)
+
+        :parameters:
+            channel: str
+                name of the column
+            corrected_data: bool
+                True for the corrected data, False for the original data
+
+        :return:
+            statistics: WindowStatistics
+                mean, std, min and max over any window in O(1)
+        """
+        key = (corrected_data, channel)
+        if key not in self.window_statistics:
+            self.window_statistics[key] = WindowStatistics(self.values(channel, corrected_data))
+        return self.window_statistics[key]
+
+    #########################################################################################
+
+    def extrema(self, corrected_data=True):
+        """
+        Minimum and maximum, with their first index, of the forces on the three axes
+        computed together on the stacked channels, then reused until clear_statistics
+
+        :parameters:
+            corrected_data: bool
+                True for the corrected data, False for the original data
+
+        :return:
+            extrema: dict
+                for each channel ('xSignal1', 'ySignal1', 'zSignal1'):
+                {'index_min': int, 'min': float, 'index_max': int, 'max': float}
+        """
+        key = (corrected_data, 'extrema')
+        if key not in self.window_statistics:
+            channels = [channel for channel in ('xSignal1', 'ySignal1', 'zSignal1')
+                        if self.has_channel(channel, corrected_data)]
+            values = np.column_stack([np.asarray(self.values(channel, corrected_data), dtype=float)
+                                      for channel in channels])
+            indexes_min = values.argmin(axis=0)
+            indexes_max = values.argmax(axis=0)
+            extrema = {}
+            for column, channel in enumerate(channels):
+                extrema[channel] = {'index_min': int(indexes_min[column]),
+                                    'min': values[indexes_min[column], column],
+                                    'index_max': int(indexes_max[column]),
+                                    'max': values[indexes_max[column], column]}
+            self.window_statistics[key] = extrema
+        return self.window_statistics[key]
+
+    #########################################################################################
+
+    def set_extrema(self, extrema, corrected_data=True):
+        """
+        Extrema of the forces computed outside the segment (stacked segments of several curves),
+        reused until clear_statistics
+
+        :parameters:
+            extrema: dict
+                for each channel: {'index_min': int, 'min': float, 'index_max': int, 'max': float}
+            corrected_data: bool
+                True for the corrected data, False for the original data
+        """
+        self.window_statistics[(corrected_data, 'extrema')] = extrema
+
+    #########################################################################################
+
+    def clear_statistics(self):
+        """
+        Removal of the statistics and extrema of the corrected data after their modification
+        """
+        for key in [key for key in self.window_statistics if key[0]]:
+            del self.window_statistics[key]
+
+    #########################################################################################
+
+    def alignment_deviations(self, main_axis, range_baseline=1000):
+        """
+        Deviations of the forces on the secondary axes from their baseline
 
         :parameters:
             main_axis: str
                 main axis of the manipulation
-            seuil: float
-                applied force defined at the beginning of the manipulation
+            range_baseline: int
+                number of points for the baseline of the secondary axes
 
         :return:
-            check_align: bool
-                True if misaligned on a secondary axis
+            deviations: list(tuple(str, float))
+                direction ('-y', '+y', '-z', '+z' for the main axis x) and deviation
+                of the extremum in this direction
         """
-        # print("check_alignment")
-        dict_align = {'AL': 'Yes', 'axe': []}
-        axe = ''
-        force_threshold = force_threshold
         baseline_no_main_axis = 0
         baseline_z = 0
         no_main_axis = ""
@@ -89,45 +325,45 @@ class Segment:
             no_main_axis = 'y'
         elif main_axis == 'y':
             no_main_axis = 'x'
+        statistics_no_main_axis = self.statistics(no_main_axis + 'Signal1')
+        statistics_z = self.statistics('zSignal1')
         if self.name == 'Press':
-            baseline_no_main_axis = abs(
-                self.corrected_data[no_main_axis + 'Signal1'][0:1000].mean())
-            baseline_z = abs(self.corrected_data['zSignal1'][0:1000].mean())
+            baseline_no_main_axis = abs(statistics_no_main_axis.mean(0, range_baseline))
+            baseline_z = abs(statistics_z.mean(0, range_baseline))
         elif self.name == 'Pull':
-            baseline_no_main_axis = abs(
-                self.corrected_data[no_main_axis + 'Signal1'][-1000:].mean())
-            baseline_z = abs(self.corrected_data['zSignal1'][-1000:].mean())
-        else:
-            baseline_no_main_axis = 0
-            baseline_z = 0
+            baseline_no_main_axis = abs(statistics_no_main_axis.mean(-range_baseline, None))
+            baseline_z = abs(statistics_z.mean(-range_baseline, None))
 
-        if main_axis == 'x':
-            min_value_no_main_axis = self.corrected_data['ySignal1'].min()
-            max_value_no_main_axis = self.corrected_data['ySignal1'].max()
-            delta_min_value_no_main_axis = min_value_no_main_axis - baseline_no_main_axis
-            delta_max_value_no_main_axis = max_value_no_main_axis - baseline_no_main_axis
-        elif main_axis == 'y':
-            min_value_no_main_axis = self.corrected_data['xSignal1'].min()
-            max_value_no_main_axis = self.corrected_data['xSignal1'].max()
-            delta_min_value_no_main_axis = min_value_no_main_axis - baseline_no_main_axis
-            delta_max_value_no_main_axis = max_value_no_main_axis - baseline_no_main_axis
-        min_value_z = self.corrected_data['zSignal1'].min()
-        max_value_z = self.corrected_data['zSignal1'].max()
-        delta_min_value_z = min_value_z - baseline_z
-        delta_max_value_z = max_value_z - baseline_z
-        if delta_min_value_no_main_axis < -force_threshold:
-            dict_align['axe'].append('-' + no_main_axis)
-            dict_align['AL'] = 'No'
-        # elif delta_value_no_main_axis > force_threshold:
-        if delta_max_value_no_main_axis > force_threshold:
-            dict_align['axe'].append('+' + no_main_axis)
-            dict_align['AL'] = 'No'
-        if delta_min_value_z < -force_threshold:
-            dict_align['axe'].append('-z')
-            dict_align['AL'] = 'No'
-        if delta_max_value_z > force_threshold:
-            dict_align['axe'].append('+z')
-            dict_align['AL'] = 'No'
+        extrema = self.extrema()
+        return [('-' + no_main_axis, baseline_no_main_axis - extrema[no_main_axis + 'Signal1']['min']),
+                ('+' + no_main_axis, extrema[no_main_axis + 'Signal1']['max'] - baseline_no_main_axis),
+                ('-z', baseline_z - extrema['zSignal1']['min']),
+                ('+z', extrema['zSignal1']['max'] - baseline_z)]
+
+    #########################################################################################
+
+    def check_alignment(self, main_axis, force_threshold, range_baseline=1000):
+        """
+        Checking the alignment of the curve segment on the main axis
+
+        :parameters:
+            main_axis: str
+                main axis of the manipulation
+            seuil: float
+                applied force defined at the beginning of the manipulation
+            range_baseline: int
+                number of points for the baseline of the secondary axes
+
+        :return:
+            check_align: bool
+                True if misaligned on a secondary axis
+        """
+        # print("check_alignment")
+        dict_align = {'AL': 'Yes', 'axe': []}
+        for axe, deviation in self.alignment_deviations(main_axis, range_baseline):
+            if deviation > force_threshold:
+                dict_align['axe'].append(axe)
+                dict_align['AL'] = 'No'
         if len(dict_align['axe']) == 0:
             dict_align['axe'] = 'NaN'
         return dict_align
@@ -0,0 +1,321 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# @author Thierry GALLIANO
+# @contributors Pierre-Henri PUECH, Laurent LIMOZIN, Guillaume GAY
+"""
+Savitzky-Golay smoothing with precomputed kernels, identical to scipy.signal.savgol_filter
+(mode 'interp') but reusing the coefficients between calls and able to smooth
+several signals of the same length in a single convolution
+"""
+from collections import OrderedDict
+from functools import lru_cache
+import numpy as np
+from scipy.ndimage import correlate1d
+from scipy.signal import savgol_coeffs, savgol_filter
+
+# maximum number of smoothed signals memoized by a curve (least recently used removed first)
+NB_SMOOTHED = 8
+
+
+def odd_window(window_length):
+    """
+    Window length made odd as required by the Savitzky-Golay filter
+
+    :parameters:
+        window_length: int
+            size of the sliding window
+    """
+    window_length = int(window_length)
+    if window_length % 2 == 0:
+        window_length += 1
+    return window_length
+
+###############################################################################################
+
+
+@lru_cache(maxsize=64)
+def savgol_kernel(window_length, order_polynome, deriv=0):
+    """
+    Coefficients of the Savitzky-Golay filter for the points far from the edges
+    (read-only, shared between calls)
+
+    :parameters:
+        window_length: int (odd)
+            size of the sliding window
+        order_polynome: int
+            order of the polynomial fitted in the window
+        deriv: int
+            order of the derivative to compute
+
+    :return:
+        kernel: np.array
+            coefficients to correlate with the signal
+    """
+    kernel = savgol_coeffs(window_length, order_polynome, deriv, use='dot')
+    kernel.setflags(write=False)
+    return kernel
+
+###############################################################################################
+
+
+@lru_cache(maxsize=64)
+def savgol_edges(window_length, order_polynome, deriv=0):
+    """
+    Matrices giving the smoothed values of the first and last window_length // 2 points
+    from the first and last window_length points, as the 'interp' mode of savgol_filter
+    (polynomial fitted on the whole edge window and evaluated on the edge points)
+
+    :parameters:
+        window_length: int (odd)
+            size of the sliding window
+        order_polynome: int
+            order of the polynomial fitted in the window
+        deriv: int
+            order of the derivative to compute
+
+    :return:
+        start: np.array
+            matrix (window_length // 2, window_length) for the beginning of the signal
+        end: np.array
+            matrix (window_length // 2, window_length) for the end of the signal
+    """
+    half_window = window_length // 2
+    # positions centered on the window for the conditioning of the Vandermonde matrix
+    positions = np.arange(window_length) - half_window
+    vandermonde = np.vander(positions, order_polynome + 1, increasing=True).astype(float)
+    projection = np.linalg.pinv(vandermonde)
+    powers = np.arange(order_polynome + 1)
+    derivative = np.ones(order_polynome + 1)
+    for index in range(deriv):
+        derivative *= np.clip(powers - index, 0, None)
+
+    def evaluation(points):
+        exponents = np.clip(powers - deriv, 0, None)
+        return (points[:, None] ** exponents) * derivative
+
+    start = evaluation(positions[:half_window].astype(float)) @ projection
+    end = evaluation(positions[half_window + 1:].astype(float)) @ projection
+    start.setflags(write=False)
+    end.setflags(write=False)
+    return start, end
+
+###############################################################################################
+
+
+def smooth(force_data, window_length=51, order_polynome=3, deriv=0):
+    """
+    Savitzky-Golay smoothing of a signal with cached coefficients
+
+    :parameters:
+        force_data: Series or np.array
+            values of y
+        window_length: int
+            size of the sliding window (made odd)
+        order_polynome: int
+            order of the polynomial fitted in the window
+        deriv: int
+            order of the derivative to compute
+
+    :return:
+        y_smooth: np.array
+            values of y smoothing
+    """
+    return smooth_batch(np.asarray(force_data, dtype=float)[None, :],
+                        window_length, order_polynome, deriv)[0]
+
+###############################################################################################
+
+
+def smooth_batch(signals, window_length=51, order_polynome=3, deriv=0):
+    """
+    Savitzky-Golay smoothing of several signals of the same length in one convolution call
+
+    :parameters:
+        signals: list(np.array) or np.array
+            signals of the same length, one per line
+        window_length: int
+            size of the sliding window (made odd)
+        order_polynome: int
+            order of the polynomial fitted in the window
+        deriv: int
+            order of the derivative to compute
+
+    :return:
+        y_smooth: np.array
+            smoothed signals, one per line
+    """
+    signals = np.atleast_2d(np.asarray(signals, dtype=float))
+    window_length = odd_window(window_length)
+    if signals.shape[1] < window_length:
+        # same error as savgol_filter for the signals shorter than the window
+        return savgol_filter(signals, window_length, order_polynome, deriv, axis=1)
+    half_window = window_length // 2
+    y_smooth = correlate1d(signals, savgol_kernel(window_length, order_polynome, deriv),
+                           axis=1, mode='constant')
+    start, end = savgol_edges(window_length, order_polynome, deriv)
+    y_smooth[:, :half_window] = signals[:, :window_length] @ start.T
+    y_smooth[:, -half_window:] = signals[:, -window_length:] @ end.T
+    return y_smooth
+
+###############################################################################################
+
+
+def window_limits(start, stop, nb_points, window_length):
+    """
+    Limits of the part of a signal to smooth to obtain the points [start:stop]
+    of the smoothing of the whole signal (window extended by half the sliding window)
+
+    :parameters:
+        start, stop: int
+            limits of the window (stop excluded)
+        nb_points: int
+            length of the signal
+        window_length: int (odd)
+            size of the sliding window
+
+    :return:
+        first, last: int
+            limits of the part to smooth
+        start, stop: int
+            limits of the window, clipped to the signal
+    """
+    half_window = window_length // 2
+    start = max(start, 0)
+    stop = min(stop, nb_points)
+    first = max(start - half_window, 0)
+    last = min(stop + half_window, nb_points)
+    if last - first < window_length:
+        first = max(min(first, last - window_length), 0)
+        last = min(max(last, first + window_length), nb_points)
+    return first, last, start, stop
+
+###############################################################################################
+
+
+class SmoothingCache:
+    """
+    Memoization of the smoothed signals of a curve per (segment, channel, window, order),
+    bounded in number of signals, to be cleared when the corrected data of the segments are modified
+    """
+
+    def __init__(self, dict_segments, max_signals=NB_SMOOTHED):
+        """
+        :parameters:
+            dict_segments: dict
+                segments of the curve, by name
+            max_signals: int
+                maximum number of memoized signals
+        """
+        self.dict_segments = dict_segments
+        self.max_signals = max_signals
+        self.smoothed = OrderedDict()
+
+    def get(self, name_segment, channel, window_length=51, order_polynome=3, memoize=True):
+        """
+        Smoothed signal of a column of the corrected data of a segment,
+        computed at the first request then reused
+
+        :parameters:
+            name_segment: str
+                name of the segment
+            channel: str
+                name of the column of corrected_data
+            window_length: int
+                size of the sliding window (made odd)
+            order_polynome: int
+                order of the polynomial fitted in the window
+            memoize: bool
+                False to compute the signal without keeping it if it is not already memoized
+
+        :return:
+            y_smooth: np.array
+                values of y smoothing (read-only)
+        """
+        key = (name_segment, channel, odd_window(window_length), order_polynome)
+        if key not in self.smoothed:
+            y_smooth = smooth(self.dict_segments[name_segment].values(channel),
+                              key[2], order_polynome)
+            y_smooth.setflags(write=False)
+            if not memoize:
+                return y_smooth
+            self.memoize(key, y_smooth)
+        else:
+            self.smoothed.move_to_end(key)
+        return self.smoothed[key]
+
+    def window(self, name_segment, channel, window_length, order_polynome, start, stop):
+        """
+        Smoothed signal of a column of a segment on [start:stop], read from the memoized signal
+        or computed on this window only (without memoizing the whole signal)
+
+        :parameters:
+            name_segment: str
+                name of the segment
+            channel: str
+                name of the column of corrected_data
+            window_length: int
+                size of the sliding window (made odd)
+            order_polynome: int
+                order of the polynomial fitted in the window
+            start, stop: int
+                limits of the window (stop excluded)
+
+        :return:
+            y_smooth: np.array
+                values of y smoothing on the window
+        """
+        key = (name_segment, channel, odd_window(window_length), order_polynome)
+        if key in self.smoothed:
+            self.smoothed.move_to_end(key)
+            return self.smoothed[key][start:stop]
+        values = self.dict_segments[name_segment].values(channel)
+        first, last, start, stop = window_limits(start, stop, len(values), key[2])
+        return smooth(values[first:last], key[2], order_polynome)[start - first:stop - first]
+
+    def put(self, name_segment, channel, window_length, order_polynome, y_smooth):
+        """
+        Memoization of a signal smoothed outside the cache (smoothing of stacked segments)
+
+        :parameters:
+            name_segment: str
+                name of the segment
+            channel: str
+                name of the column of corrected_data
+            window_length: int
+                size of the sliding window (made odd)
+            order_polynome: int
+                order of the polynomial fitted in the window
+            y_smooth: np.array
+                smoothed signal
+        """
+        y_smooth.setflags(write=False)
+        self.memoize((name_segment, channel, odd_window(window_length), order_polynome), y_smooth)
+
+    def memoize(self, key, y_smooth):
+        """
+        Recording of a smoothed signal, the least recently used removed beyond max_signals
+
+        :parameters:
+            key: tuple
+                segment, channel, window and order of the smoothing
+            y_smooth: np.array
+                smoothed signal (read-only)
+        """
+        self.smoothed[key] = y_smooth
+        self.smoothed.move_to_end(key)
+        while len(self.smoothed) > self.max_signals:
+            self.smoothed.popitem(last=False)
+
+    def clear(self, name_segment=None):
+        """
+        Removal of the smoothed signals of a segment (of all the segments by default)
+
+        :parameters:
+            name_segment: str
+                name of the segment whose corrected data changed
+        """
+        if name_segment is None:
+            self.smoothed.clear()
+        else:
+            for key in [key for key in self.smoothed if key[0] == name_segment]:
+                del self.smoothed[key]
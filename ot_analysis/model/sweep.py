@@ -0,0 +1,333 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# @author Thierry GALLIANO
+# @contributors Pierre-Henri PUECH, Laurent LIMOZIN, Guillaume GAY
+"""
+File describing the sweep of the thresholds of the analysis over a grid of parameters:
+the values of each curve that the thresholds are compared to (deviations on the secondary axes,
+baselines, smoothed "Pull" segment, jumps) are extracted once from the analyzed curves,
+then the alignment, the comparison of the baselines and the classification
+are evaluated for all the parameter sets at once on arrays (one line per parameter set,
+one column per curve)
+"""
+from itertools import product
+import numpy as np
+import pandas as pd
+
+# parameters of the methods that the sweep can vary
+SWEEP_PARAMETERS = ('threshold_align', 'factor_noise', 'jump_force', 'jump_point', 'jump_distance')
+
+# classifications of the curves, in the order of the columns of the counts
+TYPES = ('NAD', 'AD', 'FTU', 'ITU', 'RE')
+
+# scalar values of a curve used by the sweep
+SCALARS = ('deviation', 'scale', 'baseline_start', 'std_start', 'baseline_end', 'force_max', 'index_force_max')
+
+
+def grid_points(grid, methods):
+    """
+    Parameter sets of a grid (all the combinations of the values given for each parameter),
+    the parameters not given taking the value of the methods
+
+    :parameters:
+        grid: dict
+            for some parameters of SWEEP_PARAMETERS, list of the values to try
+        methods: dict
+            parameters of the analysis
+
+    :return:
+        points: DataFrame
+            one line per parameter set, one column per parameter of SWEEP_PARAMETERS
+    """
+    unknown = [name for name in grid if name not in SWEEP_PARAMETERS]
+    if unknown:
+        raise ValueError('parameters not handled by the sweep: ' + ', '.join(unknown))
+    values = [list(np.atleast_1d(grid[name])) if name in grid else [methods[name]]
+              for name in SWEEP_PARAMETERS]
+    return pd.DataFrame(list(product(*values)), columns=list(SWEEP_PARAMETERS))
+
+###############################################################################################
+
+
+def first_below(y_smooth, thresholds):
+    """
+    Return points to the baseline for several thresholds, as Curve.retrieve_retour_line_end:
+    first point after the maximum below the threshold, plus one
+
+    :parameters:
+        y_smooth: np.array
+            smoothed force of the "Pull" segment
+        thresholds: np.array
+            thresholds of the return to the baseline
+
+    :return:
+        indexes: np.array
+            index of the return point for each threshold (-1 if not found)
+    """
+    index_max = int(y_smooth.argmax())
+    # the first point below a threshold is the first point where the running minimum goes below it
+    running_min = np.minimum.accumulate(y_smooth[index_max:])
+    positions = np.searchsorted(-running_min, -np.asarray(thresholds, dtype=float), side='right')
+    indexes = np.minimum(index_max + positions + 1, len(y_smooth) - 1)
+    return np.where(positions < len(running_min), indexes, -1)
+
+###############################################################################################
+
+
+class CurveSweep:
+    """
+    Values of an analyzed curve used by the thresholds of the sweep
+    """
+
+    def __init__(self, name, values, y_smooth, position):
+        """
+        :parameters:
+            name: str
+                name of the curve
+            values: dict
+                scalar values of the curve (SCALARS)
+            y_smooth: np.array
+                smoothed force of the "Pull" segment
+            position: np.array
+                distance (nm) of each point of the "Pull" segment
+        """
+        self.name = name
+        for key in SCALARS:
+            setattr(self, key, values[key])
+        self.index_force_max = int(self.index_force_max)
+        self.y_smooth = np.asarray(y_smooth, dtype=float)
+        self.position = np.asarray(position, dtype=float)
+
+    #########################################################################################
+
+    @classmethod
+    def from_curve(cls, curve, window_smooth):
+        """
+        Extraction of the values of an analyzed curve
+
+        :parameters:
+            curve: Curve
+                analyzed curve
+            window_smooth: int
+                size of the window of the smoothing of the "Pull" segment
+        """
+        main_axis = curve.features['main_axis']['axe']
+        setpoint = float(curve.dict_segments['Press'].header_segment['segment-settings.setpoint.value']) * 1e12
+        values = {
+            # alignment: misaligned if a deviation exceeds threshold_align % of the scale
+            'deviation': max(deviation for segment in curve.dict_segments.values()
+                             for _, deviation in segment.alignment_deviations(main_axis, curve.range_baseline)),
+            'scale': max(abs(curve.features['force_min_curve']['value']), setpoint),
+            # comparison of the baselines
+            'baseline_start': curve.features['baseline_corrected_press (pN)'],
+            'std_start': curve.features['std_corrected_press (pN)'],
+            'baseline_end': curve.calcul_baseline("Pull", True),
+            # jumps of the classification
+            'force_max': curve.features['force_max_curve']['value'],
+            'index_force_max': curve.features['force_max_curve']['index']}
+        segment = curve.dict_segments['Pull']
+        if segment.has_channel('distance'):
+            position = np.abs(segment.values('distance'))
+        else:
+            speed = float(segment.header_segment['segment-settings.length'])/float(
+                segment.header_segment['segment-settings.duration'])
+            position = (speed*1e9) * segment.values('time')
+        return cls(curve.file, values, curve.smooth_segment('Pull', window_smooth, 2), position)
+
+    #########################################################################################
+
+    def jumps_end(self, factors_noise):
+        """
+        Number of points and distance between the maximum force and the return point
+        for several tolerances
+
+        :parameters:
+            factors_noise: np.array
+                tolerances (factor of the noise of the baseline)
+
+        :return:
+            found: np.array(bool)
+                True if the return point is found
+            nb_points: np.array
+                number of points of the jump (0 if not found)
+            distance: np.array
+                distance of the jump (nm, 0 if not found)
+        """
+        indexes = first_below(self.y_smooth, self.std_start * np.asarray(factors_noise, dtype=float))
+        found = indexes >= 0
+        indexes = np.where(found, indexes, self.index_force_max)
+        return found, indexes - self.index_force_max, self.position[indexes] - self.position[self.index_force_max]
+
+###############################################################################################
+
+
+class ParameterSweep:
+    """
+    Classification and alignment of analyzed curves for all the parameter sets of a grid,
+    without analyzing the curves again. Exact when the optical effect is not corrected
+    (otherwise the correction made with the tolerance of the analysis is kept)
+    """
+
+    def __init__(self, curves, methods):
+        """
+        :parameters:
+            curves: list(CurveSweep)
+                values of the analyzed curves
+            methods: dict
+                parameters of the analysis of the curves
+        """
+        self.methods = methods
+        self.curves = list(curves)
+        self.names = [curve.name for curve in self.curves]
+
+    #########################################################################################
+
+    @classmethod
+    def from_curves(cls, curves, methods):
+        """
+        Sweep of analyzed curves
+
+        :parameters:
+            curves: list(Curve)
+                analyzed curves
+            methods: dict
+                parameters of the analysis of the curves
+        """
+        return cls([CurveSweep.from_curve(curve, methods['width_window_smooth']) for curve in curves], methods)
+
+    #########################################################################################
+
+    def save(self, path):
+        """
+        Recording of the values of the curves in a npz file, to sweep them again
+        without the files of the curves
+
+        :parameters:
+            path: str
+                name of the file
+        """
+        lengths = [len(curve.y_smooth) for curve in self.curves]
+        np.savez(path, names=np.array(self.names), window=self.methods['width_window_smooth'],
+                 scalars=np.array([[getattr(curve, key) for key in SCALARS] for curve in self.curves],
+                                  dtype=float).reshape(-1, len(SCALARS)),
+                 offsets=np.concatenate(([0], np.cumsum(lengths))).astype(int),
+                 y_smooth=np.concatenate([curve.y_smooth for curve in self.curves] + [np.empty(0)]),
+                 position=np.concatenate([curve.position for curve in self.curves] + [np.empty(0)]))
+
+    #########################################################################################
+
+    @classmethod
+    def load(cls, path, methods):
+        """
+        Sweep of the values of the curves recorded by save
+
+        :parameters:
+            path: str
+                name of the file
+            methods: dict
+                parameters of the analysis of the curves
+
+        :return:
+            sweep: ParameterSweep
+        """
+        with np.load(path) as recorded:
+            if int(recorded['window']) != int(methods['width_window_smooth']):
+                raise ValueError('values recorded with a smoothing window of ' + str(int(recorded['window'])))
+            offsets = recorded['offsets']
+            curves = [CurveSweep(str(name), dict(zip(SCALARS, scalars)),
+                                 recorded['y_smooth'][offsets[index]:offsets[index + 1]],
+                                 recorded['position'][offsets[index]:offsets[index + 1]])
+                      for index, (name, scalars) in enumerate(zip(recorded['names'], recorded['scalars']))]
+        return cls(curves, methods)
+
+    #########################################################################################
+
+    def values(self, name):
+        """
+        Array of an attribute of the curves (one column per curve)
+        """
+        return np.array([getattr(curve, name) for curve in self.curves], dtype=float)[None, :]
+
+    #########################################################################################
+
+    def alignment(self, threshold_align):
+        """
+        Alignment of the curves for several thresholds, as Curve.check_alignment_curve
+
+        :parameters:
+            threshold_align: np.array
+                percentage of the maximum force for the misalignment, one per parameter set
+
+        :return:
+            aligned: np.array(bool)
+                True if aligned, one line per parameter set
+        """
+        threshold = np.asarray(threshold_align, dtype=float)[:, None] / 100 * self.values('scale')
+        return ~(self.values('deviation') > threshold)
+
+    #########################################################################################
+
+    def classification(self, points):
+        """
+        Classification of the curves for several parameter sets, as the comparison of the baselines
+        (Curve.compare_baseline_start_end) followed by Curve.classification
+
+        :parameters:
+            points: DataFrame
+                parameter sets (factor_noise, jump_force, jump_point, jump_distance)
+
+        :return:
+            types: np.array(str)
+                classification of the curves, one line per parameter set
+        """
+        factors, inverse = np.unique(points['factor_noise'].to_numpy(dtype=float), return_inverse=True)
+        found = np.empty((len(factors), len(self.curves)), dtype=bool)
+        nb_points = np.empty(found.shape)
+        distance = np.empty(found.shape)
+        for column, curve in enumerate(self.curves):
+            found[:, column], nb_points[:, column], distance[:, column] = curve.jumps_end(factors)
+        found, nb_points, distance = found[inverse], nb_points[inverse], distance[inverse]
+
+        tolerance = points['factor_noise'].to_numpy(dtype=float)[:, None] * self.values('std_start')
+        baseline_start = self.values('baseline_start')
+        baseline_end = self.values('baseline_end')
+        inside = ((baseline_start - tolerance) < baseline_end) & (baseline_end < (baseline_start + tolerance))
+        nad = self.values('force_max') <= points['jump_force'].to_numpy(dtype=float)[:, None]
+        ad = (nb_points < points['jump_point'].to_numpy(dtype=float)[:, None]) & \
+            (distance < points['jump_distance'].to_numpy(dtype=float)[:, None])
+        # curves without return point stay unclassified, recorded as RE
+        return np.select([inside & nad, inside & found & ad, inside & found, inside,
+                          (baseline_start + tolerance) < baseline_end],
+                         ['NAD', 'AD', 'FTU', 'RE', 'ITU'], 'RE')
+
+    #########################################################################################
+
+    def run(self, grid):
+        """
+        Sweep of the grid of parameters
+
+        :parameters:
+            grid: dict
+                for some parameters of SWEEP_PARAMETERS, list of the values to try
+
+        :return:
+            curves: DataFrame
+                one line per parameter set and curve: parameters, curve, type and AL
+            counts: DataFrame
+                one line per parameter set: parameters, number of curves of each type
+                and of misaligned curves
+        """
+        points = grid_points(grid, self.methods)
+        types = self.classification(points)
+        aligned = self.alignment(points['threshold_align'].to_numpy(dtype=float))
+        curves = points.loc[points.index.repeat(len(self.curves))].reset_index()
+        curves = curves.rename(columns={'index': 'set'})
+        curves['curve'] = np.tile(self.names, len(points))
+        curves['type'] = types.ravel()
+        curves['AL'] = np.where(aligned.ravel(), 'Yes', 'No')
+        counts = points.copy()
+        for type_curve in TYPES:
+            counts[type_curve] = (types == type_curve).sum(axis=1)
+        counts['AL_No'] = (~aligned).sum(axis=1)
+        counts.index.name = 'set'
+        return curves, counts
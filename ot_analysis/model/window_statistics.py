@@ -0,0 +1,141 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# @author Thierry GALLIANO
+# @contributors Pierre-Henri PUECH, Laurent LIMOZIN, Guillaume GAY
+"""
+File describing the windowed statistics of a data channel of a segment
+(mean, standard deviation, minimum and maximum over any window in O(1))
+"""
+import numpy as np
+
+
+class WindowStatistics:
+    """
+    Cumulative sums and sums of squares of a channel built in one pass,
+    sparse tables for the extrema built at the first request on a partial window.
+    The windows are given as for a slice of the data: [start:stop], negative indices allowed.
+    """
+
+    def __init__(self, values):
+        """
+        :parameters:
+            values: Series or np.array
+                data of the channel
+        """
+        self.values = np.asarray(values, dtype=float)
+        self.nb_points = len(self.values)
+        # shift by the mean to limit the cancellation in the differences of cumulative sums
+        self.shift = self.values.mean() if self.nb_points > 0 else 0.0
+        centered = self.values - self.shift
+        self.cumul = np.concatenate(([0.0], np.cumsum(centered)))
+        self.cumul_square = np.concatenate(([0.0], np.cumsum(centered * centered)))
+        self.sparse_tables = {}
+
+    def bounds(self, start=None, stop=None):
+        """
+        Positions of the window in the data
+
+        :parameters:
+            start, stop: int
+                limits of the window as in a slice
+
+        :return:
+            start, stop: int
+                positive positions of the window (stop excluded)
+        """
+        start, stop, _ = slice(start, stop).indices(self.nb_points)
+        return start, max(start, stop)
+
+    def mean(self, start=None, stop=None):
+        """
+        Mean of the window (NaN if the window is empty, as pandas)
+        """
+        start, stop = self.bounds(start, stop)
+        if stop == start:
+            return np.nan
+        return (self.cumul[stop] - self.cumul[start]) / (stop - start) + self.shift
+
+    def std(self, start=None, stop=None, ddof=1):
+        """
+        Standard deviation of the window (ddof=1 as pandas by default)
+        """
+        start, stop = self.bounds(start, stop)
+        nb_points = stop - start
+        if nb_points <= ddof:
+            return np.nan
+        total = self.cumul[stop] - self.cumul[start]
+        total_square = self.cumul_square[stop] - self.cumul_square[start]
+        variance = (total_square - total * total / nb_points) / (nb_points - ddof)
+        return np.sqrt(max(variance, 0.0))
+
+    def sparse_table(self, extremum):
+        """
+        Positions of the extremum of the windows of length 2^k starting at each point
+
+        :parameters:
+            extremum: str
+                'min' or 'max'
+        """
+        if extremum not in self.sparse_tables:
+            compare = np.less_equal if extremum == 'min' else np.greater_equal
+            table = [np.arange(self.nb_points)]
+            length = 1
+            while 2 * length <= self.nb_points:
+                previous = table[-1]
+                left = previous[:len(previous) - length]
+                right = previous[length:]
+                table.append(np.where(compare(self.values[left], self.values[right]), left, right))
+                length *= 2
+            self.sparse_tables[extremum] = table
+        return self.sparse_tables[extremum]
+
+    def arg_extremum(self, extremum, start=None, stop=None):
+        """
+        Position of the first extremum of the window
+
+        :parameters:
+            extremum: str
+                'min' or 'max'
+            start, stop: int
+                limits of the window as in a slice
+        """
+        start, stop = self.bounds(start, stop)
+        if stop == start:
+            raise ValueError("empty window")
+        if start == 0 and stop == self.nb_points:
+            key = 'arg' + extremum
+            if key not in self.sparse_tables:
+                self.sparse_tables[key] = int(np.argmin(self.values) if extremum == 'min'
+                                              else np.argmax(self.values))
+            return self.sparse_tables[key]
+        level = (stop - start).bit_length() - 1
+        table = self.sparse_table(extremum)[level]
+        left = table[start]
+        right = table[stop - (1 << level)]
+        if extremum == 'min':
+            return int(left if self.values[left] <= self.values[right] else right)
+        return int(left if self.values[left] >= self.values[right] else right)
+
+    def argmin(self, start=None, stop=None):
+        """
+        Position of the first minimum of the window
+        """
+        return self.arg_extremum('min', start, stop)
+
+    def argmax(self, start=None, stop=None):
+        """
+        Position of the first maximum of the window
+        """
+        return self.arg_extremum('max', start, stop)
+
+    def min(self, start=None, stop=None):
+        """
+        Minimum of the window
+        """
+        return self.values[self.argmin(start, stop)]
+
+    def max(self, start=None, stop=None):
+        """
+        Maximum of the window
+        """
+        return self.values[self.argmax(start, stop)]
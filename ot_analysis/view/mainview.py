@@ -112,6 +112,16 @@ class View(QMainWindow, QWidget):
         self.check_cid = False
         self.check_logger = False
         self.check_legend = True
+        self.fit_method = 'closed_form'
+        self.window_fit_sphere = 0
+        self.range_baseline = 1000
+        self.range_std = 200
+        self.full_analysis = False
+        self.batch_analysis = False
+        self.coarse_factor = 0
+        self.nb_workers = 4
+        self.fit_max_nfev = None
+        self.fit_max_time = None
         self.clear()
         self.create_checkbox_logger()
         self.data_description()
@@ -429,6 +439,26 @@ class View(QMainWindow, QWidget):
             self.input_factor.setValue(methods_data['factor_noise'][0])
             self.input_width_window_smooth.setValue(
                 methods_data['width_window_smooth'][0])
+            if 'fit_method' in methods_data:
+                self.fit_method = methods_data['fit_method'][0]
+            if 'window_fit_sphere' in methods_data:
+                self.window_fit_sphere = int(methods_data['window_fit_sphere'][0])
+            if 'range_baseline' in methods_data:
+                self.range_baseline = int(methods_data['range_baseline'][0])
+            if 'range_std' in methods_data:
+                self.range_std = int(methods_data['range_std'][0])
+            if 'full_analysis' in methods_data:
+                self.full_analysis = bool(methods_data['full_analysis'][0])
+            if 'batch_analysis' in methods_data:
+                self.batch_analysis = bool(methods_data['batch_analysis'][0])
+            if 'coarse_factor' in methods_data:
+                self.coarse_factor = int(methods_data['coarse_factor'][0])
+            if 'nb_workers' in methods_data:
+                self.nb_workers = int(methods_data['nb_workers'][0])
+            if 'fit_max_nfev' in methods_data and not pd.isna(methods_data['fit_max_nfev'][0]):
+                self.fit_max_nfev = int(methods_data['fit_max_nfev'][0])
+            if 'fit_max_time' in methods_data and not pd.isna(methods_data['fit_max_time'][0]):
+                self.fit_max_time = float(methods_data['fit_max_time'][0])
             self.button_load.deleteLater()
             self.check_methods = True
 
@@ -488,6 +518,16 @@ class View(QMainWindow, QWidget):
             condition = self.input_condition.text()
         self.methods['condition'] = condition
         self.methods['width_window_smooth'] = self.input_width_window_smooth.value()
+        self.methods['fit_method'] = self.fit_method
+        self.methods['window_fit_sphere'] = self.window_fit_sphere
+        self.methods['range_baseline'] = self.range_baseline
+        self.methods['range_std'] = self.range_std
+        self.methods['full_analysis'] = self.full_analysis
+        self.methods['batch_analysis'] = self.batch_analysis
+        self.methods['coarse_factor'] = self.coarse_factor
+        self.methods['nb_workers'] = self.nb_workers
+        self.methods['fit_max_nfev'] = self.fit_max_nfev
+        self.methods['fit_max_time'] = self.fit_max_time
         if self.checkbox_logger.isChecked():
             create_logger()
             self.check_logger = True
@@ -1641,7 +1681,10 @@ class View(QMainWindow, QWidget):
                 list_labels_methods = ['condition', 'drug', 'bead_radius', 'model', 'eta',
                                     'pulling_length', 'threshold_align',
                                     'jump_force', 'jump_distance', 'jump_point',
-                                    'factor_noise', 'width_window_smooth', 'optical']
+                                    'factor_noise', 'width_window_smooth', 'optical', 'fit_method',
+                                    'window_fit_sphere', 'range_baseline', 'range_std', 'full_analysis',
+                                    'batch_analysis', 'coarse_factor', 'nb_workers', 'fit_max_nfev',
+                                    'fit_max_time']
                 output_methods = output_methods[list_labels_methods]
                 output_methods.to_csv(self.directory_output + sep + 'methods_' + today + '_' +
                                     '.tsv', sep='\t', encoding='utf-8', na_rep="NaN")
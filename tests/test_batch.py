@@ -0,0 +1,72 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# @author Thierry GALLIANO
+# @contributors Pierre-Henri PUECH, Laurent LIMOZIN, Guillaume GAY
+"""
+Test of the batch analysis of the curves stacked by segment
+"""
+from os import sep
+import numpy as np
+from ot_analysis.controller.controller import Controller
+from ot_analysis.model.fitting import fit_approach_linear, fit_retraction, \
+    fit_approach_linear_batch, fit_retraction_batch
+
+
+class TestBatch:
+    """
+    Class allowing to test the stacked analysis against the analysis curve by curve
+    """
+    @classmethod
+    def setup_class(cls):
+        """
+        Analysis of the curves of the test folder with and without the batch analysis
+        """
+        directory_test = 'tests' + sep + 'curves_test' + sep + 'verif'
+        methods = {'threshold_align': 30, 'pulling_length': 50, 'model': 'linear',
+                   'eta': 0.5, 'bead_radius': 1, 'factor_noise': 5, 'jump_force': 5,
+                   'jump_point': 200, 'jump_distance': 200, 'drug': 'NaN', 'condition':
+                   'NaN', 'optical': None, 'width_window_smooth': 151, 'full_analysis': True}
+        cls.curves = {}
+        for batch_analysis in (False, True):
+            controller = Controller(None, directory_test)
+            controller.create_dict_curves(dict(methods, batch_analysis=batch_analysis), controller.files)
+            cls.curves[batch_analysis] = controller.dict_curve
+
+    def test_batch_fits(self):
+        """
+        test the closed-form fits of stacked signals against the fits signal by signal
+        """
+        rng = np.random.default_rng(0)
+        x_data = np.linspace(0.0, 2.0, 3000)
+        parameters = [(0.5, 3.0, 1.0), (1.2, -5.0, 0.0), (0.9, 10.0, 2.0)]
+        approach = np.array([np.where(x_data > contact, k * (x_data - contact), 0.0) + level
+                             for contact, k, level in parameters]) + rng.normal(0, 0.2, (3, len(x_data)))
+        retraction = np.array([np.where(x_data < release, k * (x_data - release), 0.0) + level
+                               for release, k, level in parameters]) + rng.normal(0, 0.2, (3, len(x_data)))
+        for fit, fit_batch, y_data in ((fit_approach_linear, fit_approach_linear_batch, approach),
+                                       (fit_retraction, fit_retraction_batch, retraction)):
+            popt, pcov = fit_batch(x_data, y_data)
+            for line, signal in enumerate(y_data):
+                popt_ref, pcov_ref = fit(x_data, signal)
+                assert np.allclose(popt[line], popt_ref, rtol=1e-9)
+                assert np.allclose(np.diag(pcov[line]), np.diag(pcov_ref), rtol=1e-6)
+
+    def test_same_features(self):
+        """
+        test the features of the batch analysis are those of the analysis curve by curve
+        """
+        assert sorted(self.curves[True]) == sorted(self.curves[False])
+        for name, curve in self.curves[False].items():
+            features = self.curves[True][name].features
+            for key, value in curve.features.items():
+                if key in ('fit_press', 'fit_pull'):
+                    continue
+                values = value if isinstance(value, dict) else {key: value}
+                batch_values = features[key] if isinstance(value, dict) else {key: features[key]}
+                for entry, reference in values.items():
+                    if isinstance(reference, float):
+                        assert np.isclose(batch_values[entry], reference, rtol=1e-9, equal_nan=True), key
+                    else:
+                        assert str(batch_values[entry]) == str(reference), key
+        # the stacked values are kept with the data they were computed from
+        assert any(curve.precomputed for curve in self.curves[True].values())
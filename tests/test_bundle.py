@@ -0,0 +1,124 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# @author Thierry GALLIANO
+# @contributors Pierre-Henri PUECH, Laurent LIMOZIN, Guillaume GAY
+"""
+Test of the analysis of the curves read in bundles (zip or tar archives of curve files)
+"""
+import tarfile
+from os import sep, listdir
+from shutil import rmtree
+from tempfile import mkdtemp
+from zipfile import ZipFile, ZIP_DEFLATED
+from ot_analysis.controller.controller import Controller
+from ot_analysis.extractor import bundle as bundle_module
+from ot_analysis.extractor.bundle import BundleReader, list_bundle, open_member, member_name
+
+
+class TestBundle:
+    """
+    Class allowing to test the curves of bundles against the same curves in the test folder
+    """
+    @classmethod
+    def setup_class(cls):
+        """
+        Creation of a zip bundle of the curves of the test folder and of a compressed tar bundle
+        holding it with a text curve
+        """
+        cls.path_curves = 'tests' + sep + 'curves_test' + sep + 'verif'
+        cls.names = sorted(name for name in listdir(cls.path_curves) if name.startswith(('b1c1', 'b4c4')))
+        cls.directory_bundle = mkdtemp()
+        cls.name_zip = cls.directory_bundle + sep + 'curves.zip'
+        with ZipFile(cls.name_zip, 'w', ZIP_DEFLATED) as bundle:
+            for name in cls.names:
+                if not name.endswith('.txt'):
+                    bundle.write(cls.path_curves + sep + name, 'verif/' + name)
+        cls.name_tar = cls.directory_bundle + sep + 'study.tar.gz'
+        with tarfile.open(cls.name_tar, 'w:gz') as bundle:
+            bundle.add(cls.name_zip, 'day/curves.zip')
+            for name in cls.names:
+                if name.endswith('.txt'):
+                    bundle.add(cls.path_curves + sep + name, 'day/' + name)
+            bundle.add(cls.path_curves + sep + cls.names[0], 'day/notes-' + cls.names[0])
+        cls.methods = {'threshold_align': 30, 'pulling_length': 50, 'model': 'linear',
+                       'eta': 0.5, 'bead_radius': 1, 'factor_noise': 5, 'jump_force': 5,
+                       'jump_point': 200, 'jump_distance': 200, 'drug': 'NaN', 'condition':
+                       'NaN', 'optical': None, 'width_window_smooth': 151, 'nb_workers': 2}
+
+    def test_list(self):
+        """
+        test the listing of the curve files of nested bundles and their reading without extraction
+        """
+        files = list_bundle(self.name_tar, "^b[1-9]+c[1-9]+")
+        assert sorted(member_name(file) for file in files) == self.names
+        for file in files:
+            with open(self.path_curves + sep + member_name(file), 'rb') as curve_file:
+                assert open_member(file).read() == curve_file.read()
+
+    def test_analysis(self):
+        """
+        test the curves of the bundle have the features of the curves of the folder
+        """
+        reference = Controller(None)
+        reference.create_dict_curves(self.methods, [self.path_curves + sep + name for name in self.names])
+        controller = Controller(None, self.directory_bundle)
+        assert len(controller.files) == 2 * len(self.names) - 1
+        controller.create_dict_curves(self.methods)
+        assert sorted(controller.dict_curve) == sorted(reference.dict_curve)
+        assert controller.dict_type_files['DP'] == len(self.names) - 1
+        for name, curve in controller.dict_curve.items():
+            assert '::' in curve.features['relative_path']
+            for key, value in reference.dict_curve[name].features.items():
+                if key not in ('fit_press', 'fit_pull', 'relative_path'):
+                    assert str(curve.features[key]) == str(value), key
+
+    def test_reader(self):
+        """
+        test the files of the bundles are read with one opening of each bundle, in any order
+        """
+        files = list_bundle(self.name_tar, "^b[1-9]+c[1-9]+")
+        with BundleReader(files) as reader:
+            contents = [open_member(file).read() for file in reversed(files)]
+            assert reader.nb_opens == 1
+        assert contents == [open_member(file).read() for file in reversed(files)]
+
+    def test_buffered_bound(self, monkeypatch):
+        """
+        test the files kept in memory by the reader stay within MAX_BUFFERED bytes,
+        the files not kept being read again in their bundle
+        """
+        files = list_bundle(self.name_tar, "^b[1-9]+c[1-9]+")
+        sizes = [len(open_member(file).read()) for file in files]
+        monkeypatch.setattr(bundle_module, 'MAX_BUFFERED', 2 * max(sizes))
+        nb_buffered = []
+        with BundleReader(files) as reader:
+            contents = []
+            for file in reversed(files):
+                contents.append(open_member(file).read())
+                nb_buffered.append(reader.nb_buffered)
+        assert max(nb_buffered) <= 2 * max(sizes)
+        assert contents == [open_member(file).read() for file in reversed(files)]
+
+    def test_single_opening(self, monkeypatch):
+        """
+        test the analysis of the curves of a compressed tar bundle opens it once
+        """
+        calls = []
+        tar_open = bundle_module.tarfile.open
+
+        def counted_open(*args, **kwargs):
+            calls.append(kwargs.get('mode', args[1] if len(args) > 1 else 'r'))
+            return tar_open(*args, **kwargs)
+
+        controller = Controller(None, self.name_tar)
+        monkeypatch.setattr(bundle_module.tarfile, 'open', counted_open)
+        controller.create_dict_curves(self.methods)
+        assert len(controller.dict_curve) == len(self.names) - 1
+        assert calls == ['r|*']
+
+    @classmethod
+    def teardown_class(cls):
+        """
+        Removal of the bundles
+        """
+        rmtree(cls.directory_bundle)
@@ -0,0 +1,105 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# @author Thierry GALLIANO
+# @contributors Pierre-Henri PUECH, Laurent LIMOZIN, Guillaume GAY
+"""
+Test of the calibration of the thresholds of the classification on supervised curves
+"""
+import os
+from os import sep
+import numpy as np
+import pandas as pd
+import pytest
+from ot_analysis.controller.controller import Controller
+from ot_analysis.model.sweep import ParameterSweep, grid_points
+from ot_analysis.model.calibration import Calibration, supervised_labels
+
+
+class TestCalibration:
+    """
+    Class allowing to test the calibration on types given by a known analysis
+    """
+    @classmethod
+    def setup_class(cls):
+        """
+        Analysis of the curves of the test folder with the thresholds to find
+        """
+        cls.directory_test = 'tests' + sep + 'curves_test' + sep + 'verif'
+        cls.methods = {'threshold_align': 30, 'pulling_length': 50, 'model': 'linear',
+                       'eta': 0.5, 'bead_radius': 1, 'factor_noise': 5, 'jump_force': 5,
+                       'jump_point': 200, 'jump_distance': 200, 'drug': 'NaN', 'condition':
+                       'NaN', 'optical': None, 'width_window_smooth': 151}
+        cls.supervised = Controller(None, cls.directory_test)
+        cls.supervised.create_dict_curves(dict(cls.methods, jump_force=15, jump_distance=20),
+                                          cls.supervised.files)
+
+    def test_calibration(self, tmpdir):
+        """
+        test the calibration finds thresholds giving the supervised types,
+        from the curves then from the recorded values of the curves
+
+        :parameters:
+            tmpdir: object
+                allows you to create a temporary repository
+        """
+        repository = tmpdir.mkdir('Result').__str__()
+        output_file = self.supervised.output_save(repository)
+        grid = {'factor_noise': [4, 5], 'jump_force': [5, 10, 15, 20], 'jump_point': [200, 2000],
+                'jump_distance': [20, 200]}
+        cache = repository + sep + 'sweep.npz'
+        for _ in range(2):
+            controller = Controller(None, self.directory_test)
+            parameters, scores, name_file = controller.calibrate(self.methods, [output_file], repository,
+                                                                 grid, cache, nb_folds=3)
+            assert len(controller.dict_curve) == (0 if _ else len(self.supervised.dict_curve))
+            assert scores['agreement'] == 1.0 and scores['nb_sets'] == 32
+            methods = Controller.read_methods(name_file)
+            assert methods['jump_force'] == parameters['jump_force'] and methods['model'] == 'linear'
+            sweep = ParameterSweep.load(cache, methods)
+            types = sweep.classification(grid_points({}, methods))[0]
+            for name, type_curve in zip(sweep.names, types):
+                assert type_curve == self.supervised.dict_curve[name].features['automatic_type']
+        assert parameters['jump_force'] == 15 and parameters['jump_distance'] == 20
+        calibration = Calibration(sweep, supervised_labels([output_file]))
+        grid = calibration.default_grid()
+        assert all(sweep.methods[name] in values for name, values in grid.items())
+        assert calibration.run(grid)[1]['agreement'] == 1.0
+
+    def test_interface(self, tmpdir):
+        """
+        test the calibrated methods file is loaded by the widgets of the interface
+        as View.load_methods does, and a flat agreement keeps the thresholds of the methods
+
+        :parameters:
+            tmpdir: object
+                allows you to create a temporary repository
+        """
+        os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+        qt_widgets = pytest.importorskip('PyQt5.QtWidgets')
+        application = qt_widgets.QApplication.instance() or qt_widgets.QApplication([])
+        repository = tmpdir.mkdir('Result').__str__()
+        output_file = self.supervised.output_save(repository)
+        controller = Controller(None, self.directory_test)
+        parameters, _, name_file = controller.calibrate(self.methods, [output_file], repository)
+        assert all(value >= 0 for value in parameters.values())
+        # widgets of View.create_condition_parameters_type, file read as in View.load_methods
+        methods_data = pd.read_csv(name_file, sep='\t', header=0)
+        input_jump_force = qt_widgets.QDoubleSpinBox()
+        input_jump_position = qt_widgets.QSpinBox()
+        input_jump_position.setMaximum(5000)
+        input_nb_points_jump = qt_widgets.QSpinBox()
+        input_nb_points_jump.setMaximum(5000)
+        input_factor = qt_widgets.QDoubleSpinBox()
+        input_jump_force.setValue(methods_data['jump_force'][0])
+        input_jump_position.setValue(methods_data['jump_distance'][0])
+        input_nb_points_jump.setValue(methods_data['jump_point'][0])
+        input_factor.setValue(methods_data['factor_noise'][0])
+        assert input_jump_position.value() == parameters['jump_distance']
+        assert input_nb_points_jump.value() == parameters['jump_point']
+        assert input_factor.value() == pytest.approx(parameters['factor_noise'])
+        calibration = Calibration(ParameterSweep.from_curves(controller.dict_curve.values(), self.methods),
+                                  supervised_labels([output_file]))
+        points = grid_points({'jump_point': [-500, 0, 200, 2000], 'jump_distance': [20, 200, 400]}, self.methods)
+        best = calibration.best_point(np.ones(len(points)), points)
+        assert points['jump_point'][best] == 200 and points['jump_distance'][best] == 200
+        application.processEvents()
@@ -0,0 +1,110 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# @author Thierry GALLIANO
+# @contributors Pierre-Henri PUECH, Laurent LIMOZIN, Guillaume GAY
+"""
+Test of the typed columnar output file written alongside the csv output
+"""
+from os import sep
+from pathlib import Path
+from shutil import rmtree
+from tempfile import mkdtemp
+import numpy as np
+import pandas as pd
+import pytest
+from ot_analysis.controller.controller import Controller
+from ot_analysis.controller.columnar import ColumnarWriter, read_columnar
+from ot_analysis.model.feature_table import FeatureTable
+
+
+class TestColumnar:
+    """
+    Class allowing to test the types, the metadata and the row groups of the typed output
+    """
+    @classmethod
+    def setup_class(cls):
+        """
+        Analysis of the test folder, output in csv and npz
+        """
+        cls.directory = mkdtemp()
+        cls.methods = {'threshold_align': 30, 'pulling_length': 50, 'model': 'linear',
+                       'eta': 0.5, 'bead_radius': 1, 'factor_noise': 5, 'jump_force': 5,
+                       'jump_point': 200, 'jump_distance': 200, 'drug': 'NaN', 'condition':
+                       'NaN', 'optical': None, 'width_window_smooth': 151}
+        cls.controller = Controller(None, 'tests' + sep + 'curves_test' + sep + 'verif')
+        cls.controller.create_dict_curves(cls.methods)
+        cls.name_csv = cls.controller.output_save(cls.directory, 'npz', cls.methods)
+
+    def test_output_save(self):
+        """
+        test the typed file has the rows, columns and values of the csv, with their types
+        """
+        typed, methods = read_columnar(self.name_csv[:-len('.csv')] + '.npz')
+        assert methods == self.methods
+        output = pd.read_csv(self.name_csv, sep='\t', header=0, index_col=0)
+        assert list(typed.index) == list(output.index)
+        assert list(typed.columns) == list(output.columns)
+        assert typed['contact_point_index'].dtype == 'Int64'
+        assert typed['treat_supervised'].dtype == 'boolean'
+        assert typed['automatic_type'].dtype == 'string'
+        assert typed['stiffness (N/m)'].dtype == 'float64'
+        assert np.allclose(typed['stiffness (N/m)'].astype(float), output['stiffness (N/m)'], equal_nan=True)
+        assert list(typed['automatic_type'].fillna('NaN')) == list(output['automatic_type'].fillna('NaN'))
+
+    def test_row_groups(self):
+        """
+        test the batches appended as row groups are read back in order, the columns of the first batch kept
+        """
+        typed = FeatureTable.from_curves(self.controller.dict_curve.values()).typed_output()
+        writer = ColumnarWriter(self.directory + sep + 'groups', 'npz', self.methods)
+        writer.write(typed.iloc[:2])
+        writer.write(typed.iloc[2:].drop(columns=['fit_status']))
+        writer.close()
+        assert writer.nb_groups == 2
+        read, _ = read_columnar(writer.name_file)
+        assert list(read.index) == list(typed.index.astype(str))
+        assert list(read.columns) == list(typed.columns)
+        assert read['fit_status'].iloc[2:].isna().all()
+        assert list(read['contact_point_index']) == list(typed['contact_point_index'])
+
+    @pytest.mark.parametrize('output_format', ['parquet', 'feather'])
+    def test_arrow(self, output_format):
+        """
+        test the Parquet and Feather files keep the rows, types and methods over several row groups
+        """
+        parquet = pytest.importorskip('pyarrow.parquet')
+        typed = FeatureTable.from_curves(self.controller.dict_curve.values()).typed_output()
+        typed.loc['b5c5-2021.06.07-15.10.03.254.jpk-nt-force', 'automatic_type'] = 'INC'
+        writer = ColumnarWriter(self.directory + sep + 'arrow', output_format, self.methods)
+        writer.write(typed.iloc[:2])
+        writer.write(typed.iloc[2:])
+        writer.close()
+        assert writer.name_file.endswith('.' + output_format)
+        read, methods = read_columnar(writer.name_file)
+        assert methods == self.methods
+        assert list(read.index) == list(typed.index.astype(str))
+        assert list(read.columns) == list(typed.columns)
+        assert read['contact_point_index'].dtype == 'Int64'
+        assert read['treat_supervised'].dtype == 'boolean'
+        assert read['automatic_type'].dtype == 'string'
+        assert read['stiffness (N/m)'].dtype == 'float64'
+        assert read['automatic_type'].iloc[-1] == 'INC' and pd.isna(read['contact_point_index'].iloc[-1])
+        assert np.allclose(read['stiffness (N/m)'], typed['stiffness (N/m)'].astype(float), equal_nan=True)
+        if output_format == 'parquet':
+            assert parquet.ParquetFile(writer.name_file).num_row_groups == 2
+
+    def test_format(self):
+        """
+        test an unknown format is refused
+        """
+        with pytest.raises(ValueError):
+            ColumnarWriter(self.directory + sep + 'output', 'hdf5')
+
+    @classmethod
+    def teardown_class(cls):
+        """
+        Removal of the results
+        """
+        rmtree(cls.directory)
+        Path(cls.name_csv).unlink()
+        Path(cls.name_csv[:-len('.csv')] + '.npz').unlink()
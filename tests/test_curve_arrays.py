@@ -0,0 +1,93 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# @author Thierry GALLIANO
+# @contributors Pierre-Henri PUECH, Laurent LIMOZIN, Guillaume GAY
+"""
+Test of the columnar storage of the data of the curves
+"""
+from os import sep
+import numpy as np
+import pandas as pd
+from ot_analysis.controller.controller import Controller
+from ot_analysis.model.axis import UniformAxis
+from ot_analysis.model.curve_arrays import CurveArrays
+
+
+class TestCurveArrays:
+    """
+    Class allowing to test the contiguous storage of the curves against the DataFrames of the segments
+    """
+    @classmethod
+    def setup_class(cls):
+        """
+        Creation of the curves of the test folder
+        """
+        directory_test = 'tests' + sep + 'curves_test' + sep + 'verif'
+        cls.controller = Controller(None, directory_test)
+        cls.methods = {'threshold_align': 30, 'pulling_length': 50, 'model': 'linear',
+                       'eta': 0.5, 'bead_radius': 1, 'factor_noise': 5, 'jump_force': 5,
+                       'jump_point': 200, 'jump_distance': 200, 'drug': 'NaN', 'condition':
+                       'NaN', 'optical': 'Correction', 'width_window_smooth': 151}
+        cls.controller.create_dict_curves(cls.methods, cls.controller.files)
+
+    def test_from_frames(self):
+        """
+        test the storage of segments with a missing channel, as pd.concat
+        """
+        frames = [pd.DataFrame({'time': np.arange(3.), 'zSignal1': np.ones(3)}),
+                  pd.DataFrame({'time': np.arange(2.), 'distance': [0., 2.]})]
+        arrays = CurveArrays.from_frames(frames)
+        pd.testing.assert_frame_equal(arrays.to_dataframe(), pd.concat(frames, ignore_index=True))
+        assert arrays.bounds(1) == (3, 5)
+        assert list(arrays.segment_frame(1).columns) == ['time', 'distance']
+        assert np.shares_memory(arrays.view(0, 'zSignal1'), arrays.channel('zSignal1'))
+        # time uniform in all the segments, distance missing in the first segment
+        assert sorted(arrays.axes) == ['time']
+        assert arrays.value(1, 'time', -1) == 1.0
+
+    def test_uniform_axis(self):
+        """
+        test the values and the lookups of the uniform axes against the arrays they replace
+        """
+        time = np.linspace(0.0, 1.7, 1234)
+        series_time = time + 12.3
+        axis = UniformAxis.from_values(time)
+        shifted = UniformAxis.from_values(series_time, axis)
+        assert shifted is not None and shifted.offsets == (12.3,)
+        assert np.array_equal(shifted.values(), series_time)
+        assert UniformAxis.from_values(np.sort(np.random.default_rng(0).random(100))) is None
+        for index in (0, 1, 617, -2, -1):
+            assert axis.value(index) == time[index]
+            assert shifted.value(index) == series_time[index]
+        for value in np.concatenate((series_time[::37], series_time[::37] + 1e-5, [-1.0, 20.0])):
+            assert shifted.index_before(value) == np.searchsorted(series_time, value, 'right') - 1
+        constant = UniformAxis.from_values(np.full(10, 3.5))
+        assert constant.step == 0.0 and np.array_equal(constant.values(), np.full(10, 3.5))
+
+    def test_concatenated_data(self):
+        """
+        test the data of the whole curve against the concatenation of the segments
+        after the corrections of the curves
+        """
+        for curve in self.controller.dict_curve.values():
+            for type_data, attribute in (('data_original', 'data'), ('data_corrected', 'corrected_data')):
+                reference = pd.concat([getattr(segment, attribute) for segment in curve.dict_segments.values()],
+                                      ignore_index=True)
+                pd.testing.assert_frame_equal(curve.retrieve_data_curve(type_data), reference)
+
+    def test_views(self):
+        """
+        test the segments read and modify the storage of the curve without copy
+        """
+        curve = list(self.controller.dict_curve.values())[0]
+        arrays = curve.arrays['data_corrected']
+        segment = curve.dict_segments['Pull']
+        index_segment = list(curve.dict_segments).index('Pull')
+        values = segment.values('zSignal1')
+        assert np.shares_memory(values, arrays.channel('zSignal1'))
+        assert segment.axis('time') is not None
+        assert segment.value('time', 10) == segment.values('time')[10]
+        segment.set_values('zSignal1', values + 1.0)
+        start, _ = arrays.bounds(index_segment)
+        assert arrays.channel('zSignal1')[start] == segment.corrected_data['zSignal1'][0]
+        segment.set_values('zSignal1', values - 1.0)
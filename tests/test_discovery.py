@@ -0,0 +1,98 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# @author Thierry GALLIANO
+# @contributors Pierre-Henri PUECH, Laurent LIMOZIN, Guillaume GAY
+"""
+Test of the discovery of the curve files with the index of the folders
+"""
+import os
+import zipfile
+from shutil import rmtree
+from tempfile import mkdtemp
+from ot_analysis.controller.discovery import DirectoryIndex, parse_name
+
+
+def create_file(name, age):
+    """
+    Creation of an empty file, the modification time of its folder being set age seconds ago
+    """
+    open(name, 'w').close()
+    date = os.stat(name).st_mtime - age
+    os.utime(os.path.dirname(name), (date, date))
+
+
+class TestDiscovery:
+    """
+    Class allowing to test the discovery of a tree of folders, scanned then read in the index
+    """
+    @classmethod
+    def setup_class(cls):
+        """
+        Creation of a tree of folders of empty curve files
+        """
+        cls.directory = mkdtemp()
+        cls.name_index = cls.directory + os.sep + 'index.json'
+        cls.study = cls.directory + os.sep + 'study'
+        for day in ('day1', 'day2', 'day2' + os.sep + 'cell'):
+            os.makedirs(cls.study + os.sep + day)
+        create_file(cls.study + os.sep + 'day1' + os.sep + 'b1c1-2021.06.02-15.32.23.111.jpk-nt-force', 60)
+        create_file(cls.study + os.sep + 'day1' + os.sep + 'notes.txt', 60)
+        create_file(cls.study + os.sep + 'day2' + os.sep + 'cell' + os.sep + 'b2c3gg-2021.06.03-10.01.02.003.txt', 60)
+        for path in (cls.study + os.sep + 'day2', cls.study):
+            date = os.stat(path).st_mtime - 60
+            os.utime(path, (date, date))
+
+    def test_parse_name(self):
+        """
+        test the metadata extracted from the names of the curves
+        """
+        metadata = parse_name('b12c3gg-2021.06.03-10.01.02.003.jpk-nt-force')
+        assert (metadata['bead'], metadata['cell'], metadata['couple']) == ('12', '3', 'gg')
+        assert (metadata['date'], metadata['time']) == ('2021.06.03', '10.01.02.003')
+        assert metadata['name'] == 'b12c-2021.06.03-10.01.02.003' and metadata['extension'] == 'jpk-nt-force'
+        assert parse_name('b1c1-test.txt')['date'] is None
+        assert parse_name('notes.txt') is None and parse_name('b0c1-2021.txt') is None
+
+    def test_index(self):
+        """
+        test only the folders modified since the previous discovery are scanned again
+        """
+        index = DirectoryIndex(self.name_index, 2)
+        files = index.curve_files(self.study, {})
+        assert index.nb_scanned == 4
+        assert sorted(files) == ['cell', 'day1']
+        assert files['day1'] == [self.study + os.sep + 'day1' + os.sep + 'b1c1-2021.06.02-15.32.23.111.jpk-nt-force']
+        index = DirectoryIndex(self.name_index, 2)
+        assert index.curve_files(self.study, {}) == files and index.nb_scanned == 0
+        create_file(self.study + os.sep + 'day1' + os.sep + 'b1c2-2021.06.02-15.40.00.000.txt', 30)
+        index = DirectoryIndex(self.name_index, 2)
+        assert len(index.curve_files(self.study, {})['day1']) == 2 and index.nb_scanned == 1
+
+    def test_rewritten_bundle(self):
+        """
+        test a bundle rewritten without change of the modification time of its folder is listed again
+        """
+        study = self.directory + os.sep + 'bundles'
+        os.makedirs(study)
+        name_bundle = study + os.sep + 'day3.zip'
+        names = ['b1c1-2021.06.02-15.32.23.111.jpk-nt-force', 'b1c2-2021.06.02-15.40.00.000.jpk-nt-force']
+        with zipfile.ZipFile(name_bundle, 'w') as bundle:
+            bundle.writestr(names[0], '')
+        date = os.stat(study).st_mtime - 60
+        os.utime(name_bundle, (date, date))
+        os.utime(study, (date, date))
+        index = DirectoryIndex(self.name_index, 2)
+        assert len(index.curve_files(study, {})['day3.zip']) == 1
+        with zipfile.ZipFile(name_bundle, 'w') as bundle:
+            for name in names:
+                bundle.writestr(name, '')
+        os.utime(study, (date, date))
+        index = DirectoryIndex(self.name_index, 2)
+        assert len(index.curve_files(study, {})['day3.zip']) == 2 and index.nb_scanned == 0
+
+    @classmethod
+    def teardown_class(cls):
+        """
+        Removal of the tree of folders
+        """
+        rmtree(cls.directory)
@@ -0,0 +1,73 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# @author Thierry GALLIANO
+# @contributors Pierre-Henri PUECH, Laurent LIMOZIN, Guillaume GAY
+"""
+Test of the typed table of the features of the curves
+"""
+from os import sep
+import numpy as np
+from ot_analysis.controller.controller import Controller
+from ot_analysis.model.feature_table import FeatureTable
+
+
+class TestFeatureTable:
+    """
+    Class allowing to test the full precision of the features and their formatting in the output
+    """
+    @classmethod
+    def setup_class(cls):
+        """
+        Creation of the curves of the test folder
+        """
+        directory_test = 'tests' + sep + 'curves_test' + sep + 'verif'
+        cls.controller = Controller(None, directory_test)
+        cls.methods = {'threshold_align': 30, 'pulling_length': 50, 'model': 'linear',
+                       'eta': 0.5, 'bead_radius': 1, 'factor_noise': 5, 'jump_force': 5,
+                       'jump_point': 200, 'jump_distance': 200, 'drug': 'NaN', 'condition':
+                       'NaN', 'optical': None, 'width_window_smooth': 151}
+        cls.controller.create_dict_curves(cls.methods, cls.controller.files)
+        cls.table = FeatureTable.from_curves(cls.controller.dict_curve.values())
+
+    def test_types(self):
+        """
+        test the numbers are kept in full precision in typed columns
+        """
+        for index, curve in enumerate(self.controller.dict_curve.values()):
+            assert isinstance(curve.features['baseline_corrected_press (pN)'], float)
+            assert self.table.column('baseline_corrected_press (pN)')[index] == \
+                curve.features['baseline_corrected_press (pN)']
+            index_endline = curve.features['point_return_endline']['index']
+            value = self.table.column('point_return_endline_index')[index]
+            assert np.isnan(value) if index_endline == 'NaN' else value == index_endline
+        dataframe = self.table.to_dataframe()
+        assert dataframe['contact_point_index'].dtype == 'Int64'
+        assert dataframe['stiffness (N/m)'].dtype == np.float64
+        assert dataframe['automatic_type'].dtype == object
+
+    def test_output(self):
+        """
+        test the formatting of the numbers happens only in the output
+        """
+        output = self.table.output()
+        baseline = self.table.column('baseline_corrected_press (pN)')
+        assert list(output['baseline_corrected_press (pN)']) == [format(value, '.3E') for value in baseline]
+        assert list(output.columns[:3]) == ['treat_supervised', 'automatic_type', 'type']
+        assert 'slope (pN/nm)' in output and 'contact_point_value  (pN)' in output
+        assert list(output['main_axis']) == [curve.features['main_axis']['sign'] +
+                                             curve.features['main_axis']['axe']
+                                             for curve in self.controller.dict_curve.values()]
+
+    def test_fit_status(self):
+        """
+        test the curves whose fits are beyond their budget are kept and flagged in the output
+        """
+        controller = Controller(None, 'tests' + sep + 'curves_test' + sep + 'verif')
+        controller.create_dict_curves(dict(self.methods, fit_method='curve_fit', fit_max_nfev=3),
+                                      controller.files)
+        assert sorted(controller.dict_curve) == sorted(self.controller.dict_curve)
+        summary = controller.summary_fits()
+        assert summary['fit_press']['budget'] == len(controller.dict_curve)
+        output = FeatureTable.from_curves(controller.dict_curve.values()).output()
+        assert all(status.startswith('press: budget') for status in output['fit_status'])
+        assert list(self.table.output()['fit_status']) == ['ok'] * len(self.table)
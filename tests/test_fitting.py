@@ -0,0 +1,121 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# @author Thierry GALLIANO
+# @contributors Pierre-Henri PUECH, Laurent LIMOZIN, Guillaume GAY
+"""
+Test of the closed-form fitting kernels
+"""
+import numpy as np
+from scipy.optimize import curve_fit
+from ot_analysis.model.curve import Curve
+from ot_analysis.model.fitting import linear_least_squares, fit_retraction, segmented_regression, \
+    sphere_model, sphere_jacobian, fit_approach_sphere, curve_fit_counted, FitBudget, fit_with_fallback
+
+
+class TestFitting:
+    """
+    Class allowing to test the closed-form fits against scipy curve_fit
+    """
+    @classmethod
+    def setup_class(cls):
+        """
+        Creation of noisy synthetic data for the linear and piecewise-linear models
+        """
+        rng = np.random.default_rng(0)
+        cls.x_data = np.linspace(0.0, 2.0, 2000)
+        cls.noise = rng.normal(0, 0.2, len(cls.x_data))
+        cls.y_linear = 3.0 * cls.x_data - 1.0 + cls.noise
+        cls.y_retraction = Curve.fit_model_retraction(
+            cls.x_data, 8.0, 1.2, 0.5) + cls.noise
+
+    def test_linear_parameters_and_covariance(self):
+        """
+        test that the closed-form line fit gives the same parameters
+        and covariance as curve_fit
+        """
+        popt, pcov = linear_least_squares(self.x_data, self.y_linear)
+        popt_ref, pcov_ref = curve_fit(
+            Curve.linear_fit, self.x_data, self.y_linear)
+        assert np.allclose(popt, popt_ref, rtol=1e-6)
+        assert np.allclose(pcov, pcov_ref, rtol=1e-4)
+
+    def test_segmented_regression_breakpoint(self):
+        """
+        test the recovery of the breakpoint of a hinge model
+        """
+        breakpoint, slope, level, _, _ = segmented_regression(
+            self.x_data, self.y_retraction, 'right')
+        assert abs(breakpoint - 1.2) < 0.02
+        assert abs(slope - 8.0) < 0.2
+        assert abs(level - 0.5) < 0.05
+
+    def test_retraction_not_worse_than_curve_fit(self):
+        """
+        test that the closed-form retraction fit reaches a sum of squared residuals
+        at least as low as curve_fit started from a close initial guess
+        """
+        popt, pcov = fit_retraction(self.x_data, self.y_retraction)
+        popt_ref, _ = curve_fit(Curve.fit_model_retraction, self.x_data,
+                                self.y_retraction, [7.0, 1.1, 0.4])
+
+        def sse(parameters):
+            residuals = self.y_retraction - \
+                Curve.fit_model_retraction(self.x_data, *parameters)
+            return np.sum(residuals**2)
+        assert sse(popt) <= sse(popt_ref) * (1 + 1e-9)
+        assert np.all(np.isfinite(np.sqrt(np.diag(pcov))))
+
+    def test_sphere_jacobian(self):
+        """
+        test the analytic Jacobian of the sphere model against finite differences
+        """
+        parameters = np.array([0.8, -50.0, 0.3])
+        jacobian = sphere_jacobian(self.x_data, *parameters)
+        for index in range(3):
+            step = np.zeros(3)
+            step[index] = 1e-6
+            numerical = (sphere_model(self.x_data, *(parameters + step)) -
+                         sphere_model(self.x_data, *(parameters - step))) / 2e-6
+            assert np.allclose(jacobian[:, index], numerical, atol=1e-4)
+
+    def test_sphere_fit(self):
+        """
+        test the sphere fit seeded by the linearized model, on the whole segment and in a window
+        """
+        y_sphere = sphere_model(self.x_data, 0.8, -50.0, 0.3) + self.noise
+        index_contact = int(np.searchsorted(self.x_data, 0.8))
+        _, _, nfev_ref = curve_fit_counted(sphere_model, self.x_data, y_sphere, [0.5, -10.0, 0.0])
+        for half_window in (None, 500):
+            popt, pcov, nfev = fit_approach_sphere(
+                self.x_data, y_sphere, index_contact, 0.3, half_window)
+            assert np.allclose(popt, [0.8, -50.0, 0.3], rtol=0.05, atol=0.05)
+            assert np.all(np.isfinite(np.diag(pcov)))
+            assert nfev < nfev_ref
+
+    def test_budget_fallback(self):
+        """
+        test a fit beyond its budget of evaluations or of time gives the estimate of its initial guesses
+        """
+        y_sphere = sphere_model(self.x_data, 0.8, -50.0, 0.3) + self.noise
+        initial_guesses = [0.5, -10.0, 0.0]
+
+        def fit(budget):
+            return curve_fit_counted(sphere_model, self.x_data, y_sphere, initial_guesses, budget)
+
+        def fallback():
+            return initial_guesses
+        popt, pcov, nfev, status = fit_with_fallback(fit, fallback, FitBudget(max_nfev=5))
+        assert status == 'budget' and nfev == 6
+        assert np.array_equal(popt, initial_guesses) and np.all(np.isinf(pcov))
+        assert fit_with_fallback(fit, fallback, FitBudget(max_time=1e-9))[3] == 'budget'
+        popt, pcov, nfev, status = fit_with_fallback(fit, fallback, FitBudget(max_nfev=1000))
+        assert status == 'ok' and 0 < nfev <= 1000
+        assert np.allclose(popt, [0.8, -50.0, 0.3], rtol=0.05, atol=0.05)
+        index_contact = int(np.searchsorted(self.x_data, 0.8))
+        with_window = fit_with_fallback(
+            lambda budget: fit_approach_sphere(self.x_data, y_sphere, index_contact, 0.3, 500, budget),
+            fallback, FitBudget(max_nfev=2))
+        assert with_window[3] == 'budget'
+        failed = fit_with_fallback(lambda budget: fit_retraction(self.x_data[:3], y_sphere[:3]) + (0,),
+                                   fallback)
+        assert failed[3] == 'failed' and np.array_equal(failed[0], initial_guesses)
@@ -0,0 +1,148 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# @author Thierry GALLIANO
+# @contributors Pierre-Henri PUECH, Laurent LIMOZIN, Guillaume GAY
+"""
+Test of the analysis of the curves of an archive of several curves (force map)
+"""
+import threading
+from os import sep
+from shutil import rmtree
+from tempfile import mkdtemp
+from zipfile import ZipFile, ZIP_DEFLATED
+from ot_analysis.controller.controller import Controller
+from ot_analysis.controller.parallel import bounded_map
+from ot_analysis.extractor.jpk_extractor import JPKForceMap
+from ot_analysis.model.curve import Curve
+from ot_analysis.model.graphics_store import OVERLAY_CACHE
+
+
+def create_force_map(file_curve, name_map, nb_curves):
+    """
+    Creation of a force map with copies of a single curve archive: settings of the curves in the header
+    of the map, header of the curve and segments in index/<n>/, one shared header
+    """
+    single = ZipFile(file_curve)
+    lines = single.read('header.properties').decode('utf-8').splitlines()
+    settings = 'force-scan-series.header.force-settings.'
+    header_map = [lines[0], 'type=force-scan-map'] + \
+        [line.replace(settings, 'force-scan-map.settings.force-settings.') for line in lines[1:]
+         if line.startswith(settings)]
+    header_curve = [line for line in lines if not line.startswith(settings)]
+    with ZipFile(name_map, 'w', ZIP_DEFLATED) as force_map:
+        force_map.writestr('header.properties', '\n'.join(header_map) + '\n')
+        force_map.writestr('shared-data/header.properties', single.read('shared-data/header.properties'))
+        for index in range(nb_curves):
+            force_map.writestr('index/' + str(index) + '/header.properties', '\n'.join(header_curve) + '\n')
+            for name in single.namelist():
+                if name.startswith('segments/') and not name.endswith('/'):
+                    force_map.writestr('index/' + str(index) + '/' + name, single.read(name))
+
+
+class TestForceMap:
+    """
+    Class allowing to test the curves of a force map against the same curve in a single curve archive
+    """
+    @classmethod
+    def setup_class(cls):
+        """
+        Creation of a force map of three copies of a curve of the test folder
+        """
+        cls.file_curve = 'tests' + sep + 'curves_test' + sep + 'verif' + sep + \
+            'b1c1-2021.06.02-15.32.23.111.jpk-nt-force'
+        cls.directory_map = mkdtemp()
+        cls.name_map = cls.directory_map + sep + 'b1c1-2021.06.02-15.32.23.111.jpk-force-map'
+        create_force_map(cls.file_curve, cls.name_map, 3)
+        cls.methods = {'threshold_align': 30, 'pulling_length': 50, 'model': 'linear',
+                       'eta': 0.5, 'bead_radius': 1, 'factor_noise': 5, 'jump_force': 5,
+                       'jump_point': 200, 'jump_distance': 200, 'drug': 'NaN', 'condition':
+                       'NaN', 'optical': None, 'width_window_smooth': 151, 'nb_workers': 2}
+
+    def test_archive(self):
+        """
+        test the listing of the curves and the settings of the map given to each curve
+        """
+        force_map = JPKForceMap(self.name_map)
+        assert len(force_map) == 3 and force_map.title == 'b1c1-2021.06.02-15.32.23.111'
+        single = Controller.create_object_curve(self.file_curve, 'b1c1-single.jpk-nt-force', 30)[0]
+        for index, jpk_file in force_map.curves():
+            assert jpk_file.headers['title'] == force_map.title + '-' + str(index)
+            for key, value in single.parameters_header['header_global'].items():
+                assert jpk_file.headers['header_global'][key] == value, key
+
+    def test_analysis(self):
+        """
+        test the curves of the map have the features of the single curve
+        """
+        reference = Controller(None, self.file_curve)
+        reference.create_dict_curves(self.methods)
+        reference = list(reference.dict_curve.values())[0]
+        controller = Controller(None, self.directory_map)
+        assert controller.files == [self.name_map]
+        controller.create_dict_curves(self.methods)
+        assert sorted(controller.dict_curve) == ['b1c1-2021.06.02-15.32.23.111-' + str(index) for index in range(3)]
+        for curve in controller.dict_curve.values():
+            assert curve.features['relative_path'].startswith(self.name_map + '::index/')
+            for key, value in reference.features.items():
+                if key not in ('fit_press', 'fit_pull', 'relative_path'):
+                    assert str(curve.features[key]) == str(value), key
+
+    def test_parallel_analysis(self, monkeypatch):
+        """
+        test the curves of the map are analyzed by the worker threads, not by the main thread
+        """
+        threads = []
+        analyzed_curve = Curve.analyzed_curve
+
+        def recorded_analysis(curve, methods, manual_correction):
+            threads.append(threading.get_ident())
+            return analyzed_curve(curve, methods, manual_correction)
+
+        monkeypatch.setattr(Curve, 'analyzed_curve', recorded_analysis)
+        controller = Controller(None, self.directory_map)
+        controller.create_dict_curves(self.methods)
+        assert len(controller.dict_curve) == 3 and len(threads) == 3
+        assert threading.get_ident() not in threads
+
+    def test_shared_cache(self, monkeypatch):
+        """
+        test the curves analyzed by several threads with a small cache of the overlays
+        have the features of an analysis in one thread, the cache staying consistent
+        """
+        monkeypatch.setattr(OVERLAY_CACHE, 'max_points', 5000)
+        features = []
+        for nb_workers in (1, 4):
+            controller = Controller(None, self.directory_map)
+            controller.create_dict_curves(dict(self.methods, nb_workers=nb_workers))
+            assert len(controller.dict_curve) == 3
+            features.append({name: {key: str(value) for key, value in curve.features.items()
+                                    if key not in ('fit_press', 'fit_pull')}
+                             for name, curve in controller.dict_curve.items()})
+            for curve in controller.dict_curve.values():
+                for key in curve.graphics:
+                    curve.graphics[key]
+        assert features[0] == features[1]
+        assert OVERLAY_CACHE.nb_points == sum(values.size for values in OVERLAY_CACHE.overlays.values())
+        assert OVERLAY_CACHE.nb_points <= 5000
+
+    def test_bounded_map(self):
+        """
+        test the results come in order with a bounded number of elements read in advance
+        """
+        read = []
+
+        def items():
+            for item in range(20):
+                read.append(item)
+                yield item
+        for item, result, error in bounded_map(lambda item: 1 / (item - 5), items(), 3, 4):
+            assert len(read) <= item + 5
+            assert (error is not None) == (item == 5)
+            assert item == 5 or result == 1 / (item - 5)
+
+    @classmethod
+    def teardown_class(cls):
+        """
+        Removal of the force map
+        """
+        rmtree(cls.directory_map)
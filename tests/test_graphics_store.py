@@ -0,0 +1,71 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# @author Thierry GALLIANO
+# @contributors Pierre-Henri PUECH, Laurent LIMOZIN, Guillaume GAY
+"""
+Test of the parametric storage of the graphics of the curves
+"""
+from os import sep
+import numpy as np
+from ot_analysis.controller.controller import Controller
+from ot_analysis.model.graphics_store import GraphicsStore, OverlayCache
+
+
+class TestGraphicsStore:
+    """
+    Class allowing to test the materialization of the overlays against the arrays they replace
+    """
+    @classmethod
+    def setup_class(cls):
+        """
+        Creation of the curves of the test folder
+        """
+        directory_test = 'tests' + sep + 'curves_test' + sep + 'verif'
+        cls.controller = Controller(None, directory_test)
+        cls.methods = {'threshold_align': 30, 'pulling_length': 50, 'model': 'linear',
+                       'eta': 0.5, 'bead_radius': 1, 'factor_noise': 5, 'jump_force': 5,
+                       'jump_point': 200, 'jump_distance': 200, 'drug': 'NaN', 'condition':
+                       'NaN', 'optical': None, 'width_window_smooth': 151, 'full_analysis': True}
+        cls.controller.create_dict_curves(cls.methods, cls.controller.files)
+
+    def test_overlays(self):
+        """
+        test the overlays of the analysis are descriptions giving the expected arrays
+        """
+        for curve in self.controller.dict_curve.values():
+            graphics = curve.graphics
+            for key in ('threshold_press', 'threshold_pull', 'fitted_Press', 'fitted_Pull', 'y_smooth_Pull'):
+                assert graphics.description(key) is not None
+            pull = curve.dict_segments['Pull']
+            time_data = pull.values('time')
+            assert len(graphics['threshold_pull']) == len(time_data)
+            assert np.all(graphics['threshold_pull'] == graphics['threshold_pull'][0])
+            parameters = graphics.description('fitted_Pull')['parameters']
+            assert np.array_equal(graphics['fitted_Pull'], curve.fit_model_retraction(time_data, *parameters))
+            assert np.array_equal(graphics['y_smooth_Pull'], curve.smooth_segment(
+                'Pull', self.methods['width_window_smooth'], 2))
+            for key in graphics:
+                if key.startswith('distance_fitted_classification'):
+                    description = graphics.description(key)
+                    distance = np.abs(pull.values('distance'))[description['start']:description['stop']]
+                    assert np.array_equal(graphics[key], distance)
+                    assert len(graphics[key[len('distance_'):]]) == len(distance)
+
+    def test_cache(self):
+        """
+        test the size bound of the cache and the replacement of the overlays
+        """
+        curve = list(self.controller.dict_curve.values())[0]
+        cache = OverlayCache(max_points=15)
+        graphics = GraphicsStore(curve, cache)
+        graphics.set_overlay('first', 'constant', 'Pull', value=1.0, length=10)
+        graphics.set_overlay('second', 'constant', 'Pull', value=2.0, length=10)
+        first = graphics['first']
+        assert graphics['first'] is first and not first.flags.writeable
+        graphics['second']
+        assert cache.nb_points == 10 and (graphics.id_store, 'first') not in cache.overlays
+        graphics['second'] = 'point'
+        assert graphics['second'] == 'point' and graphics.description('second') is None
+        assert cache.nb_points == 0 and sorted(graphics) == ['first', 'second']
+        del graphics['first']
+        assert 'first' not in graphics and len(graphics) == 1
@@ -0,0 +1,120 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# @author Thierry GALLIANO
+# @contributors Pierre-Henri PUECH, Laurent LIMOZIN, Guillaume GAY
+"""
+Test of the coarse-to-fine search of the characteristic points on the curves of the test folder
+"""
+from os import sep
+import numpy as np
+from ot_analysis.controller.controller import Controller
+from ot_analysis.model.curve import Curve
+from ot_analysis.model.graphics_store import GraphicsStore
+from ot_analysis.model.multiresolution import CoarseToFine, block_average
+
+
+class TestMultiresolution:
+    """
+    Class allowing to test the agreement of the points found on the decimated signals
+    with the points found at full resolution
+    """
+    @classmethod
+    def setup_class(cls):
+        """
+        Analysis of the curves of the test folder
+        """
+        cls.directory_test = 'tests' + sep + 'curves_test' + sep + 'verif'
+        cls.methods = {'threshold_align': 30, 'pulling_length': 50, 'model': 'linear',
+                       'eta': 0.5, 'bead_radius': 1, 'factor_noise': 5, 'jump_force': 5,
+                       'jump_point': 200, 'jump_distance': 200, 'drug': 'NaN', 'condition':
+                       'NaN', 'optical': None, 'width_window_smooth': 151}
+        cls.controller = Controller(None, cls.directory_test)
+        cls.controller.create_dict_curves(cls.methods, cls.controller.files)
+
+    def agreement(self, factor):
+        """
+        Points found at full resolution and on the decimated signals for all the curves
+
+        :return:
+            points: dict
+                for each point, list of the couples (full resolution, coarse-to-fine)
+        """
+        window = self.methods['width_window_smooth']
+        points = {'contact': [], 'release': [], 'return': [], 'transition': []}
+        for curve in self.controller.dict_curve.values():
+            channel = curve.features['main_axis']['axe'] + 'Signal1'
+            threshold = curve.features['std_corrected_press (pN)'] * self.methods['factor_noise']
+            for name_segment, name_point in (('Press', 'contact'), ('Pull', 'release')):
+                detector = CoarseToFine(curve.dict_segments[name_segment].values(channel), window, 2, factor)
+                index = detector.band_point(*curve.noise_band(), last=name_segment == 'Press')
+                full = curve.retrieve_contact(curve.smooth_segment(name_segment, window, 2),
+                                              name_segment, self.methods['factor_noise'])[0]
+                # 0 when the point is not found at full resolution
+                points[name_point].append((full, 0 if index is None else index))
+            y_smooth = curve.smooth_segment('Pull', window, 2)
+            time_data = curve.dict_segments['Pull'].values('time')
+            detector = CoarseToFine(curve.dict_segments['Pull'].values(channel), window, 2, factor)
+            points['return'].append((Curve.retrieve_retour_line_end(curve, y_smooth, threshold, None),
+                                     detector.return_point(threshold)))
+            points['transition'].append((int(Curve.derivation(y_smooth, time_data, 4).argmin()) - 1,
+                                         detector.transition_point(time_data)))
+        print('factor ' + str(factor) + ': ' + ', '.join(
+            name + ' ' + str(sum(full == coarse for full, coarse in couples)) + '/' + str(len(couples))
+            for name, couples in points.items()))
+        return points
+
+    def test_local_smoothing(self):
+        """
+        test the local smoothing at full resolution gives the values of the smoothing of the whole segment
+        """
+        curve = list(self.controller.dict_curve.values())[0]
+        values = curve.dict_segments['Pull'].values(curve.features['main_axis']['axe'] + 'Signal1')
+        detector = CoarseToFine(values, 151, 2, 10)
+        y_smooth = curve.smooth_segment('Pull', 151, 2)
+        for start, stop in ((0, 50), (1000, 1200), (len(values) - 30, len(values))):
+            assert np.allclose(detector.local(start, stop), y_smooth[start:stop], rtol=1e-10, atol=1e-9)
+        assert np.allclose(block_average(np.arange(7.0), 3), [1.0, 4.0, 6.0])
+
+    def test_agreement(self):
+        """
+        test the agreement of the points on the curves of the test folder
+        (all of them with blocks of 10 points, the transition point excepted with blocks of 16 and 20)
+        """
+        for couples in self.agreement(10).values():
+            assert all(full == coarse for full, coarse in couples)
+        for factor in (16, 20):
+            for name, couples in self.agreement(factor).items():
+                nb_agree = sum(full == coarse for full, coarse in couples)
+                assert nb_agree >= len(couples) - (1 if name == 'transition' else 0)
+
+    def test_fast_tiers(self):
+        """
+        test the release point of the curves settled before the fits is the same with the decimated signals
+        """
+        controller = Controller(None, self.directory_test)
+        controller.create_dict_curves(dict(self.methods, coarse_factor=16), controller.files)
+        for name, curve in controller.dict_curve.items():
+            reference = self.controller.dict_curve[name]
+            for key in ('point_release', 'automatic_type', 'point_return_endline', 'transition_point'):
+                assert str(curve.features[key]) == str(reference.features[key]), key
+
+    def test_nad_not_smoothed(self, monkeypatch):
+        """
+        test the NAD curves of the coarse tiers never smooth nor materialize the whole Pull segment
+        """
+        smoothed = []
+        materialize = GraphicsStore.materialize
+
+        def recorded(store, description):
+            smoothed.append((store.curve.file, description['segment']))
+            return materialize(store, description)
+        monkeypatch.setattr(GraphicsStore, 'materialize', recorded)
+        controller = Controller(None, self.directory_test)
+        controller.create_dict_curves(dict(self.methods, coarse_factor=16), controller.files)
+        nad = [curve for curve in controller.dict_curve.values() if curve.features['automatic_type'] == 'NAD']
+        assert nad
+        for curve in nad:
+            assert (curve.file, 'Pull') not in smoothed
+            assert all(key[0] != 'Pull' for key in curve.smoothing.smoothed)
+            assert str(curve.features['force_max_pull']) == \
+                str(self.controller.dict_curve[curve.file].features['force_max_pull'])
@@ -6,3 +6,52 @@
 """
 Test of the features optical effect
 """
+
+from os import sep
+import numpy as np
+from ot_analysis.controller.controller import Controller
+
+
+class TestOpticalEffect:
+    """
+    Class allowing to test the lazy creation of the optical correction and its undo
+    """
+    @classmethod
+    def setup_class(cls):
+        """
+        Creation of the curves of the test folder without optical correction
+        """
+        directory_test = 'tests' + sep + 'curves_test' + sep + 'verif'
+        cls.controller = Controller(None, directory_test)
+        cls.methods = {'threshold_align': 30, 'pulling_length': 50, 'model': 'linear',
+                       'eta': 0.5, 'bead_radius': 1, 'factor_noise': 5, 'jump_force': 5,
+                       'jump_point': 200, 'jump_distance': 200, 'drug': 'NaN', 'condition':
+                       'NaN', 'optical': None, 'width_window_smooth': 151}
+        cls.controller.create_dict_curves(cls.methods, cls.controller.files)
+
+    def test_lazy_creation(self):
+        """
+        test no optical correction object is created without correction
+        """
+        for curve in self.controller.dict_curve.values():
+            assert curve.optical_effect is None
+
+    def test_automatic_correction_undo(self):
+        """
+        test the automatic correction modifies the curve in place and can be undone
+        """
+        curve = list(self.controller.dict_curve.values())[0]
+        column = curve.features['main_axis']['axe'] + 'Signal1'
+        press = curve.dict_segments['Press'].values(column)
+        before = press.copy()
+        optical_effect = curve.correction_optical_effect_object
+        assert curve.optical_effect is optical_effect
+        optical_effect.automatic_correction(self.methods['factor_noise'])
+        index_contact = curve.graphics['contact_theorical_press']['index']
+        smooth = optical_effect.force_smooth_press
+        assert np.array_equal(press[:index_contact + 1], before[:index_contact + 1] - smooth[:index_contact + 1])
+        assert np.array_equal(press[index_contact + 1:], before[index_contact + 1:])
+        assert np.array_equal(optical_effect.original('Press'), before)
+        optical_effect.undo_corrections()
+        assert np.array_equal(press, before)
+        curve.clear_cache()
@@ -0,0 +1,108 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# @author Thierry GALLIANO
+# @contributors Pierre-Henri PUECH, Laurent LIMOZIN, Guillaume GAY
+"""
+Test of the memoized stages of the analysis of the curves
+"""
+from os import sep
+import numpy as np
+from ot_analysis.controller.controller import Controller
+
+
+def same_results(curve, reference):
+    """
+    Comparison of the features and the graphics of two analyses of the same curve
+    (except the duration of the fits)
+    """
+    assert sorted(curve.features) == sorted(reference.features)
+    for key, value in reference.features.items():
+        if key not in ('fit_press', 'fit_pull'):
+            assert str(curve.features[key]) == str(value), key
+    assert sorted(curve.graphics) == sorted(reference.graphics)
+    for key in reference.graphics:
+        if isinstance(reference.graphics[key], np.ndarray):
+            assert np.array_equal(curve.graphics[key], reference.graphics[key]), key
+
+
+class TestPipeline:
+    """
+    Class allowing to test the re-analysis of the curves against complete analyses
+    """
+    @classmethod
+    def setup_class(cls):
+        """
+        Parameters of the analysis of the curves of the test folder
+        """
+        cls.directory_test = 'tests' + sep + 'curves_test' + sep + 'verif'
+        cls.methods = {'threshold_align': 30, 'pulling_length': 50, 'model': 'linear',
+                       'eta': 0.5, 'bead_radius': 1, 'factor_noise': 5, 'jump_force': 5,
+                       'jump_point': 200, 'jump_distance': 200, 'drug': 'NaN', 'condition':
+                       'NaN', 'optical': 'Correction', 'width_window_smooth': 151}
+
+    def analysis(self, **changes):
+        """
+        Complete analysis of the curves with modified methods
+        """
+        controller = Controller(None, self.directory_test)
+        controller.create_dict_curves(dict(self.methods, **changes), controller.files)
+        return controller.dict_curve
+
+    def test_classification_only(self):
+        """
+        test a change of the classification thresholds re-runs only the classification
+        (complete analysis of all the curves)
+        """
+        curves = self.analysis(full_analysis=True)
+        references = self.analysis(jump_force=15, full_analysis=True)
+        for name, curve in curves.items():
+            curve.analyzed_curve(dict(self.methods, jump_force=15, full_analysis=True), False)
+            curve.features['type'] = curve.features['automatic_type']
+            assert curve.pipeline.nb_runs['fit_pull'] == 1
+            assert curve.pipeline.nb_runs['classification'] == 2
+            same_results(curve, references[name])
+
+    def test_optical_correction(self):
+        """
+        test a change of the tolerance restores the data before the new automatic correction
+        """
+        curves = self.analysis()
+        references = self.analysis(factor_noise=4)
+        for name, curve in curves.items():
+            curve.analyzed_curve(dict(self.methods, factor_noise=4), False)
+            curve.features['type'] = curve.features['automatic_type']
+            assert curve.pipeline.nb_runs['min_force'] == 1
+            assert curve.pipeline.nb_runs['baseline_end'] == 2
+            same_results(curve, references[name])
+            column = curve.features['main_axis']['axe'] + 'Signal1'
+            assert np.array_equal(curve.dict_segments['Press'].values(column),
+                                  references[name].dict_segments['Press'].values(column))
+
+    def test_early_exit(self):
+        """
+        test the curves classified before the fits skip the fit of "Pull"
+        with the same classification and points as the complete analysis
+        """
+        curves = self.analysis(jump_force=15)
+        references = self.analysis(jump_force=15, full_analysis=True)
+        tiers = set()
+        for name, curve in curves.items():
+            reference = references[name]
+            tier = curve.analysis_tier(dict(self.methods, jump_force=15), curve.pipeline.memo[
+                'baseline_end']['state'][0]['type_curve'])
+            tiers.add(tier)
+            assert ('fitted_Pull' in curve.graphics) == (tier == 'adhesion')
+            assert ('fit_pull' in curve.features) == (tier == 'adhesion')
+            for key in ('automatic_type', 'point_release', 'force_max_pull', 'point_return_endline',
+                        'transition_point'):
+                assert str(curve.features[key]) == str(reference.features[key]), key
+        assert 'NAD' in tiers and 'adhesion' in tiers
+
+    def test_data_modified(self):
+        """
+        test a modification of the data outside the analysis re-runs all the stages
+        """
+        curve = list(self.analysis().values())[0]
+        curve.clear_cache()
+        curve.analyzed_curve(self.methods, True)
+        assert curve.pipeline.nb_runs['min_force'] == 2
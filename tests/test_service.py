@@ -0,0 +1,133 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# @author Thierry GALLIANO
+# @contributors Pierre-Henri PUECH, Laurent LIMOZIN, Guillaume GAY
+"""
+Test of the local analysis service on localhost
+"""
+import json
+from os import sep, listdir
+from urllib.request import urlopen, Request
+from urllib.error import HTTPError
+import pytest
+from ot_analysis.controller.controller import Controller
+from ot_analysis.controller.service import AnalysisService
+from ot_analysis.model.feature_table import FeatureTable
+
+
+class TestService:
+    """
+    Class allowing to test the jobs of the service against the analysis of the controller
+    """
+    @classmethod
+    def setup_class(cls):
+        """
+        Launch of the service on a free port with one worker
+        """
+        cls.service = AnalysisService('127.0.0.1', 0, 1).start()
+        path_curves = 'tests' + sep + 'curves_test' + sep + 'verif'
+        cls.files = [path_curves + sep + name for name in sorted(listdir(path_curves))
+                     if name.startswith(('b1c1', 'b4c4'))]
+        cls.methods = {'threshold_align': 30, 'pulling_length': 50, 'model': 'linear',
+                       'eta': 0.5, 'bead_radius': 1, 'factor_noise': 5, 'jump_force': 5,
+                       'jump_point': 200, 'jump_distance': 200, 'drug': 'NaN', 'condition':
+                       'NaN', 'optical': None, 'width_window_smooth': 151}
+
+    def request(self, path, content=None):
+        """
+        Response of the service to a request (POST of JSON content if given)
+        """
+        data = None if content is None else json.dumps(content).encode('utf-8')
+        with urlopen(Request(self.service.address + path, data), timeout=120) as response:
+            return response.read()
+
+    def run_job(self, methods):
+        """
+        Submission of a job, reading of its progress until its end and of its results
+        """
+        job = json.loads(self.request('/jobs', {'files': self.files, 'methods': methods}))
+        lines = self.request('/jobs/' + str(job['job']) + '/progress').decode('utf-8').splitlines()
+        events = [json.loads(line) for line in lines]
+        assert [event['done'] for event in events[:-1]] == list(range(1, len(self.files) + 1))
+        assert events[-1]['status'] == 'done'
+        rows = json.loads(self.request('/jobs/' + str(job['job']) + '/results'))['rows']
+        return events[-1], {row.pop('curve'): row for row in rows}
+
+    def test_jobs(self):
+        """
+        test the rows of the jobs are those of the controller, the files of the second job
+        being taken in the decoded curves of the worker
+        """
+        for factor_noise, nb_cached in ((5, 0), (3, len(self.files))):
+            methods = dict(self.methods, factor_noise=factor_noise)
+            status, rows = self.run_job(methods)
+            assert status['cached'] == nb_cached
+            reference = Controller(None)
+            reference.create_dict_curves(methods, self.files)
+            assert sorted(rows) == sorted(list(reference.dict_curve) + list(reference.list_file_imcomplete))
+            reference = json.loads(FeatureTable.from_curves(reference.dict_curve.values()).output().to_json(
+                orient='index'))
+            for name, row in reference.items():
+                for key, value in row.items():
+                    if 'time' not in key and 'nfev' not in key:
+                        assert rows[name][key] == value, key
+
+    def test_arrow(self):
+        """
+        test the Arrow results keep the types of the typed output and the methods of the job
+        """
+        pyarrow = pytest.importorskip('pyarrow')
+        job = json.loads(self.request('/jobs', {'files': self.files, 'methods': self.methods}))
+        self.request('/jobs/' + str(job['job']) + '/progress')
+        table = pyarrow.ipc.open_stream(self.request('/jobs/' + str(job['job']) + '/results?format=arrow')).read_all()
+        assert json.loads(table.schema.metadata[b'ot_analysis.methods']) == self.methods
+        assert table.schema.field('contact_point_index').type == pyarrow.int64()
+        assert table.schema.field('stiffness (N/m)').type == pyarrow.float64()
+        assert table.schema.field('treat_supervised').type == pyarrow.bool_()
+        assert table.schema.field('automatic_type').type == pyarrow.string()
+        reference = Controller(None)
+        reference.create_dict_curves(self.methods, self.files)
+        typed = FeatureTable.from_curves(reference.dict_curve.values()).typed_output()
+        rows = table.to_pandas().set_index('curve')
+        for name in typed.index:
+            assert rows.loc[name, 'stiffness (N/m)'] == pytest.approx(typed.loc[name, 'stiffness (N/m)'])
+            assert rows.loc[name, 'automatic_type'] == typed.loc[name, 'automatic_type']
+
+    def test_same_names(self, tmpdir):
+        """
+        test the curves of the same name in two folders are both in the results, and a file
+        with a problem is read again by the next job instead of being taken in the decoded curves
+        """
+        copies = []
+        for folder in ('day1', 'day2'):
+            tmpdir.mkdir(folder)
+            copies.append(str(tmpdir.join(folder, self.files[0].split(sep)[-1])))
+            with open(self.files[0], 'rb') as file, open(copies[-1], 'wb') as copy:
+                copy.write(file.read())
+        broken = str(tmpdir.join('b9c9-2021.06.02-15.32.23.111.jpk-nt-force'))
+        with open(broken, 'wb') as file:
+            file.write(b'not a curve')
+        for nb_cached in (0, 2):
+            job = json.loads(self.request('/jobs', {'files': copies + [broken], 'methods': self.methods}))
+            status = json.loads(self.request('/jobs/' + str(job['job']) + '/progress').decode('utf-8').splitlines()[-1])
+            rows = json.loads(self.request('/jobs/' + str(job['job']) + '/results'))['rows']
+            assert [row['curve'] for row in rows] == [self.files[0].split(sep)[-1].split('.jpk')[0]] * 2
+            assert status['cached'] == nb_cached and status['types']['PB'] == 1
+
+    def test_errors(self):
+        """
+        test the bad requests and the unknown jobs
+        """
+        for path, content, code in (('/jobs', {'files': 'b1c1'}, 400), ('/jobs/999', None, 404)):
+            try:
+                self.request(path, content)
+                assert False
+            except HTTPError as error:
+                assert error.code == code
+
+    @classmethod
+    def teardown_class(cls):
+        """
+        Stop of the service
+        """
+        cls.service.shutdown()
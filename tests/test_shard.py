@@ -0,0 +1,116 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# @author Thierry GALLIANO
+# @contributors Pierre-Henri PUECH, Laurent LIMOZIN, Guillaume GAY
+"""
+Test of the analysis in shards run as separate processes and of the merge of their results
+"""
+import json
+import subprocess
+import sys
+from os import sep
+from pathlib import Path
+from shutil import copytree, rmtree
+from tempfile import mkdtemp
+import pandas as pd
+import pytest
+from ot_analysis.controller.controller import Controller
+from ot_analysis.controller.shard import partition
+
+
+class TestShard:
+    """
+    Class allowing to test the merge of the shards against the analysis of all the files at once
+    """
+    @classmethod
+    def setup_class(cls):
+        """
+        Analysis of the test folder at once and in three shard processes
+        """
+        cls.path_curves = 'tests' + sep + 'curves_test' + sep + 'verif'
+        cls.directory = mkdtemp()
+        methods = {'threshold_align': 30, 'pulling_length': 50, 'model': 'linear',
+                   'eta': 0.5, 'bead_radius': 1, 'factor_noise': 5, 'jump_force': 5,
+                   'jump_point': 200, 'jump_distance': 200, 'drug': 'NaN', 'condition':
+                   'NaN', 'optical': None, 'width_window_smooth': 151}
+        cls.name_methods = Controller.write_methods(methods, cls.directory + sep + 'methods.tsv')
+        cls.reference = Controller(None, cls.path_curves)
+        cls.reference.create_dict_curves(Controller.read_methods(cls.name_methods))
+        cls.name_reference = cls.reference.output_save(cls.directory)
+        cls.directory_shards = cls.directory + sep + 'shards'
+        processes = [subprocess.Popen([sys.executable, '-m', 'ot_analysis.controller.controller',
+                                       '-p', cls.path_curves, '-o', cls.directory_shards, '-m', cls.name_methods,
+                                       '--shard', str(shard) + '/3'],
+                                      stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+                     for shard in range(3)]
+        cls.errors = [process.communicate()[1] for process in processes if process.wait() != 0]
+
+    def test_partition(self):
+        """
+        test the files of a curve name are in the same shard and the folders balanced
+        """
+        files = ['a' + sep + 'b1c1-2021.06.02-15.32.23.111.jpk-nt-force',
+                 'b' + sep + 'b1c1gg-2021.06.02-15.32.23.111.txt', 'b' + sep + 'b2c2-2021.06.02-15.32.23.111.txt']
+        shards = partition(files, 4)
+        assert shards[0] == shards[1] and shards == partition(files, 4)
+        files = []
+        for index, (name_directory, size) in enumerate((('big', 1000), ('small1', 400), ('small2', 400))):
+            files.append(self.directory + sep + name_directory + sep + 'b1c' + str(index + 1) +
+                         '-2021.06.02-15.32.23.111.txt')
+            Path(files[-1]).parent.mkdir()
+            Path(files[-1]).write_bytes(b'0' * size)
+        assert partition(files, 2, 'directory') == [0, 1, 1]
+        with pytest.raises(ValueError):
+            partition(files, 2, 'random')
+
+    def test_merge(self):
+        """
+        test the merged output is the output of the analysis at once, with the same counts
+        """
+        assert self.errors == []
+        controller = Controller(None, self.path_curves)
+        name_merge = controller.merge_shards(self.directory_shards)
+        assert controller.dict_type_files == self.reference.dict_type_files
+        assert controller.list_file_imcomplete == self.reference.list_file_imcomplete
+        merge = pd.read_csv(name_merge, sep='\t', header=0, index_col=0, dtype=str)
+        reference = pd.read_csv(self.name_reference, sep='\t', header=0, index_col=0, dtype=str)
+        # curves in the order of the files, then the incomplete files (in a set in the analysis at once)
+        nb_curves = len(controller.output) - len(controller.list_file_imcomplete)
+        assert list(merge.index[:nb_curves]) == list(reference.index[:nb_curves])
+        reference = reference.loc[merge.index]
+        assert list(merge.columns) == list(reference.columns)
+        columns = [name for name in merge.columns if 'time (s)' not in name]
+        assert merge[columns].equals(reference[columns])
+
+    def test_other_files(self):
+        """
+        test the merge refuses another list of files
+        """
+        controller = Controller(None, self.path_curves + sep + 'b1c1-2021.06.02-15.32.23.111.jpk-nt-force')
+        with pytest.raises(ValueError):
+            controller.merge_shards(self.directory_shards)
+
+    def test_stale_shards(self):
+        """
+        test the merge refuses a folder holding the journal of a run with another number of shards,
+        the partial results being JSON files
+        """
+        directory_shards = self.directory + sep + 'stale'
+        copytree(self.directory_shards, directory_shards)
+        assert sorted(Path(directory_shards).glob('*.pkl')) == []
+        with open(directory_shards + sep + 'shard_000_of_003.json', 'r') as file_journal:
+            journal = json.load(file_journal)
+        with open(directory_shards + sep + journal['partial'], 'r') as file_partial:
+            assert len(json.load(file_partial)['records']) == journal['nb_curves']
+        journal.update({'nb_shards': 2, 'partial': 'shard_000_of_002_partial.json'})
+        with open(directory_shards + sep + 'shard_000_of_002.json', 'w') as file_journal:
+            json.dump(journal, file_journal)
+        with pytest.raises(ValueError):
+            Controller(None, self.path_curves).merge_shards(directory_shards)
+
+    @classmethod
+    def teardown_class(cls):
+        """
+        Removal of the results
+        """
+        rmtree(cls.directory)
@@ -0,0 +1,79 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# @author Thierry GALLIANO
+# @contributors Pierre-Henri PUECH, Laurent LIMOZIN, Guillaume GAY
+"""
+Test of the smoothing with precomputed Savitzky-Golay kernels
+"""
+from os import sep
+import numpy as np
+from scipy.signal import savgol_filter
+from ot_analysis.controller.controller import Controller
+from ot_analysis.model.smoothing import NB_SMOOTHED, smooth, smooth_batch
+
+
+class TestSmoothing:
+    """
+    Class allowing to test the smoothing against scipy savgol_filter and its memoization on the curves
+    """
+    @classmethod
+    def setup_class(cls):
+        """
+        Creation of noisy signals and of the curves of the test folder
+        """
+        rng = np.random.default_rng(0)
+        cls.signals = np.cumsum(rng.normal(0, 1, (4, 5000)), axis=1)
+        directory_test = 'tests' + sep + 'curves_test' + sep + 'verif'
+        cls.controller = Controller(None, directory_test)
+        cls.methods = {'threshold_align': 30, 'pulling_length': 50, 'model': 'linear',
+                       'eta': 0.5, 'bead_radius': 1, 'factor_noise': 5, 'jump_force': 5,
+                       'jump_point': 200, 'jump_distance': 200, 'drug': 'NaN', 'condition':
+                       'NaN', 'optical': None, 'width_window_smooth': 151}
+        cls.controller.create_dict_curves(cls.methods, cls.controller.files)
+
+    def test_same_as_savgol_filter(self):
+        """
+        test the smoothing (and derivative) of one signal and of a batch of signals
+        """
+        for window_length, order_polynome, deriv in ((51, 3, 0), (151, 2, 0), (7, 2, 1)):
+            reference = savgol_filter(self.signals, window_length, order_polynome, deriv, axis=1)
+            assert np.allclose(smooth(self.signals[0], window_length, order_polynome, deriv),
+                               reference[0], rtol=1e-9, atol=1e-9)
+            assert np.allclose(smooth_batch(self.signals, window_length, order_polynome, deriv),
+                               reference, rtol=1e-9, atol=1e-9)
+        # even window made odd as in Curve.smooth
+        assert np.allclose(smooth(self.signals[0], 150, 2),
+                           savgol_filter(self.signals[0], 151, 2))
+
+    def test_memoization_curve(self):
+        """
+        test the reuse of the smoothed signals of a curve and their removal
+        when the corrected data are modified
+        """
+        curve = list(self.controller.dict_curve.values())[0]
+        y_smooth = curve.smooth_segment('Pull', 151, 2)
+        assert curve.smooth_segment('Pull', 151, 2) is y_smooth
+        assert not y_smooth.flags.writeable
+        column = curve.features['main_axis']['axe'] + 'Signal1'
+        assert np.allclose(y_smooth, savgol_filter(
+            curve.dict_segments['Pull'].corrected_data[column], 151, 2))
+        curve.smoothing.clear('Pull')
+        assert curve.smooth_segment('Pull', 151, 2) is not y_smooth
+
+    def test_memoization_analysis(self):
+        """
+        test the smoothed signals are kept from one analysis to the next of the same data,
+        within the bound of the memo, and removed when the corrected data are modified
+        """
+        curve = list(self.controller.dict_curve.values())[1]
+        y_smooth = curve.smooth_segment('Pull', 151, 2)
+        curve.analyzed_curve(self.methods, False)
+        assert curve.smooth_segment('Pull', 151, 2) is y_smooth
+        for window_length in range(11, 11 + 2 * NB_SMOOTHED, 2):
+            curve.smooth_segment('Pull', window_length, 2)
+        assert len(curve.smoothing.smoothed) == NB_SMOOTHED
+        assert curve.smooth_segment('Pull', 151, 2) is not y_smooth
+        y_smooth = curve.smooth_segment('Pull', 151, 2)
+        curve.clear_cache()
+        assert not curve.smoothing.smoothed and not curve.precomputed
+        assert curve.smooth_segment('Pull', 151, 2) is not y_smooth
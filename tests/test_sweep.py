@@ -0,0 +1,60 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# @author Thierry GALLIANO
+# @contributors Pierre-Henri PUECH, Laurent LIMOZIN, Guillaume GAY
+"""
+Test of the sweep of the thresholds of the analysis over a grid of parameters
+"""
+from os import sep
+import numpy as np
+from ot_analysis.controller.controller import Controller
+from ot_analysis.model.sweep import first_below, grid_points
+
+
+class TestSweep:
+    """
+    Class allowing to test the sweep against complete analyses of the curves
+    """
+    @classmethod
+    def setup_class(cls):
+        """
+        Sweep of a grid of parameters on the curves of the test folder
+        """
+        cls.directory_test = 'tests' + sep + 'curves_test' + sep + 'verif'
+        cls.methods = {'threshold_align': 30, 'pulling_length': 50, 'model': 'linear',
+                       'eta': 0.5, 'bead_radius': 1, 'factor_noise': 5, 'jump_force': 5,
+                       'jump_point': 200, 'jump_distance': 200, 'drug': 'NaN', 'condition':
+                       'NaN', 'optical': None, 'width_window_smooth': 151}
+        cls.grid = {'threshold_align': [1, 5, 30], 'factor_noise': [1, 3, 5, 8], 'jump_force': [5, 15, 40],
+                    'jump_point': [50, 200, 2000], 'jump_distance': [20, 200]}
+        controller = Controller(None, cls.directory_test)
+        cls.curves, cls.counts = controller.sweep(cls.methods, cls.grid)
+        cls.nb_curves = len(controller.dict_curve)
+
+    def test_grid(self):
+        """
+        test the tables of the sweep (all the combinations of the grid)
+        """
+        assert len(self.counts) == 3 * 4 * 3 * 3 * 2
+        assert len(self.curves) == len(self.counts) * self.nb_curves
+        types = self.counts[['NAD', 'AD', 'FTU', 'ITU', 'RE']]
+        assert np.all(types.sum(axis=1) == self.nb_curves)
+        points = grid_points({'jump_force': [1, 2]}, self.methods)
+        assert points['jump_force'].tolist() == [1, 2] and points['factor_noise'].tolist() == [5, 5]
+        assert first_below(np.array([0., 3., 5., 4., 1., 2.]), [4.5, 3.5, 0.5]).tolist() == [4, 5, -1]
+
+    def test_same_types(self):
+        """
+        test the types and the alignment of the sweep are those of complete analyses
+        """
+        for parameters in ({'threshold_align': 30, 'factor_noise': 5, 'jump_force': 5, 'jump_point': 200,
+                            'jump_distance': 200},
+                           {'threshold_align': 5, 'factor_noise': 3, 'jump_force': 15, 'jump_point': 50,
+                            'jump_distance': 20}):
+            controller = Controller(None, self.directory_test)
+            controller.create_dict_curves(dict(self.methods, **parameters), controller.files)
+            selection = np.logical_and.reduce([self.curves[name] == value for name, value in parameters.items()])
+            for _, line in self.curves[selection].iterrows():
+                curve = controller.dict_curve[line['curve']]
+                assert curve.features['automatic_type'] == line['type']
+                assert curve.features['AL'] == line['AL']
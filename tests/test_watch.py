@@ -0,0 +1,98 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# @author Thierry GALLIANO
+# @contributors Pierre-Henri PUECH, Laurent LIMOZIN, Guillaume GAY
+"""
+Test of the analysis of the curves of an acquisition folder as they are recorded
+"""
+import os
+from os import sep
+from shutil import copy, rmtree
+from tempfile import mkdtemp
+import pandas as pd
+from ot_analysis.controller.controller import Controller
+from ot_analysis.controller.columnar import read_columnar
+from ot_analysis.controller.watch import FolderWatcher
+from ot_analysis.model.feature_table import FeatureTable
+
+
+class TestWatch:
+    """
+    Class allowing to test the polling of a folder where curve files are added
+    """
+    @classmethod
+    def setup_class(cls):
+        """
+        Creation of an empty acquisition folder and of the watcher
+        """
+        cls.path_curves = 'tests' + sep + 'curves_test' + sep + 'verif'
+        cls.directory = mkdtemp()
+        cls.acquisition = cls.directory + sep + 'acquisition'
+        os.mkdir(cls.acquisition)
+        methods = {'threshold_align': 30, 'pulling_length': 50, 'model': 'linear',
+                   'eta': 0.5, 'bead_radius': 1, 'factor_noise': 5, 'jump_force': 5,
+                   'jump_point': 200, 'jump_distance': 200, 'drug': 'NaN', 'condition':
+                   'NaN', 'optical': None, 'width_window_smooth': 151}
+        cls.watcher = FolderWatcher(Controller(None), cls.acquisition, methods, cls.directory + sep + 'output',
+                                    interval=0, stable_polls=2, settle=0)
+
+    def add_curve(self, name):
+        """
+        Recording of a curve file in the acquisition folder
+        """
+        copy(self.path_curves + sep + name, self.acquisition)
+
+    def test_poll(self):
+        """
+        test a file is analyzed once stable, its row appended to the output and counted
+        """
+        assert self.watcher.poll() == []
+        self.add_curve('b1c1-2021.06.02-15.32.23.111.jpk-nt-force')
+        assert self.watcher.poll() == []
+        files = self.watcher.poll()
+        assert [os.path.basename(file) for file in files] == ['b1c1-2021.06.02-15.32.23.111.jpk-nt-force']
+        output = self.watcher.analyze(files)
+        assert list(output.index) == ['b1c1-2021.06.02-15.32.23.111']
+        self.add_curve('b4c4-2021.06.07-15.04.04.912.jpk-nt-force')
+        self.watcher.poll()
+        self.watcher.analyze(self.watcher.poll())
+        assert self.watcher.poll() == []
+        written = pd.read_csv(self.watcher.name_output, sep='\t', header=0, index_col=0)
+        assert list(written.index) == ['b1c1-2021.06.02-15.32.23.111', 'b4c4-2021.06.07-15.04.04.912']
+        reference = Controller(None, self.acquisition)
+        reference.create_dict_curves(self.watcher.methods)
+        assert list(written['automatic_type']) == [reference.dict_curve[name].features['automatic_type']
+                                                   for name in written.index]
+        assert self.watcher.counts['nb'].sum() == 2
+        assert self.watcher.counts.loc['b4c4', 'nb'] == 1
+
+    def test_incomplete_first(self):
+        """
+        test the rows of the curves keep all their columns when the first file is incomplete,
+        in the output file and in the typed file
+        """
+        acquisition = self.directory + sep + 'acquisition_incomplete'
+        os.mkdir(acquisition)
+        watcher = FolderWatcher(Controller(None), acquisition, self.watcher.methods, acquisition + '_output',
+                                interval=0, stable_polls=1, settle=0, output_format='npz')
+        for name in ('b5c5-2021.06.07-15.10.03.254.jpk-nt-force', 'b1c1-2021.06.02-15.32.23.111.jpk-nt-force'):
+            copy(self.path_curves + sep + name, acquisition)
+            watcher.analyze(watcher.poll())
+        written = pd.read_csv(watcher.name_output, sep='\t', header=0, index_col=0)
+        assert list(written.index) == ['b5c5-2021.06.07-15.10.03.254.jpk-nt-force', 'b1c1-2021.06.02-15.32.23.111']
+        assert written.loc['b5c5-2021.06.07-15.10.03.254.jpk-nt-force', 'automatic_type'] == 'INC'
+        reference = Controller(None, acquisition + sep + 'b1c1-2021.06.02-15.32.23.111.jpk-nt-force')
+        reference.create_dict_curves(self.watcher.methods)
+        output = FeatureTable.from_curves(reference.dict_curve.values()).output()
+        assert list(written.columns) == list(output.columns)
+        assert written.loc['b1c1-2021.06.02-15.32.23.111', 'stiffness (N/m)'] == \
+            float(output.loc['b1c1-2021.06.02-15.32.23.111', 'stiffness (N/m)'])
+        typed, _ = read_columnar(watcher.writer.name_file)
+        assert list(typed.columns) == list(written.columns) and list(typed.index) == list(written.index)
+
+    @classmethod
+    def teardown_class(cls):
+        """
+        Removal of the folders
+        """
+        rmtree(cls.directory)
@@ -0,0 +1,69 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# @author Thierry GALLIANO
+# @contributors Pierre-Henri PUECH, Laurent LIMOZIN, Guillaume GAY
+"""
+Test of the windowed statistics of the segments
+"""
+import numpy as np
+import pandas as pd
+from ot_analysis.model.segment_curve import Segment
+from ot_analysis.model.window_statistics import WindowStatistics
+
+
+class TestWindowStatistics:
+    """
+    Class allowing to test the windowed statistics against pandas
+    """
+    @classmethod
+    def setup_class(cls):
+        """
+        Creation of a noisy signal with an offset, as the forces of a segment
+        """
+        rng = np.random.default_rng(0)
+        cls.data = pd.Series(1e3 + np.cumsum(rng.normal(0, 1, 5000)))
+        cls.statistics = WindowStatistics(cls.data)
+        cls.windows = [(0, 1000), (0, 200), (-1000, None), (-200, None), (123, 4567),
+                       (None, None), (4990, 5000), (10, 11)]
+
+    def test_mean_std(self):
+        """
+        test the mean and the standard deviation of windows defined as slices
+        """
+        for start, stop in self.windows:
+            window = self.data[start:stop]
+            assert np.isclose(self.statistics.mean(start, stop), window.mean(), rtol=1e-12)
+            if len(window) > 1:
+                assert np.isclose(self.statistics.std(start, stop), window.std(), rtol=1e-8)
+        assert np.isnan(self.statistics.std(10, 11))
+
+    def test_extrema(self):
+        """
+        test the minimum, the maximum and their first position in windows
+        """
+        for start, stop in self.windows:
+            window = self.data[start:stop].reset_index(drop=True)
+            offset = range(len(self.data))[slice(start, stop)][0]
+            assert self.statistics.min(start, stop) == window.min()
+            assert self.statistics.max(start, stop) == window.max()
+            assert self.statistics.argmin(start, stop) == window.argmin() + offset
+            assert self.statistics.argmax(start, stop) == window.argmax() + offset
+
+    def test_segment_extrema(self):
+        """
+        test the extrema of the three axes of a segment computed together
+        and their removal with the statistics of the corrected data
+        """
+        rng = np.random.default_rng(1)
+        data = pd.DataFrame(rng.normal(0, 1, (1000, 3)), columns=['xSignal1', 'ySignal1', 'zSignal1'])
+        segment = Segment({}, data, 'Press')
+        segment.corrected_data = data.copy()
+        extrema = segment.extrema()
+        for channel in data:
+            assert extrema[channel]['index_min'] == data[channel].argmin()
+            assert extrema[channel]['min'] == data[channel].min()
+            assert extrema[channel]['index_max'] == data[channel].argmax()
+            assert extrema[channel]['max'] == data[channel].max()
+        assert segment.extrema() is extrema
+        segment.clear_statistics()
+        assert segment.extrema() is not extrema
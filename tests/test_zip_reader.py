@@ -0,0 +1,50 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# @author Thierry GALLIANO
+# @contributors Pierre-Henri PUECH, Laurent LIMOZIN, Guillaume GAY
+"""
+Test of the reading of the members of a zip archive in the order of the archive
+"""
+from io import BytesIO
+from os import sep
+from zipfile import ZipFile, ZIP_STORED, ZIP_DEFLATED, ZIP_BZIP2
+from ot_analysis.extractor.zip_reader import read_plan, read_members
+
+
+class TestZipReader:
+    """
+    Class allowing to test the planned reading against the reading member by member of zipfile
+    """
+    @classmethod
+    def setup_class(cls):
+        """
+        Opening of a curve archive of the test folder
+        """
+        cls.jpk_zip = ZipFile('tests' + sep + 'curves_test' + sep + 'verif' + sep +
+                              'b1c1-2021.06.02-15.32.23.111.jpk-nt-force')
+
+    def test_plan(self):
+        """
+        test the members are read in a few ranges in the order of the archive
+        """
+        names = [name for name in self.jpk_zip.namelist() if not name.endswith('/')]
+        ranges = read_plan(self.jpk_zip, reversed(names))
+        assert len(ranges) == 1
+        offsets = [info.header_offset for info in ranges[0][2]]
+        assert offsets == sorted(offsets) and len(offsets) == len(names)
+        assert len(read_plan(self.jpk_zip, ['header.properties', 'segments/0/segment-header.properties'],
+                             max_gap=0)) == 2
+
+    def test_contents(self):
+        """
+        test the contents are those read by zipfile, whatever the compression
+        """
+        names = [name for name in self.jpk_zip.namelist() if not name.endswith('/')]
+        contents = read_members(self.jpk_zip, names)
+        assert contents == {name: self.jpk_zip.read(name) for name in names}
+        stream = BytesIO()
+        with ZipFile(stream, 'w') as archive:
+            for index, name in enumerate(names[:6]):
+                archive.writestr(name, contents[name], (ZIP_STORED, ZIP_DEFLATED, ZIP_BZIP2)[index % 3])
+        with ZipFile(stream) as archive:
+            assert read_members(archive, names[:6], max_gap=0) == {name: contents[name] for name in names[:6]}